@@ -1,24 +1,56 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, Response, stream_with_context
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
 import os
 import json
 import time
-from src.query_chromadb import process_query, get_random_document_chunks
+import random
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime, timedelta, timezone
+from src.query_chromadb import (process_query, aprocess_query, stream_query, get_random_document_chunks, cache_stats,
+                                get_chunk_ids, generate_chunk_questions, abatch_process_queries,
+                                parse_question_records, ANSWER_CACHE, PIPELINE_LOOP, BATCH_CONCURRENCY)
 from src.create_knowledge_bank import store_file_in_chromadb_txt_file
+from src.write_behind import WriteBehindQueue
+from src.llm.token_tracker import token_user, token_usage
+from src.metrics import timed, register_stats, REQUEST_LATENCY, CACHE_LOOKUPS
 
 # Configurations
 class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'default_secret_key')  # Replace with a secure key in production
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///chat_history.db'
+    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///chat_history.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     DEBUG = True
+    ASYNC_PIPELINE = os.getenv('ASYNC_PIPELINE', 'true').lower() == 'true'
+    CHAT_WRITE_BEHIND = os.getenv('CHAT_WRITE_BEHIND', 'true').lower() == 'true'
+    SUGGESTION_REFRESH_SECONDS = int(os.getenv('SUGGESTION_REFRESH_SECONDS', 3600))
+    SUGGESTION_CHUNKS_PER_REFRESH = int(os.getenv('SUGGESTION_CHUNKS_PER_REFRESH', 50))
+    SUGGESTION_RETRY_SECONDS = int(os.getenv('SUGGESTION_RETRY_SECONDS', 3600))  # doubles after each failed attempt
+    SUGGESTION_CLAIM_SECONDS = int(os.getenv('SUGGESTION_CLAIM_SECONDS', 600))  # other workers skip a claimed chunk
+    MAX_BATCH_QUESTIONS = int(os.getenv('MAX_BATCH_QUESTIONS', 1000))
+    PIPELINE_TIMEOUT_SECONDS = float(os.getenv('PIPELINE_TIMEOUT_SECONDS', 120))  # per answer, or per batch result
+    TOKEN_USAGE_FLUSH_SECONDS = int(os.getenv('TOKEN_USAGE_FLUSH_SECONDS', 300))  # 0 keeps usage in memory only
 
 app = Flask(__name__, template_folder=os.path.abspath('src/templates'), static_folder=os.path.abspath('src/static'))
 app.config.from_object(Config)
 
 db = SQLAlchemy(app)
+
+@event.listens_for(Engine, 'connect')
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers proceed during writes; NORMAL sync skips an fsync per commit
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.close()
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
 
@@ -39,27 +71,266 @@ class ChatHistory(db.Model):
     answer = db.Column(db.Text, nullable=False)
     follow_ups = db.Column(db.Text)
     processing_time = db.Column(db.Float, nullable=False)
-    timestamp = db.Column(db.DateTime, default=db.func.current_timestamp())
+    # Set in Python (UTC, like CURRENT_TIMESTAMP) so stored values compare exactly with pagination cursors
+    timestamp = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+    question_hash = db.Column(db.String(64), index=True)
+
+    __table_args__ = (
+        db.Index('ix_chat_history_user_timestamp', 'user_id', 'timestamp', 'id'),
+    )
+
+class SuggestedQuestion(db.Model):
+    __tablename__ = 'suggested_question'
+    id = db.Column(db.Integer, primary_key=True)
+    chunk_id = db.Column(db.String(64), nullable=False, index=True)
+    question = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+    __table_args__ = (
+        db.Index('uq_suggested_question_chunk_question', 'chunk_id', 'question', unique=True),
+    )
+
+class SuggestionAttempt(db.Model):
+    """
+    Chunks claimed for question generation, or whose generation failed or returned
+    no questions and is retried with backoff.
+    """
+    __tablename__ = 'suggestion_attempt'
+    chunk_id = db.Column(db.String(64), primary_key=True)
+    failures = db.Column(db.Integer, nullable=False)
+    retry_at = db.Column(db.DateTime, nullable=False, index=True)
+
+class TokenUsage(db.Model):
+    __tablename__ = 'token_usage'
+    id = db.Column(db.Integer, primary_key=True)
+    period_start = db.Column(db.DateTime, nullable=False, index=True)
+    model = db.Column(db.String(100), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
+    input_tokens = db.Column(db.Integer, nullable=False)
+    output_tokens = db.Column(db.Integer, nullable=False)
+    calls = db.Column(db.Integer, nullable=False)
 
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.filter_by(id=user_id).first()
 
 # Helper functions
+def hash_question(user_id, question):
+    return hashlib.sha256(f"{user_id}\n{question}".encode('utf-8')).hexdigest()
+
+def find_chat(user_id, question):
+    """Return the stored answer columns for a user's question, using the hash index."""
+    return db.session.query(ChatHistory.answer, ChatHistory.follow_ups).filter(
+        ChatHistory.question_hash == hash_question(user_id, question),
+        ChatHistory.user_id == user_id,
+        ChatHistory.question == question
+    ).first()
+
+def upgrade_chat_history_schema():
+    """Add the question hash column and indexes to databases created before they existed."""
+    columns = {column['name'] for column in db.inspect(db.engine).get_columns('chat_history')}
+    if 'question_hash' not in columns:
+        with db.engine.begin() as connection:
+            connection.execute(db.text('ALTER TABLE chat_history ADD COLUMN question_hash VARCHAR(64)'))
+            rows = connection.execute(db.text('SELECT id, user_id, question FROM chat_history')).fetchall()
+            connection.execute(db.text('UPDATE chat_history SET question_hash = :hash WHERE id = :id'),
+                               [{'hash': hash_question(user_id, question), 'id': chat_id}
+                                for chat_id, user_id, question in rows])
+    if db.engine.dialect.name == 'sqlite':
+        # Rows written by CURRENT_TIMESTAMP lack the microseconds SQLAlchemy stores
+        with db.engine.begin() as connection:
+            connection.execute(db.text(
+                "UPDATE chat_history SET timestamp = strftime('%Y-%m-%d %H:%M:%f', timestamp) || '000' "
+                "WHERE length(timestamp) = 19"
+            ))
+    for index in ChatHistory.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+
+def upgrade_suggested_question_schema():
+    """Drop duplicate suggestions and add the unique index to databases created before it existed."""
+    with db.engine.begin() as connection:
+        connection.execute(db.text(
+            'DELETE FROM suggested_question WHERE id NOT IN '
+            '(SELECT MIN(id) FROM suggested_question GROUP BY chunk_id, question)'
+        ))
+    for index in SuggestedQuestion.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+
+def insert_or_ignore(model):
+    """Return an INSERT for `model` that skips rows conflicting with a unique key."""
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+    return dialect.insert(model).on_conflict_do_nothing()
+
+def write_chat_rows(rows):
+    with timed('db_write'), app.app_context():
+        db.session.execute(db.insert(ChatHistory), rows)
+        db.session.commit()
+
+chat_writer = WriteBehindQueue(write_chat_rows, name='chat-history-writer')
+register_stats('cybel_cache', cache_stats)
+register_stats('cybel_chat_writer', chat_writer.stats)
+
 def save_chat_history(question, response, processing_time, user_id):
     try:
-        chat = ChatHistory(
-            user_id=user_id,
-            question=question,
-            answer=response['answer'],
-            follow_ups=json.dumps(response.get('follow_ups', [])),
-            processing_time=processing_time
-        )
-        db.session.add(chat)
-        db.session.commit()
+        row = {
+            'user_id': user_id,
+            'question': question,
+            'question_hash': hash_question(user_id, question),
+            'answer': response['answer'],
+            'follow_ups': json.dumps(response.get('follow_ups', [])),
+            'processing_time': processing_time,
+            'timestamp': datetime.now(timezone.utc).replace(tzinfo=None)
+        }
+        if app.config['CHAT_WRITE_BEHIND']:
+            chat_writer.put(row)
+        else:
+            write_chat_rows([row])
     except Exception as e:
         app.logger.error(f"Error saving chat history: {e}")
 
+def positive_int_arg(name, default):
+    """Read a positive integer query parameter, raising ValueError on a bad value."""
+    value = request.args.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValueError(f"'{name}' must be an integer.") from None
+    if value < 1:
+        raise ValueError(f"'{name}' must be at least 1.")
+    return value
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+# Suggested question pool, served from memory and refreshed in the background
+suggestion_pool = []
+suggestion_refresh_requested = threading.Event()
+suggestion_worker = None
+suggestion_worker_lock = threading.Lock()
+
+def load_suggestion_pool():
+    global suggestion_pool
+    suggestion_pool = [question for (question,) in db.session.query(SuggestedQuestion.question)]
+
+def claim_suggestion_chunk(chunk_id, now):
+    """
+    Claim a chunk before generating its questions, so concurrent workers (one per
+    gunicorn process) skip it until the claim is released or expires.
+    """
+    lease = now + timedelta(seconds=app.config['SUGGESTION_CLAIM_SECONDS'])
+    claimed = db.session.execute(insert_or_ignore(SuggestionAttempt).values(
+        chunk_id=chunk_id, failures=0, retry_at=lease)).rowcount == 1
+    if not claimed:
+        # Chunks backing off after a failure can be claimed once their retry time has passed
+        claimed = SuggestionAttempt.query.filter(
+            SuggestionAttempt.chunk_id == chunk_id, SuggestionAttempt.retry_at <= now
+        ).update({'retry_at': lease}, synchronize_session=False) == 1
+    if claimed and db.session.query(SuggestedQuestion.id).filter_by(chunk_id=chunk_id).first():
+        # Another worker stored questions for the chunk after `pending` was computed
+        SuggestionAttempt.query.filter_by(chunk_id=chunk_id).delete()
+        claimed = False
+    db.session.commit()
+    return claimed
+
+def record_failed_suggestion(chunk_id, now):
+    """Back off exponentially before retrying a chunk that produced no questions."""
+    attempt = db.session.get(SuggestionAttempt, chunk_id)
+    if attempt is None:
+        attempt = SuggestionAttempt(chunk_id=chunk_id, failures=0)
+        db.session.add(attempt)
+    attempt.failures += 1
+    delay = app.config['SUGGESTION_RETRY_SECONDS'] * 2 ** min(attempt.failures - 1, 10)
+    attempt.retry_at = now + timedelta(seconds=delay)
+
+def refresh_suggestion_pool(max_chunks):
+    """Drop questions of removed chunks and generate questions for up to `max_chunks` new ones."""
+    chunk_ids = set(get_chunk_ids())
+    existing = {chunk_id for (chunk_id,) in db.session.query(SuggestedQuestion.chunk_id).distinct()}
+    attempted = {chunk_id for (chunk_id,) in db.session.query(SuggestionAttempt.chunk_id)}
+
+    stale = existing - chunk_ids
+    if stale:
+        SuggestedQuestion.query.filter(SuggestedQuestion.chunk_id.in_(stale)).delete(synchronize_session=False)
+    if attempted - chunk_ids:
+        SuggestionAttempt.query.filter(SuggestionAttempt.chunk_id.in_(attempted - chunk_ids)).delete(
+            synchronize_session=False)
+    db.session.commit()
+
+    # Chunks that recently failed wait for their retry time, so they cannot crowd out new chunks
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    backing_off = {chunk_id for (chunk_id,) in
+                   db.session.query(SuggestionAttempt.chunk_id).filter(SuggestionAttempt.retry_at > now)}
+    pending = list(chunk_ids - existing - backing_off)[:max_chunks]
+    claimed = [chunk_id for chunk_id in pending if claim_suggestion_chunk(chunk_id, now)]
+    for chunk_id, questions in generate_chunk_questions(claimed):
+        if questions:
+            db.session.execute(insert_or_ignore(SuggestedQuestion),
+                               [{'chunk_id': chunk_id, 'question': q} for q in questions])
+            SuggestionAttempt.query.filter_by(chunk_id=chunk_id).delete()
+        else:
+            record_failed_suggestion(chunk_id, now)
+        db.session.commit()
+    load_suggestion_pool()
+
+def run_suggestion_worker():
+    while True:
+        with app.app_context():
+            try:
+                refresh_suggestion_pool(app.config['SUGGESTION_CHUNKS_PER_REFRESH'])
+            except Exception as e:
+                app.logger.error(f"Error refreshing suggestion pool: {e}")
+        suggestion_refresh_requested.wait(app.config['SUGGESTION_REFRESH_SECONDS'])
+        suggestion_refresh_requested.clear()
+
+def start_suggestion_worker():
+    global suggestion_worker
+    with suggestion_worker_lock:
+        if suggestion_worker is None:
+            suggestion_worker = threading.Thread(target=run_suggestion_worker, name='suggestion-pool', daemon=True)
+            suggestion_worker.start()
+
+token_usage_worker = None
+token_usage_worker_lock = threading.Lock()
+
+def write_token_usage(rows):
+    with app.app_context():
+        db.session.execute(db.insert(TokenUsage), rows)
+        db.session.commit()
+
+def flush_token_usage():
+    token_usage.flush_completed(write_token_usage)
+
+def run_token_usage_worker():
+    while True:
+        time.sleep(app.config['TOKEN_USAGE_FLUSH_SECONDS'])
+        try:
+            flush_token_usage()
+        except Exception as e:
+            app.logger.error(f"Error flushing token usage: {e}")
+
+def start_token_usage_worker():
+    global token_usage_worker
+    if token_usage_worker is not None or not app.config['TOKEN_USAGE_FLUSH_SECONDS']:
+        return
+    with token_usage_worker_lock:
+        if token_usage_worker is None:
+            token_usage_worker = threading.Thread(target=run_token_usage_worker, name='token-usage', daemon=True)
+            token_usage_worker.start()
+
+@app.before_request
+def attribute_token_usage():
+    # Started here so usage is persisted however the app is served, not only under __main__
+    start_token_usage_worker()
+    token_user.set(current_user.id if current_user.is_authenticated else None)
+
+# Created and upgraded at import, so the schema is current however the app is served
+with app.app_context():
+    db.create_all()
+    upgrade_chat_history_schema()
+    upgrade_suggested_question_schema()
+
 # Routes
 @app.route('/signup', methods=['GET', 'POST'])
 def signup():
@@ -114,12 +385,32 @@ def home():
 @login_required
 def random_questions():
     try:
+        start_suggestion_worker()
+        pool = suggestion_pool
+        if len(pool) >= 3:
+            return jsonify(random.sample(pool, 3))
         questions = get_random_document_chunks()
         return jsonify(questions)
     except Exception as e:
         app.logger.error(f"Error fetching random questions: {e}")
         return jsonify({'error': 'Unable to fetch random questions.'}), 500
 
+@app.route('/cache_stats')
+@login_required
+def get_cache_stats():
+    return jsonify({**cache_stats(), 'chat_writer': chat_writer.stats()})
+
+@app.route('/metrics')
+def metrics():
+    return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
+
+@app.route('/token_usage')
+@login_required
+def get_token_usage():
+    window_seconds = request.args.get('window_seconds', type=int)
+    return jsonify({'user': token_usage.totals(window_seconds, user_id=current_user.id),
+                    'total': token_usage.totals(window_seconds)})
+
 @app.route('/chat')
 @login_required
 def chat():
@@ -129,15 +420,43 @@ def chat():
 @login_required
 def chat_history():
     try:
-        history = ChatHistory.query.filter_by(user_id=current_user.id).order_by(ChatHistory.timestamp.desc()).all()
-        chat_data = [{
-            'question': chat.question,
-            'answer': chat.answer,
-            'follow_ups': json.loads(chat.follow_ups),
-            'processing_time': chat.processing_time,
-            'timestamp': chat.timestamp
-        } for chat in history]
-        return jsonify(chat_data)
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+        include_answers = request.args.get('include_answers', 'false').lower() == 'true'
+        cursor = request.args.get('cursor')
+
+        columns = [ChatHistory.id, ChatHistory.question, ChatHistory.processing_time, ChatHistory.timestamp]
+        if include_answers:
+            columns += [ChatHistory.answer, ChatHistory.follow_ups]
+        query = db.session.query(*columns).filter(ChatHistory.user_id == current_user.id)
+
+        # Keyset pagination on (timestamp, id), newest first
+        if cursor:
+            timestamp, chat_id = cursor.rsplit('_', 1)
+            timestamp, chat_id = datetime.fromisoformat(timestamp), int(chat_id)
+            query = query.filter(db.or_(ChatHistory.timestamp < timestamp,
+                                        db.and_(ChatHistory.timestamp == timestamp, ChatHistory.id < chat_id)))
+        history = query.order_by(ChatHistory.timestamp.desc(), ChatHistory.id.desc()).limit(limit + 1).all()
+
+        chat_data = []
+        for chat in history[:limit]:
+            item = {
+                'id': chat.id,
+                'question': chat.question,
+                'processing_time': chat.processing_time,
+                'timestamp': chat.timestamp
+            }
+            if include_answers:
+                item['answer'] = chat.answer
+                item['follow_ups'] = json.loads(chat.follow_ups)
+            chat_data.append(item)
+
+        next_cursor = None
+        if len(history) > limit:
+            last = history[limit - 1]
+            next_cursor = f"{last.timestamp.isoformat()}_{last.id}"
+        return jsonify({'items': chat_data, 'next_cursor': next_cursor})
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Invalid cursor.'}), 400
     except Exception as e:
         app.logger.error(f"Error fetching chat history: {e}")
         return jsonify({'error': 'Unable to fetch chat history.'}), 500
@@ -158,7 +477,8 @@ def ask():
         if not question:
             return jsonify({'error': 'Question cannot be empty or null.'}), 400
         
-        chat = ChatHistory.query.filter_by(user_id=current_user.id, question=question).first()
+        chat = find_chat(current_user.id, question)
+        CACHE_LOOKUPS.labels('history', 'hit' if chat else 'miss').inc()
         if chat:
             response = {
                 'answer': chat.answer,
@@ -166,24 +486,151 @@ def ask():
                 'processing_time': time.time() - start_time,
                 'source': 'history'
             }
+            REQUEST_LATENCY.labels('ask', 'history').observe(response['processing_time'])
             return jsonify(response)
         
-        response = process_query(question, number_of_results=number_of_results,
-                                 is_rephrased=is_rephrased)
+        query_embedding = ANSWER_CACHE.embed(question)
+        cache_params = {'number_of_results': number_of_results, 'is_rephrased': is_rephrased}
+        response = ANSWER_CACHE.lookup(question, embedding=query_embedding, **cache_params)
+        CACHE_LOOKUPS.labels('answer', 'hit' if response else 'miss').inc()
+        if response:
+            processing_time = time.time() - start_time
+            save_chat_history(question, response, processing_time, current_user.id)
+            REQUEST_LATENCY.labels('ask', 'cache').observe(processing_time)
+            return jsonify({**response, 'processing_time': processing_time, 'source': 'cache'})
+
+        if app.config['ASYNC_PIPELINE']:
+            response = PIPELINE_LOOP.run(aprocess_query(question, number_of_results=number_of_results,
+                                                        is_rephrased=is_rephrased),
+                                         timeout=app.config['PIPELINE_TIMEOUT_SECONDS'])
+        else:
+            response = process_query(question, number_of_results=number_of_results,
+                                     is_rephrased=is_rephrased)
+        ANSWER_CACHE.store(question, response, embedding=query_embedding, **cache_params)
         processing_time = time.time() - start_time
         save_chat_history(question, response, processing_time, current_user.id)
+        REQUEST_LATENCY.labels('ask', 'generated').observe(processing_time)
         return jsonify({**response, 'processing_time': processing_time, 'source': 'generated'})
+    except TimeoutError:
+        app.logger.error("Timed out processing request")
+        return jsonify({'error': 'Timed out while processing your question.'}), 504
     except Exception as e:
         app.logger.error(f"Error processing request: {e}")
         return jsonify({'error': 'An error occurred while processing your question.'}), 500
 
+@app.route('/ask_stream', methods=['POST'])
+@login_required
+def ask_stream():
+    start_time = time.time()
+    data = request.get_json()
+    if not data or 'question' not in data:
+        return jsonify({'error': 'Question cannot be empty or null.'}), 400
+
+    question = data['question'].strip().lower()
+    number_of_results = data.get('number_of_results', 5)
+    is_rephrased = data.get('is_rephrased', True)
+
+    if not question:
+        return jsonify({'error': 'Question cannot be empty or null.'}), 400
+
+    user_id = current_user.id
+    chat = find_chat(user_id, question)
+
+    def generate():
+        CACHE_LOOKUPS.labels('history', 'hit' if chat else 'miss').inc()
+        if chat:
+            processing_time = time.time() - start_time
+            REQUEST_LATENCY.labels('ask_stream', 'history').observe(processing_time)
+            yield format_sse('done', {
+                'answer': chat.answer,
+                'follow_ups': json.loads(chat.follow_ups),
+                'processing_time': processing_time,
+                'source': 'history'
+            })
+            return
+        try:
+            query_embedding = ANSWER_CACHE.embed(question)
+            cache_params = {'number_of_results': number_of_results, 'is_rephrased': is_rephrased}
+            cached = ANSWER_CACHE.lookup(question, embedding=query_embedding, **cache_params)
+            CACHE_LOOKUPS.labels('answer', 'hit' if cached else 'miss').inc()
+            if cached:
+                processing_time = time.time() - start_time
+                save_chat_history(question, cached, processing_time, user_id)
+                REQUEST_LATENCY.labels('ask_stream', 'cache').observe(processing_time)
+                yield format_sse('done', {**cached, 'processing_time': processing_time, 'source': 'cache'})
+                return
+
+            for event, payload in stream_query(question, number_of_results=number_of_results,
+                                               is_rephrased=is_rephrased):
+                if event == 'done':
+                    ANSWER_CACHE.store(question, payload, embedding=query_embedding, **cache_params)
+                    processing_time = time.time() - start_time
+                    save_chat_history(question, payload, processing_time, user_id)
+                    REQUEST_LATENCY.labels('ask_stream', 'generated').observe(processing_time)
+                    payload = {**payload, 'processing_time': processing_time, 'source': 'generated'}
+                yield format_sse(event, payload)
+        except Exception as e:
+            app.logger.error(f"Error streaming response: {e}")
+            yield format_sse('error', {'error': 'An error occurred while processing your question.'})
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/ask_batch', methods=['POST'])
+@login_required
+def ask_batch():
+    """
+    Answer a batch of questions, sent as {"questions": [...]} or as a JSONL
+    body, streaming one JSON result per line as answers complete.
+
+    Parameters (number_of_results, concurrency, is_rephrased) are read from
+    the query string for both body formats.
+    """
+    try:
+        if request.is_json:
+            data = request.get_json(silent=True)
+            if not isinstance(data, dict) or not isinstance(data.get('questions'), list):
+                raise ValueError('Body must be an object with a "questions" list.')
+            if not all(isinstance(question, str) for question in data['questions']):
+                raise ValueError('Questions must be strings.')
+            records = [{'question': question} for question in data['questions']]
+        else:
+            records = parse_question_records(request.get_data(as_text=True).splitlines())
+        number_of_results = positive_int_arg('number_of_results', 5)
+        concurrency = min(positive_int_arg('concurrency', BATCH_CONCURRENCY), BATCH_CONCURRENCY)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    questions = [record['question'].strip().lower() for record in records]
+    if not questions or not all(questions):
+        return jsonify({'error': 'Questions cannot be empty or null.'}), 400
+    if len(questions) > app.config['MAX_BATCH_QUESTIONS']:
+        return jsonify({'error': f"At most {app.config['MAX_BATCH_QUESTIONS']} questions per batch."}), 400
+
+    is_rephrased = request.args.get('is_rephrased', 'false').lower() == 'true'
+
+    def generate():
+        try:
+            results = abatch_process_queries(questions, number_of_results=number_of_results,
+                                             is_rephrased=is_rephrased, concurrency=concurrency)
+            for idx, result in PIPELINE_LOOP.iterate(results, timeout=app.config['PIPELINE_TIMEOUT_SECONDS']):
+                yield json.dumps({**records[idx], 'index': idx, **result}) + '\n'
+        except Exception as e:
+            app.logger.error(f"Error processing batch: {e}")
+            yield json.dumps({'error': 'An error occurred while processing the batch.'}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/store_data', methods=['GET'])
 @login_required
 def store_data():
     try:
         data_dir = "src/input_data"
         filenames = [f for f in os.listdir(data_dir) if f.endswith('.json')]
-        store_file_in_chromadb_txt_file(data_dir, filenames)
+        store_file_in_chromadb_txt_file(data_dir, filenames, incremental=True)
+        ANSWER_CACHE.clear()
+        start_suggestion_worker()
+        suggestion_refresh_requested.set()
         return jsonify({'status': 'success'})
     except Exception as e:
         app.logger.error(f"Error storing data: {e}")
@@ -193,6 +640,7 @@ def store_data():
 @login_required
 def clear_chat_history():
     try:
+        chat_writer.flush()
         ChatHistory.query.filter_by(user_id=current_user.id).delete()
         db.session.commit()
         return jsonify({'status': 'success'})
@@ -201,6 +649,5 @@ def clear_chat_history():
         return jsonify({'error': 'Unable to clear chat history.'}), 500
 
 if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()  # Initialize database tables
+    start_suggestion_worker()
     app.run(host='0.0.0.0', port=5001)
@@ -0,0 +1,47 @@
+import sys
+import json
+import time
+import asyncio
+import argparse
+from src.query_chromadb import abatch_process_queries, parse_question_records, BATCH_CONCURRENCY
+
+
+async def answer_records(records, output, number_of_results, is_rephrased, concurrency):
+    questions = [record["question"].strip().lower() for record in records]
+    answered = failed = 0
+    async for idx, result in abatch_process_queries(questions, number_of_results=number_of_results,
+                                                    is_rephrased=is_rephrased, concurrency=concurrency):
+        output.write(json.dumps({**records[idx], "index": idx, **result}) + "\n")
+        output.flush()
+        answered += 1
+        failed += "error" in result
+    return answered, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions against the knowledge bank.")
+    parser.add_argument("input", help='JSONL file of questions, each a string or an object with a "question" field')
+    parser.add_argument("--output", help="Write JSONL results to this file instead of stdout")
+    parser.add_argument("--number-of-results", type=int, default=5)
+    parser.add_argument("--rephrase", action="store_true", help="Rephrase each question with the LLM first")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="Maximum LLM calls in flight")
+    args = parser.parse_args()
+
+    with open(args.input, "r", encoding="utf-8") as f:
+        records = parse_question_records(f)
+    if not records:
+        raise ValueError("No questions found in the input file.")
+
+    start_time = time.time()
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        answered, failed = asyncio.run(answer_records(records, output, args.number_of_results,
+                                                      args.rephrase, max(1, args.concurrency)))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    print(f"Answered {answered} questions ({failed} failed) in {time.time() - start_time:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
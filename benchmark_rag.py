@@ -0,0 +1,406 @@
+import os
+import json
+import time
+import glob
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import httpx
+
+TOPICS = ["firewall", "endpoint agent", "vulnerability scan", "access policy", "audit log",
+          "threat feed", "incident report", "backup schedule", "password rotation", "network segment"]
+VERBS = ["configures", "monitors", "blocks", "reports", "encrypts", "isolates", "escalates", "rotates"]
+OBJECTS = ["inbound traffic", "user sessions", "critical alerts", "device inventory", "admin accounts",
+           "patch levels", "api tokens", "remote connections"]
+
+
+def rss_mb(pid="self"):
+    """Resident set size of a process in MB (Linux only), None once it has exited."""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except (FileNotFoundError, ProcessLookupError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def child_pids():
+    pids = set()
+    for task in os.listdir("/proc/self/task"):
+        try:
+            with open(f"/proc/self/task/{task}/children") as f:
+                pids.update(int(pid) for pid in f.read().split())
+        except FileNotFoundError:
+            continue
+    return pids
+
+
+class RSSSampler:
+    """
+    Record the peak RSS of this process and of every worker process it spawns.
+    """
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.peaks = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _sample(self):
+        for pid in ["self", *child_pids()]:
+            rss = rss_mb(pid)
+            if rss is not None:
+                self.peaks[pid] = max(self.peaks.get(pid, 0.0), rss)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self._sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+    def report(self):
+        workers = [rss for pid, rss in self.peaks.items() if pid != "self"]
+        return {
+            "main_peak_mb": self.peaks.get("self", 0.0),
+            "worker_count": len(workers),
+            "worker_peak_mb_max": max(workers, default=0.0),
+            "worker_peak_mb_mean": float(np.mean(workers)) if workers else 0.0,
+        }
+
+
+def stub_completion(prompt: str, completion_tokens: int) -> str:
+    """
+    Deterministic completion in the format `parse_response` expects for
+    answer prompts, and a plain rewrite of the query for anything else.
+    """
+    rng = random.Random(prompt)
+    if "### Query:" not in prompt:
+        query = prompt.split("Query:")[-1].strip() or "the question"
+        return f"What does the knowledge bank say about {query}"
+
+    words = " ".join(rng.choice(TOPICS + VERBS + OBJECTS) for _ in range(max(completion_tokens - 30, 1)))
+    return (f"Answer:\n{words}.\n\n"
+            f"Follow-up Questions:\n"
+            f"1. How is the {rng.choice(TOPICS)} configured?\n"
+            f"2. Who {rng.choice(VERBS)} {rng.choice(OBJECTS)}?\n"
+            f"3. Where are {rng.choice(OBJECTS)} reported?\n\n"
+            f"References:\n1. Source 0\n2. Source 1")
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """
+    OpenAI-compatible chat completions endpoint with a fixed time to first
+    token and a fixed token rate. Serves both the Groq (/openai/v1/...) and
+    OpenAI (/v1/...) paths, streamed or not.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body: bytes, content_type="application/json", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.endswith("/chat/completions"):
+            self._send(404, b'{"error": {"message": "not found"}}')
+            return
+
+        prompt = request["messages"][-1]["content"]
+        content = stub_completion(prompt, self.server.completion_tokens)
+        tokens = [word + " " for word in content.split(" ")]
+        token_delay = 1.0 / self.server.tokens_per_second
+        completion = {"id": f"stub-{time.time_ns()}", "created": int(time.time()), "model": request.get("model")}
+        time.sleep(self.server.latency)
+
+        if not request.get("stream"):
+            time.sleep(token_delay * len(tokens))
+            self._send(200, json.dumps({
+                **completion,
+                "object": "chat.completion",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": len(tokens),
+                          "total_tokens": len(prompt.split()) + len(tokens)},
+            }).encode())
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def write_event(data: str):
+            payload = f"data: {data}\n\n".encode()
+            self.wfile.write(f"{len(payload):x}\r\n".encode() + payload + b"\r\n")
+            self.wfile.flush()
+
+        for token in tokens:
+            time.sleep(token_delay)
+            write_event(json.dumps({**completion, "object": "chat.completion.chunk",
+                                    "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}))
+        write_event(json.dumps({**completion, "object": "chat.completion.chunk",
+                                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}))
+        write_event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def start_stub_llm(latency: float, tokens_per_second: float, completion_tokens: int):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubLLMHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.tokens_per_second = tokens_per_second
+    server.completion_tokens = completion_tokens
+    threading.Thread(target=server.serve_forever, name="stub-llm", daemon=True).start()
+    return server
+
+
+def write_fixture_corpus(data_dir: str, documents: int, paragraphs: int, seed: int = 0):
+    """
+    Write a deterministic corpus in the scraped-page JSON format read by
+    `create_knowledge_bank`.
+
+    Returns:
+        list: The written filenames.
+    """
+    rng = random.Random(seed)
+    filenames = []
+    for doc_idx in range(documents):
+        topic = TOPICS[doc_idx % len(TOPICS)]
+        sentences = [f"The {topic} {rng.choice(VERBS)} {rng.choice(OBJECTS)} for site {rng.randint(1, 50)}."
+                     for _ in range(paragraphs * 6)]
+        content = {
+            "context": "\n\n".join(" ".join(sentences[i:i + 6]) for i in range(0, len(sentences), 6)),
+            "metadata": {"source": f"https://fixtures.local/{doc_idx}", "title": f"{topic.title()} guide {doc_idx}"},
+        }
+        filename = f"fixture_{doc_idx:05d}.json"
+        with open(os.path.join(data_dir, filename), "w", encoding="utf-8") as f:
+            json.dump(content, f)
+        filenames.append(filename)
+    return filenames
+
+
+def fixture_questions(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    return [f"how does the {rng.choice(TOPICS)} handle {rng.choice(OBJECTS)} on site {rng.randint(1, 50)}"
+            for _ in range(count)]
+
+
+def percentiles(samples):
+    if not samples:
+        return {"count": 0}
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99]) * 1000
+    return {"count": len(samples), "mean_ms": float(np.mean(samples) * 1000),
+            "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99)}
+
+
+def start_app_server(app):
+    from werkzeug.serving import make_server
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="benchmark-app", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def login(base_url: str) -> httpx.Client:
+    client = httpx.Client(base_url=base_url, timeout=300,
+                          limits=httpx.Limits(max_connections=256, max_keepalive_connections=256))
+    account = {"name": "Benchmark", "email": "benchmark@fixtures.local", "password": "benchmark",
+               "designation": "benchmark"}
+    client.post("/signup", data=account)
+    client.post("/login", data={"email": account["email"], "password": account["password"]})
+    return client
+
+
+def replay(client: httpx.Client, questions: list, qps: float, concurrency: int, endpoint: str,
+           number_of_results: int, is_rephrased: bool):
+    """
+    Send the questions open-loop at `qps`, so slow responses queue up
+    instead of lowering the offered load.
+
+    Returns:
+        tuple: Per-request records and the wall-clock duration.
+    """
+    records = []
+
+    def send(question, scheduled):
+        start = time.perf_counter()
+        try:
+            body = {"question": question, "number_of_results": number_of_results, "is_rephrased": is_rephrased}
+            if endpoint == "/ask_stream":
+                source = None
+                with client.stream("POST", endpoint, json=body) as response:
+                    for line in response.iter_lines():
+                        if line.startswith("data: ") and '"source"' in line:
+                            source = json.loads(line[len("data: "):]).get("source")
+                status = response.status_code
+            else:
+                response = client.post(endpoint, json=body)
+                status = response.status_code
+                source = response.json().get("source") if status == 200 else None
+        except httpx.HTTPError:
+            status, source = None, None
+        end = time.perf_counter()
+        records.append({"status": status, "source": source, "latency": end - start,
+                        "queueing": start - scheduled})
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for idx, question in enumerate(questions):
+            scheduled = start_time + idx / qps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(send, question, scheduled)
+    return records, time.perf_counter() - start_time
+
+
+def reset_work_dir(work_dir: str):
+    """Remove what an earlier run left in `work_dir`, so every run starts from an empty knowledge bank."""
+    for name in ("input_data", "chromadb_persist"):
+        shutil.rmtree(os.path.join(work_dir, name), ignore_errors=True)
+    for pattern in ("chat_history.db*", "embedding_cache.sqlite3*"):
+        for path in glob.glob(os.path.join(work_dir, pattern)):
+            os.remove(path)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ingestion and /ask end to end against a stub LLM.")
+    parser.add_argument("--questions", help="Question log to replay, one question per line; generated if not set")
+    parser.add_argument("--requests", type=int, default=200, help="Requests to send when generating questions")
+    parser.add_argument("--qps", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--endpoint", choices=["/ask", "/ask_stream"], default="/ask")
+    parser.add_argument("--number-of-results", type=int, default=5)
+    parser.add_argument("--rephrase", action="store_true", help="Ask with is_rephrased=true")
+    parser.add_argument("--documents", type=int, default=200, help="Fixture corpus size in pages")
+    parser.add_argument("--paragraphs", type=int, default=8, help="Paragraphs per fixture page")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--ingest-workers", type=int, default=None)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Stub time to first token, in seconds")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--llm-completion-tokens", type=int, default=150)
+    parser.add_argument("--work-dir", help="Keep the corpus, Chroma store and database here instead of a temp dir; "
+                                           "a previous run's files there are replaced")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="cybel-benchmark-")
+    reset_work_dir(work_dir)
+    data_dir = os.path.join(work_dir, "input_data")
+    os.makedirs(data_dir, exist_ok=True)
+
+    stub = start_stub_llm(args.llm_latency, args.llm_tokens_per_second, args.llm_completion_tokens)
+    # The app reads these when it is imported, so they are set before the imports below
+    os.environ["LLM_BASE_URL"] = f"http://127.0.0.1:{stub.server_port}"
+    os.environ.setdefault("GROQ_API_KEY", "stub")
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(work_dir, 'chat_history.db')}"
+    os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(work_dir, "embedding_cache.sqlite3")
+
+    from src import create_knowledge_bank, query_chromadb
+    from src.metrics import add_stage_listener
+    from app import app, chat_writer
+
+    persist_directory = os.path.join(work_dir, "chromadb_persist")
+    create_knowledge_bank.persist_directory = persist_directory
+    query_chromadb.persist_directory = persist_directory
+    query_chromadb.ANSWER_CACHE.persist_directory = persist_directory
+
+    stage_samples = defaultdict(list)
+    add_stage_listener(lambda stage, duration: stage_samples[stage].append(duration))
+
+    filenames = write_fixture_corpus(data_dir, args.documents, args.paragraphs)
+    with RSSSampler() as ingestion_rss:
+        start_time = time.perf_counter()
+        create_knowledge_bank.store_file_in_chromadb_txt_file(data_dir, filenames, chunk_size=args.chunk_size,
+                                                              workers=args.ingest_workers)
+        ingestion_seconds = time.perf_counter() - start_time
+    chunks = create_knowledge_bank.get_vector_store()._collection.count()
+    ingestion_stages = {stage: percentiles(samples) for stage, samples in stage_samples.items()}
+    stage_samples.clear()
+
+    if args.questions:
+        with open(args.questions, "r", encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip()]
+    else:
+        questions = fixture_questions(args.requests)
+
+    server, base_url = start_app_server(app)
+    client = login(base_url)
+    try:
+        with RSSSampler() as serving_rss:
+            records, duration = replay(client, questions, args.qps, args.concurrency, args.endpoint,
+                                       args.number_of_results, args.rephrase)
+            chat_writer.flush()
+    finally:
+        client.close()
+        server.shutdown()
+        stub.shutdown()
+
+    succeeded = [record for record in records if record["status"] == 200]
+    sources = defaultdict(int)
+    for record in succeeded:
+        sources[record["source"]] += 1
+    report = {
+        "commit": git_commit(),
+        "config": vars(args),
+        "ingestion": {
+            "files": len(filenames),
+            "chunks": chunks,
+            "seconds": ingestion_seconds,
+            "chunks_per_second": chunks / ingestion_seconds if ingestion_seconds else 0.0,
+            "stages": ingestion_stages,
+            "rss": ingestion_rss.report(),
+        },
+        "serving": {
+            "requests": len(records),
+            "errors": len(records) - len(succeeded),
+            "seconds": duration,
+            "offered_qps": args.qps,
+            "requests_per_second": len(succeeded) / duration if duration else 0.0,
+            "sources": dict(sources),
+            "latency": percentiles([record["latency"] for record in succeeded]),
+            "queueing": percentiles([record["queueing"] for record in records]),
+            "stages": {stage: percentiles(samples) for stage, samples in sorted(stage_samples.items())},
+            "rss": serving_rss.report(),
+        },
+    }
+
+    print(json.dumps(report, indent=4))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import gc
+import os
+import json
+import time
+import argparse
+import numpy as np
+from src.embedder import EMBEDDING_BACKENDS, load_sentence_transformer, initialize_vector_store
+
+MODEL_NAME = "all-MPNet-base-v2"
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB (Linux only)."""
+    with open("/proc/self/statm") as f:
+        resident_pages = int(f.read().split()[1])
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def evaluate_backend(backend, documents, queries, top_k):
+    """
+    Embed the corpus and queries with one backend and time the query path.
+
+    Returns:
+        dict: Embeddings, top-k document indices per query and cost figures.
+    """
+    gc.collect()
+    rss_before = current_rss_mb()
+    model = load_sentence_transformer(MODEL_NAME, backend)
+    rss_model = current_rss_mb() - rss_before
+
+    document_embeddings = normalize(model.encode(documents, convert_to_numpy=True, batch_size=64))
+
+    latencies = []
+    query_embeddings = []
+    for query in queries:
+        start_time = time.perf_counter()
+        query_embeddings.append(model.encode([query], convert_to_numpy=True)[0])
+        latencies.append(time.perf_counter() - start_time)
+    query_embeddings = normalize(np.stack(query_embeddings))
+
+    scores = query_embeddings @ document_embeddings.T
+    top_indices = np.argsort(-scores, axis=1)[:, :top_k]
+
+    del model
+    gc.collect()
+    return {
+        "query_embeddings": query_embeddings,
+        "top_indices": top_indices,
+        "model_rss_mb": rss_model,
+        "query_latency_ms_mean": float(np.mean(latencies) * 1000),
+        "query_latency_ms_p95": float(np.percentile(latencies, 95) * 1000),
+    }
+
+
+def compare_to_baseline(baseline, candidate, top_k):
+    """Recall@k of the candidate's retrievals against the fp32 baseline."""
+    recalls = [len(set(base) & set(cand)) / top_k
+               for base, cand in zip(baseline["top_indices"], candidate["top_indices"])]
+    cosine = np.sum(baseline["query_embeddings"] * candidate["query_embeddings"], axis=1)
+    return {
+        f"recall_at_{top_k}_vs_fp32": float(np.mean(recalls)),
+        "query_cosine_vs_fp32_mean": float(np.mean(cosine)),
+        "query_cosine_vs_fp32_min": float(np.min(cosine)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare embedding backends against the fp32 baseline.")
+    parser.add_argument("queries", help="Held-out queries, one per line")
+    parser.add_argument("--backends", nargs="+", default=[b for b in EMBEDDING_BACKENDS if b != "torch"],
+                        choices=EMBEDDING_BACKENDS)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--max-documents", type=int, default=2000)
+    parser.add_argument("--collection", default="my_documents")
+    parser.add_argument("--persist-directory", default="./chromadb_persist")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    with open(args.queries, "r", encoding="utf-8") as f:
+        queries = [line.strip() for line in f if line.strip()]
+
+    vector_store = initialize_vector_store("sentence_transformers", args.collection, args.persist_directory)
+    documents = vector_store._collection.get(include=["documents"], limit=args.max_documents)["documents"]
+    if not documents or not queries:
+        raise ValueError("Need a non-empty knowledge bank and query set to evaluate.")
+    print(f"Evaluating on {len(documents)} chunks and {len(queries)} queries")
+
+    baseline = evaluate_backend("torch", documents, queries, args.top_k)
+    report = {"torch": {key: baseline[key] for key in
+                        ("model_rss_mb", "query_latency_ms_mean", "query_latency_ms_p95")}}
+    for backend in args.backends:
+        result = evaluate_backend(backend, documents, queries, args.top_k)
+        report[backend] = {
+            "model_rss_mb": result["model_rss_mb"],
+            "query_latency_ms_mean": result["query_latency_ms_mean"],
+            "query_latency_ms_p95": result["query_latency_ms_p95"],
+            "speedup_vs_fp32": baseline["query_latency_ms_mean"] / result["query_latency_ms_mean"],
+            **compare_to_baseline(baseline, result, args.top_k),
+        }
+
+    print(json.dumps(report, indent=4))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
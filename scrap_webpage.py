@@ -6,7 +6,15 @@ import json
 from pathlib import Path
 from collections import defaultdict
 import re
+import random
 import unicodedata
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import sqlite3
+import posixpath
+from urllib.parse import urlparse, urljoin, urlsplit, urlunsplit, parse_qsl, urlencode
+from urllib.robotparser import RobotFileParser
 
 # Clean and normalize text
 def clean_text(text):
@@ -25,25 +33,86 @@ def hierarchy_to_markdown_with_markers(hierarchy):
             markdown.append(f"<para>{paragraph}</para>")  # Mark each paragraph
     return "\n".join(markdown)
 
+# Convert one table element to markdown rows with markers
+def table_to_markdown_with_markers(table):
+    table_rows = []
+    headers = [clean_text(header.text) for header in table.find_all('th')]
+    if headers:
+        table_rows.append(f"<table_header>{' | '.join(headers)}</table_header>")
+        table_rows.append(f"<table_divider>{' | '.join(['---'] * len(headers))}</table_divider>")
+    for row in table.find_all('tr'):
+        cols = [clean_text(td.text) for td in row.find_all('td')]
+        if cols:
+            table_rows.append(f"<table_row>{' | '.join(cols)}</table_row>")
+    if not table_rows:
+        return []
+    return ["<table_start>", *table_rows, "<table_end>"]
+
 # Extract tables in markdown with markers
 def extract_tables_with_markers(soup):
     tables_markdown = []
     for table in soup.find_all('table'):
-        table_rows = []
-        headers = [clean_text(header.text) for header in table.find_all('th')]
-        if headers:
-            table_rows.append(f"<table_header>{' | '.join(headers)}</table_header>")
-            table_rows.append(f"<table_divider>{' | '.join(['---'] * len(headers))}</table_divider>")
-        for row in table.find_all('tr'):
-            cols = [clean_text(td.text) for td in row.find_all('td')]
-            if cols:
-                table_rows.append(f"<table_row>{' | '.join(cols)}</table_row>")
-        if table_rows:
-            tables_markdown.append("<table_start>")
-            tables_markdown.extend(table_rows)
-            tables_markdown.append("<table_end>")
+        tables_markdown.extend(table_to_markdown_with_markers(table))
     return "\n".join(tables_markdown)
 
+# Supported BeautifulSoup parsers; lxml is considerably faster but optional
+HTML_PARSERS = ("html.parser", "lxml")
+
+# Parse a fetched HTML page into the knowledge-bank JSON format
+def parse_html(html, url, parser='html.parser'):
+    return parse_page(html, url, parser)[0]
+
+# Parse a page into the knowledge-bank JSON format, optionally collecting its links
+def parse_page(html, url, parser='html.parser', collect_links=False):
+    if parser not in HTML_PARSERS:
+        raise ValueError(f"Invalid HTML parser '{parser}'. Choose one of {HTML_PARSERS}.")
+    soup = BeautifulSoup(html, parser)
+
+    # Walk the document once, collecting the title, the header/paragraph
+    # hierarchy, the tables and the links in document order
+    title = None
+    hierarchy = defaultdict(list)
+    current_header = None
+    tables_markdown = []
+    links = []
+
+    tags = ['title', 'h1', 'h2', 'h3', 'p', 'table'] + (['a'] if collect_links else [])
+    for element in soup.find_all(tags):
+        if element.name == 'title':
+            if title is None:
+                title = clean_text(element.text)
+        elif element.name == 'table':
+            tables_markdown.extend(table_to_markdown_with_markers(element))
+        elif element.name == 'a':
+            if element.get('href') and 'nofollow' not in (element.get('rel') or []):
+                links.append(element['href'])
+        elif element.name.startswith('h'):
+            current_header = clean_text(element.text)
+            hierarchy[current_header] = []
+        elif current_header:
+            hierarchy[current_header].append(clean_text(element.text))
+
+    metadata = {
+        "title": title or "",
+        "source": url,
+    }
+
+    # Generate markdown with markers
+    markdown_hierarchy = hierarchy_to_markdown_with_markers(hierarchy)
+
+    # Combine content
+    body_content = [markdown_hierarchy]
+    if tables_markdown:
+        body_content.append("<section>Tables</section>")
+        body_content.append("\n".join(tables_markdown))
+
+    markdown = "\n\n".join(body_content)
+
+    return {
+        "context": markdown,
+        "metadata": metadata
+    }, links
+
 # Async function to scrape a webpage
 async def scrape_page(session, url):
     try:
@@ -53,82 +122,477 @@ async def scrape_page(session, url):
                 return None
 
             html = await response.text()
-            soup = BeautifulSoup(html, 'html.parser')
+            return {"url": url, "data": parse_html(html, url)}
 
-            # Extract metadata
-            title_tag = soup.find('title')
-            title = clean_text(title_tag.text) if title_tag else ""
+    except Exception as e:
+        print(f"Error scraping {url}: {e}")
+        return None
 
-            metadata = {
-                "title": title,
-                "source": url,
-            }
+# Statuses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
 
-            # Extract and organize content hierarchically
-            hierarchy = defaultdict(list)
-            current_header = None
+class CrawlSettings:
+    def __init__(self, max_concurrency=20, per_host_concurrency=4, per_host_delay=0.0, timeout=30.0,
+                 max_retries=3, backoff=1.0, cache_file=None, parser='html.parser', parse_workers=None,
+                 cache_save_every=100):
+        self.max_concurrency = max_concurrency
+        self.per_host_concurrency = per_host_concurrency
+        self.per_host_delay = per_host_delay  # Minimum seconds between request starts to one host
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.cache_file = cache_file  # ETag/Last-Modified cache, defaults to <output_dir>/.fetch_cache.json
+        self.cache_save_every = cache_save_every  # Save the cache after this many updates, so a crash loses little
+        self.parser = parser
+        self.parse_workers = parse_workers  # Parsing processes, defaults to the CPU count; 0 parses in a thread
 
-            for element in soup.find_all(['h1', 'h2', 'h3', 'p']):
-                if element.name.startswith('h'):
-                    current_header = clean_text(element.text)
-                    hierarchy[current_header] = []
-                elif element.name == 'p' and current_header:
-                    hierarchy[current_header].append(clean_text(element.text))
+# ETag/Last-Modified validators of previously fetched pages
+class FetchCache:
+    def __init__(self, path, save_every=None):
+        self.path = Path(path)
+        self.save_every = save_every
+        self.unsaved = 0
+        self.entries = {}
+        if self.path.exists():
+            with open(self.path, 'r') as f:
+                self.entries = json.load(f)
 
-            # Generate markdown with markers
-            markdown_hierarchy = hierarchy_to_markdown_with_markers(hierarchy)
+    def request_headers(self, url):
+        entry = self.entries.get(url, {})
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
 
-            # Extract tables
-            tables_markdown = extract_tables_with_markers(soup)
+    def update(self, url, response_headers):
+        etag = response_headers.get("ETag")
+        last_modified = response_headers.get("Last-Modified")
+        if etag or last_modified:
+            self.entries[url] = {"etag": etag, "last_modified": last_modified}
+            self.unsaved += 1
+            if self.save_every and self.unsaved >= self.save_every:
+                self.save()
 
-            # Combine content
-            body_content = [markdown_hierarchy]
-            if tables_markdown:
-                body_content.append("<section>Tables</section>")
-                body_content.append(tables_markdown)
+    def save(self):
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+        self.unsaved = 0
 
-            markdown = "\n\n".join(body_content)
+# Per-host concurrency limit and request spacing
+class HostLimiter:
+    def __init__(self, concurrency, delay):
+        self.delay = delay
+        self.host_delays = {}
+        self.semaphores = defaultdict(lambda: asyncio.Semaphore(concurrency))
+        self.locks = defaultdict(asyncio.Lock)
+        self.next_start = defaultdict(float)
 
-            result = {
-                "context": markdown,
-                "metadata": metadata
-            }
+    def set_delay(self, host, delay):
+        self.host_delays[host] = max(self.delay, delay)
 
-            return {"url": url, "data": result}
+    @asynccontextmanager
+    async def slot(self, host):
+        async with self.semaphores[host]:
+            delay = self.host_delays.get(host, self.delay)
+            if delay:
+                async with self.locks[host]:
+                    loop = asyncio.get_running_loop()
+                    wait_time = self.next_start[host] - loop.time()
+                    if wait_time > 0:
+                        await asyncio.sleep(wait_time)
+                    self.next_start[host] = loop.time() + delay
+            yield
 
-    except Exception as e:
-        print(f"Error scraping {url}: {e}")
-        return None
+# Fetch a page with retries, exponential backoff and conditional request headers
+async def fetch_page(session, url, limiter, settings, headers=None):
+    host = urlparse(url).netloc
+    for attempt in range(settings.max_retries + 1):
+        retry_after = None
+        try:
+            async with limiter.slot(host):
+                async with session.get(url, headers=headers,
+                                       timeout=aiohttp.ClientTimeout(total=settings.timeout)) as response:
+                    if response.status == 304:
+                        return 304, None, response.headers
+                    if response.status == 200:
+                        return 200, await response.text(), response.headers
+                    if response.status not in RETRY_STATUSES:
+                        print(f"Failed to fetch the page {url}: {response.status}")
+                        return response.status, None, response.headers
+                    retry_after = response.headers.get("Retry-After")
+                    error = f"status {response.status}"
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error = repr(e)
 
-# Async function to process all URLs from a file
-async def process_urls(input_file, output_dir):
+        if attempt == settings.max_retries:
+            print(f"Error scraping {url} after {attempt + 1} attempts: {error}")
+            return None, None, None
+        delay = settings.backoff * (2 ** attempt) * (1 + random.random() / 2)
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, int(retry_after))
+        await asyncio.sleep(delay)
+
+def write_result(filename, data):
+    with open(filename, 'w') as f:
+        json.dump(data, f, indent=4)
+
+# Runs in a worker process so parsing never blocks the fetch loop
+def parse_and_write(html, url, filename, parser='html.parser'):
+    write_result(filename, parse_html(html, url, parser))
+
+# Crawl URLs with bounded concurrency, writing each page to disk as soon as it is parsed
+async def crawl_urls(urls, output_dir, settings=None):
+    settings = settings or CrawlSettings()
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
+    cache = FetchCache(settings.cache_file or output_path / ".fetch_cache.json", settings.cache_save_every)
+    limiter = HostLimiter(settings.per_host_concurrency, settings.per_host_delay)
+    stats = {"fetched": 0, "unchanged": 0, "failed": 0}
+
+    # Bounded queue so the URL source is consumed lazily
+    url_queue = asyncio.Queue(maxsize=settings.max_concurrency * 2)
+
+    async def worker(session):
+        while True:
+            url = await url_queue.get()
+            try:
+                if url is None:
+                    return
+                filename = f"{output_path / sanitize_filename(url)}.json"
+                headers = cache.request_headers(url) if os.path.exists(filename) else None
+                status, html, response_headers = await fetch_page(session, url, limiter, settings, headers)
+                if status == 304:
+                    stats["unchanged"] += 1
+                elif status == 200:
+                    await loop.run_in_executor(parse_pool, parse_and_write, html, url, filename, settings.parser)
+                    cache.update(url, response_headers)
+                    stats["fetched"] += 1
+                else:
+                    stats["failed"] += 1
+            except Exception as e:
+                print(f"Error scraping {url}: {e}")
+                stats["failed"] += 1
+            finally:
+                url_queue.task_done()
+
+    loop = asyncio.get_running_loop()
+    # None selects the loop's default thread pool
+    parse_pool = ProcessPoolExecutor(settings.parse_workers) if settings.parse_workers != 0 else None
+
+    connector = aiohttp.TCPConnector(limit=settings.max_concurrency, limit_per_host=settings.per_host_concurrency)
+    try:
+        async with aiohttp.ClientSession(connector=connector) as session:
+            workers = [asyncio.create_task(worker(session)) for _ in range(settings.max_concurrency)]
+            for url in urls:
+                await url_queue.put(url)
+            for _ in workers:
+                await url_queue.put(None)
+            await asyncio.gather(*workers)
+    finally:
+        if parse_pool is not None:
+            parse_pool.shutdown()
+        cache.save()
+
+    print(f"Crawl finished: {stats['fetched']} fetched, {stats['unchanged']} unchanged, {stats['failed']} failed")
+    return stats
+
+# Query parameters that only track visitors and never change page content
+TRACKING_PARAMS = {"fbclid", "gclid", "mc_cid", "mc_eid", "ref"}
+
+# Normalize a URL so equivalent links map to one frontier entry
+def canonicalize_url(url, base=None):
+    try:
+        if base:
+            url = urljoin(base, url)
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:  # Malformed port or IPv6 literal
+        return None
+    if parts.scheme not in ("http", "https"):
+        return None
+    host = (parts.hostname or "").lower()
+    if ":" in host:
+        host = f"[{host}]"
+    if port and port != {"http": 80, "https": 443}[parts.scheme]:
+        host = f"{host}:{port}"
+    query = sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if key not in TRACKING_PARAMS and not key.startswith("utm_"))
+    path = posixpath.normpath(re.sub(r"/{2,}", "/", parts.path)) if parts.path else "/"
+    if parts.path.endswith("/") and path != "/":
+        path += "/"
+    return urlunsplit((parts.scheme, host, path, urlencode(query), ""))
+
+# 64-bit simhash over word 3-shingles of the extracted text
+def simhash(text, shingle_size=3):
+    words = re.sub(r"<[^>]+>", " ", text).lower().split()
+    shingles = [" ".join(words[i:i + shingle_size]) for i in range(max(1, len(words) - shingle_size + 1))]
+    weights = [0] * 64
+    for shingle in shingles:
+        value = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+# Near-duplicate detection over simhash fingerprints. Fingerprints within
+# `max_distance` bits share at least one of `max_distance + 1` bit blocks,
+# so only entries in matching blocks are compared.
+class NearDuplicateIndex:
+    def __init__(self, max_distance=3):
+        self.max_distance = max_distance
+        self.block_bits = 64 // (max_distance + 1)
+        self.blocks = defaultdict(list)
+
+    def _block_keys(self, fingerprint):
+        mask = (1 << self.block_bits) - 1
+        return [(i, fingerprint >> (i * self.block_bits) & mask) for i in range(self.max_distance + 1)]
+
+    def is_duplicate(self, fingerprint):
+        return any(bin(fingerprint ^ other).count("1") <= self.max_distance
+                   for key in self._block_keys(fingerprint) for other in self.blocks[key])
+
+    def add(self, fingerprint):
+        for key in self._block_keys(fingerprint):
+            self.blocks[key].append(fingerprint)
+
+# Persistent URL frontier, so an interrupted crawl resumes where it stopped
+class CrawlFrontier:
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            "url TEXT PRIMARY KEY, depth INTEGER NOT NULL, status TEXT NOT NULL DEFAULT 'pending', "
+            "fingerprint TEXT)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_urls_status ON urls (status)")
+        self.connection.commit()
+
+    def add(self, url, depth):
+        """Record a newly discovered URL; returns False if it was already known."""
+        cursor = self.connection.execute("INSERT OR IGNORE INTO urls (url, depth) VALUES (?, ?)", (url, depth))
+        self.connection.commit()
+        return cursor.rowcount == 1
+
+    def mark(self, url, status, fingerprint=None):
+        self.connection.execute("UPDATE urls SET status = ?, fingerprint = ? WHERE url = ?",
+                                (status, None if fingerprint is None else str(fingerprint), url))
+        self.connection.commit()
+
+    def pending(self):
+        return self.connection.execute("SELECT url, depth FROM urls WHERE status = 'pending'").fetchall()
+
+    def revisit_done(self):
+        """Queue the pages of a finished crawl again, so a new crawl picks up their changes."""
+        cursor = self.connection.execute("UPDATE urls SET status = 'pending' WHERE status = 'done'")
+        self.connection.commit()
+        return cursor.rowcount
+
+    def fingerprint(self, url):
+        row = self.connection.execute("SELECT fingerprint FROM urls WHERE url = ?", (url,)).fetchone()
+        return int(row[0]) if row and row[0] is not None else None
+
+    def fingerprints(self):
+        return [int(fp) for (fp,) in self.connection.execute(
+            "SELECT fingerprint FROM urls WHERE status = 'done' AND fingerprint IS NOT NULL")]
+
+    def count(self):
+        return self.connection.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
 
-    async with aiohttp.ClientSession() as session:
-        tasks = []
+    def close(self):
+        self.connection.close()
 
-        with open(input_file, 'r') as file:
-            urls = [line.strip() for line in file if line.strip()]
+# Fetch and parse robots.txt once per host
+class RobotsCache:
+    def __init__(self, session, user_agent="*"):
+        self.session = session
+        self.user_agent = user_agent
+        self.parsers = {}
 
-        for url in urls:
-            tasks.append(scrape_page(session, url))
+    async def get(self, url):
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        if origin not in self.parsers:
+            robots = RobotFileParser()
+            try:
+                async with self.session.get(f"{origin}/robots.txt", timeout=aiohttp.ClientTimeout(total=10)) as response:
+                    if response.status == 200:
+                        robots.parse((await response.text()).splitlines())
+                    else:
+                        robots.allow_all = True
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                robots.allow_all = True
+            self.parsers[origin] = robots
+        return self.parsers[origin]
 
-        results = await asyncio.gather(*tasks)
+    async def allowed(self, url):
+        return (await self.get(url)).can_fetch(self.user_agent, url)
 
-        # Save results to JSON files
-        for result in results:
-            if result:
-                url = result['url']
-                data = result['data']
+# Collect page URLs from a sitemap, following sitemap indexes
+async def fetch_sitemap_urls(session, sitemap_url, max_sitemaps=50):
+    urls, queue, visited = [], [sitemap_url], set()
+    while queue and len(visited) < max_sitemaps:
+        current = queue.pop()
+        if current in visited:
+            continue
+        visited.add(current)
+        try:
+            async with session.get(current, timeout=aiohttp.ClientTimeout(total=30)) as response:
+                if response.status != 200:
+                    continue
+                soup = BeautifulSoup(await response.text(), 'html.parser')
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"Error fetching sitemap {current}: {e}")
+            continue
+        locations = [clean_text(loc.text) for loc in soup.find_all('loc')]
+        if soup.find('sitemapindex'):
+            queue.extend(locations)
+        else:
+            urls.extend(locations)
+    return urls
+
+# Runs in a worker process: parse a page and fingerprint its extracted text
+def parse_for_crawl(html, url, parser='html.parser', collect_links=True):
+    data, links = parse_page(html, url, parser, collect_links)
+    return data, links, simhash(data["context"])
+
+# Crawl same-domain links from seed URLs, skipping near-duplicate pages
+async def crawl_site(seed_urls, output_dir, settings=None, max_depth=2, max_pages=1000,
+                     use_sitemaps=True, respect_robots=True, max_duplicate_distance=3):
+    settings = settings or CrawlSettings()
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    frontier = CrawlFrontier(output_path / ".crawl_frontier.sqlite3")
+    cache = FetchCache(settings.cache_file or output_path / ".fetch_cache.json", settings.cache_save_every)
+    limiter = HostLimiter(settings.per_host_concurrency, settings.per_host_delay)
+    duplicates = NearDuplicateIndex(max_duplicate_distance)
+    # Resume an interrupted crawl, or revisit the pages of a finished one
+    pending = frontier.pending()
+    if not pending and frontier.revisit_done():
+        pending = frontier.pending()
+    for fingerprint in frontier.fingerprints():
+        duplicates.add(fingerprint)
+    stats = {"fetched": 0, "unchanged": 0, "duplicates": 0, "disallowed": 0, "failed": 0}
+
+    seeds = [url for url in (canonicalize_url(url) for url in seed_urls) if url]
+    allowed_hosts = {urlsplit(url).netloc for url in seeds}
+    url_queue = asyncio.Queue()
+    enqueued = 0
+
+    def enqueue(url, depth):
+        nonlocal enqueued
+        if enqueued < max_pages and urlsplit(url).netloc in allowed_hosts and frontier.add(url, depth):
+            url_queue.put_nowait((url, depth))
+            enqueued += 1
+
+    async def worker(session, robots):
+        while True:
+            url, depth = await url_queue.get()
+            try:
+                if respect_robots and not await robots.allowed(url):
+                    frontier.mark(url, "disallowed")
+                    stats["disallowed"] += 1
+                    continue
                 filename = f"{output_path / sanitize_filename(url)}.json"
-                with open(filename, 'w') as f:
-                    json.dump(data, f, indent=4)
+                request_headers = cache.request_headers(url) if os.path.exists(filename) else None
+                status, html, headers = await fetch_page(session, url, limiter, settings, request_headers)
+                if status == 304:
+                    # Unchanged since the last crawl; its links are already in the frontier
+                    fingerprint = frontier.fingerprint(url)
+                    if fingerprint is not None:
+                        duplicates.add(fingerprint)
+                    frontier.mark(url, "done", fingerprint)
+                    stats["unchanged"] += 1
+                    continue
+                if status != 200 or "html" not in headers.get("Content-Type", "html"):
+                    frontier.mark(url, "failed")
+                    stats["failed"] += 1
+                    continue
+                data, links, fingerprint = await loop.run_in_executor(
+                    parse_pool, parse_for_crawl, html, url, settings.parser, depth < max_depth)
+                if duplicates.is_duplicate(fingerprint):
+                    frontier.mark(url, "duplicate", fingerprint)
+                    stats["duplicates"] += 1
+                else:
+                    duplicates.add(fingerprint)
+                    await asyncio.to_thread(write_result, filename, data)
+                    cache.update(url, headers)
+                    frontier.mark(url, "done", fingerprint)
+                    stats["fetched"] += 1
+                for link in links:
+                    link = canonicalize_url(link, base=url)
+                    if link:
+                        enqueue(link, depth + 1)
+            except Exception as e:
+                print(f"Error scraping {url}: {e}")
+                frontier.mark(url, "failed")
+                stats["failed"] += 1
+            finally:
+                url_queue.task_done()
+
+    loop = asyncio.get_running_loop()
+    parse_pool = ProcessPoolExecutor(settings.parse_workers) if settings.parse_workers != 0 else None
+    connector = aiohttp.TCPConnector(limit=settings.max_concurrency, limit_per_host=settings.per_host_concurrency)
+    try:
+        async with aiohttp.ClientSession(connector=connector) as session:
+            robots = RobotsCache(session)
+
+            # Queue the resumed or revisited pages, then add seeds and sitemap entries
+            for url, depth in pending:
+                url_queue.put_nowait((url, depth))
+                enqueued += 1
+            for url in seeds:
+                enqueue(url, 0)
+                if respect_robots:
+                    parser = await robots.get(url)
+                    if parser.crawl_delay("*"):
+                        limiter.set_delay(urlsplit(url).netloc, float(parser.crawl_delay("*")))
+            if use_sitemaps:
+                origins = {f"{urlsplit(url).scheme}://{urlsplit(url).netloc}" for url in seeds}
+                for origin in origins:
+                    sitemaps = (await robots.get(origin + "/")).site_maps() or [f"{origin}/sitemap.xml"]
+                    for sitemap in sitemaps:
+                        for url in await fetch_sitemap_urls(session, sitemap):
+                            url = canonicalize_url(url)
+                            if url:
+                                enqueue(url, 0)
+
+            workers = [asyncio.create_task(worker(session, robots)) for _ in range(settings.max_concurrency)]
+            await url_queue.join()
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+    finally:
+        if parse_pool is not None:
+            parse_pool.shutdown()
+        frontier.close()
+        cache.save()
+
+    print(f"Crawl finished: {stats['fetched']} fetched, {stats['unchanged']} unchanged, "
+          f"{stats['duplicates']} near-duplicates, "
+          f"{stats['disallowed']} disallowed by robots.txt, {stats['failed']} failed")
+    return stats
+
+def iter_urls(input_file):
+    with open(input_file, 'r') as file:
+        for line in file:
+            if line.strip():
+                yield line.strip()
+
+# Async function to process all URLs from a file
+async def process_urls(input_file, output_dir, settings=None):
+    return await crawl_urls(iter_urls(input_file), output_dir, settings)
 
 # Entry point
 if __name__ == "__main__":
     input_file = "urls.txt"  # File containing URLs separated by newlines
     output_dir = "src/input_data"  # Directory to save JSON files
+    crawl_mode = "list"  # Change to "site" to follow same-domain links from the listed URLs
     os.makedirs(output_dir, exist_ok=True)
 
-    asyncio.run(process_urls(input_file, output_dir))
+    if crawl_mode == "site":
+        asyncio.run(crawl_site(iter_urls(input_file), output_dir))
+    else:
+        asyncio.run(process_urls(input_file, output_dir))
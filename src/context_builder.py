@@ -0,0 +1,111 @@
+from collections import OrderedDict
+
+# Metadata keys that only matter for ingestion and add nothing to references
+INTERNAL_METADATA_KEYS = ("chunk_index", "source_file")
+
+
+def strip_overlap(previous: str, current: str, max_overlap: int = 200, min_overlap: int = 10) -> str:
+    """
+    Remove the prefix of `current` that repeats the end of `previous`.
+
+    The text splitter overlaps chunks by whole words, so only overlaps of at
+    least `min_overlap` characters that start and end on word boundaries are
+    removed; shorter matches are usually coincidental.
+
+    Args:
+        previous (str): The preceding chunk.
+        current (str): The following chunk.
+        max_overlap (int): Longest overlap to look for, in characters.
+        min_overlap (int): Shortest overlap to remove, in characters.
+
+    Returns:
+        str: `current` without the overlapping prefix.
+    """
+    for size in range(min(max_overlap, len(previous), len(current)), min_overlap - 1, -1):
+        if not previous.endswith(current[:size]):
+            continue
+        starts_on_boundary = size == len(previous) or previous[-size - 1].isspace()
+        ends_on_boundary = size == len(current) or current[size].isspace()
+        if starts_on_boundary and ends_on_boundary:
+            return current[size:].lstrip()
+    return current
+
+
+def merge_source_chunks(search_results: list) -> list:
+    """
+    Group search results by source, merging adjacent chunks of the same source.
+
+    Sources keep the order of their best-ranked chunk. Within a source, chunks
+    are sorted by `chunk_index`, identical chunks are dropped, and runs of
+    consecutive chunks are joined with their overlap removed.
+
+    Args:
+        search_results (list): (content, metadata) tuples, best first.
+
+    Returns:
+        list: (metadata, passages) tuples, one per source.
+    """
+    sources = OrderedDict()
+    for content, metadata in search_results:
+        source = metadata.get("source", "")
+        sources.setdefault(source, []).append((metadata.get("chunk_index"), content, metadata))
+
+    merged = []
+    for chunks in sources.values():
+        if all(index is not None for index, _, _ in chunks):
+            chunks.sort(key=lambda chunk: chunk[0])
+
+        passages = []
+        seen_contents = set()
+        previous_index, previous_content = None, None
+        for index, content, _ in chunks:
+            # Only identical text is a duplicate; re-ingested pages can repeat an index with new text
+            if content in seen_contents:
+                continue
+            seen_contents.add(content)
+            if passages and index is not None and previous_index is not None and index == previous_index + 1:
+                passages[-1] += " " + strip_overlap(previous_content, content)
+            else:
+                passages.append(content)
+            previous_index, previous_content = index, content
+
+        metadata = {key: value for key, value in chunks[0][2].items() if key not in INTERNAL_METADATA_KEYS}
+        merged.append((metadata, passages))
+    return merged
+
+
+def build_context(search_results: list, encoder=None, token_budget: int = None):
+    """
+    Build the prompt context and metadata sections from search results.
+
+    Args:
+        search_results (list): (content, metadata) tuples, best first.
+        encoder: A tiktoken encoding used to measure and truncate passages.
+        token_budget (int): Maximum tokens of context; unlimited if not set.
+
+    Returns:
+        tuple: The context and metadata strings.
+    """
+    if not search_results:
+        return "No relevant context found.", "No metadata available."
+
+    context_lines, metadata_lines = [], []
+    remaining = token_budget
+    for source_idx, (metadata, passages) in enumerate(merge_source_chunks(search_results)):
+        used_source = False
+        for passage in passages:
+            if remaining is not None:
+                if remaining <= 0:
+                    break
+                tokens = encoder.encode(passage)
+                if len(tokens) > remaining:
+                    passage = encoder.decode(tokens[:remaining])
+                remaining -= len(tokens)
+            context_lines.append(f"Context {len(context_lines)} (Source {source_idx}): {passage}")
+            used_source = True
+        if used_source:
+            metadata_lines.append(f"Source {source_idx}: {metadata}")
+        if remaining is not None and remaining <= 0:
+            break
+
+    return "\n".join(context_lines), "\n".join(metadata_lines)
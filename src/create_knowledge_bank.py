@@ -1,21 +1,32 @@
 import os
 import re
+import time
+import queue
+import hashlib
+import threading
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, as_completed, wait
 
 import json
 from langchain.schema import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from src.embedder import initialize_vector_store
+from src.embedder import initialize_vector_store, SentenceTransformerEmbeddings
+from src.lexical_index import get_lexical_index
+from src.log import get_logger
+
+logger = get_logger("cybel.knowledge_bank")
 
 # Initialize the embedding model
 embedding_type = "sentence_transformers"  # Change to "openai" as needed
 collection_name = "my_documents"
 persist_directory = "./chromadb_persist"
 
-vector_store = initialize_vector_store(
-    embedding_type=embedding_type,
-    collection_name=collection_name,
-    persist_directory=persist_directory
-)
+
+def get_vector_store():
+    return initialize_vector_store(
+        embedding_type=embedding_type,
+        collection_name=collection_name,
+        persist_directory=persist_directory
+    )
 
 # Function to split large text into chunks
 def split_text_into_chunks(text: str, chunk_size: int = 500, overlap: int = 50) -> list:
@@ -23,34 +34,219 @@ def split_text_into_chunks(text: str, chunk_size: int = 500, overlap: int = 50)
     chunks = text_splitter.split_text(text)
     return chunks
 
+def chunk_id(source: str, chunk: str) -> str:
+    """
+    Deterministic document ID derived from the source URL and the chunk content.
+    """
+    return hashlib.sha256(f"{source}\n{chunk}".encode("utf-8")).hexdigest()
+
+# Function to load a scraped JSON file and split it into documents with IDs
+def load_file_documents(data_dir: str, filename: str, chunk_size: int = 500, overlap: int = 50):
+    file_path = os.path.join(data_dir, filename)
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"File not found: {file_path}")
+
+    with open(file_path, 'r', encoding='utf-8') as file:
+        content = json.load(file)
+
+    context = content["context"]
+    metadata = content["metadata"]
+    source = metadata.get("source", filename)
+
+    chunks = split_text_into_chunks(context, chunk_size, overlap)
+    # remove more then one space and more then one new line
+    chunks = [re.sub(r'\s+', ' ', chunk) for chunk in chunks]
+
+    ids, documents, seen = [], [], set()
+    for i, chunk in enumerate(chunks):
+        doc_id = chunk_id(source, chunk)
+        if doc_id in seen:
+            continue  # identical chunk repeated on the same page
+        seen.add(doc_id)
+        ids.append(doc_id)
+        documents.append(Document(page_content=chunk,
+                                  metadata={**metadata, "chunk_index": i, "source_file": filename}))
+    return ids, documents
+
+# Function to load and chunk files on a process pool, streaming results through a bounded queue
+def iter_file_documents(data_dir: str, filenames: list, chunk_size: int = 500, overlap: int = 50,
+                        workers: int = None, max_pending: int = 32):
+    """
+    Yield (ids, documents) for each file as soon as it has been chunked.
+
+    Files are loaded and split on a process pool from a producer thread, and at
+    most `max_pending` chunked files are held in memory at any time.
+    """
+    results = queue.Queue(maxsize=max_pending)
+    stop = threading.Event()
+    done = object()
+
+    def put(item) -> bool:
+        # Give up once the consumer has stopped reading
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        executor = ProcessPoolExecutor(max_workers=workers)
+        try:
+            pending = set()
+            for filename in filenames:
+                if stop.is_set():
+                    return
+                pending.add(executor.submit(load_file_documents, data_dir, filename, chunk_size, overlap))
+                if len(pending) >= max_pending:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        if not put(future.result()):
+                            return
+            for future in as_completed(pending):
+                if not put(future.result()):
+                    return
+        except Exception as e:
+            put(e)
+        finally:
+            executor.shutdown(cancel_futures=True)
+        put(done)
+
+    producer = threading.Thread(target=produce, name="knowledge-bank-loader", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = results.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Also runs when the consumer fails or stops early, so the producer and its pool exit
+        stop.set()
+        producer.join()
+
+# Function to embed a batch of documents and upsert it into ChromaDB
+def upsert_batch(vector_store, ids: list, documents: list, pool=None):
+    texts = [document.page_content for document in documents]
+    if pool is not None:
+        embeddings = vector_store.embeddings.embed_documents(texts, pool=pool)
+    else:
+        embeddings = vector_store.embeddings.embed_documents(texts)
+    vector_store._collection.upsert(
+        ids=ids,
+        embeddings=embeddings,
+        documents=texts,
+        metadatas=[document.metadata for document in documents],
+    )
+    get_lexical_index(persist_directory).add(ids, texts)
+
+# Function to update the metadata of stored chunks, e.g. their position after an edit earlier in the page
+def update_metadata_batch(vector_store, ids: list, metadatas: list):
+    vector_store._collection.update(ids=ids, metadatas=metadatas)
+
 # Function to store file content in ChromaDB with enhanced metadata
-def store_file_in_chromadb_txt_file(data_dir: str, filenames: list, chunk_size: int = 500, overlap: int = 50):
-    if vector_store._collection.count() > 0:
-        print("Data already stored in ChromaDB. Skipping storage.")
+def store_file_in_chromadb_txt_file(data_dir: str, filenames: list, chunk_size: int = 500, overlap: int = 50,
+                                    incremental: bool = False, batch_size: int = 256, workers: int = None,
+                                    encode_processes: int = None):
+    """
+    Chunk the scraped JSON files and store them in ChromaDB.
+
+    Files are chunked on a process pool and embedded in fixed-size batches
+    while later files are still being chunked, so memory stays flat
+    regardless of the number of input files.
+
+    Args:
+        data_dir (str): Directory containing the scraped JSON files.
+        filenames (list): The JSON files making up the knowledge bank.
+        chunk_size (int): Maximum characters per chunk.
+        overlap (int): Characters shared between consecutive chunks.
+        incremental (bool): Sync the collection with `filenames` instead of
+            skipping when data is already stored. Only new chunks are embedded,
+            unchanged chunks that moved within their page get their metadata
+            updated, and chunks of changed or removed files are deleted.
+        batch_size (int): Number of chunks embedded and upserted at once.
+        workers (int): Processes used for loading and chunking files.
+        encode_processes (int): CPU processes for SentenceTransformer encoding;
+            encodes in-process when not set.
+    """
+    vector_store = get_vector_store()
+    if not incremental and vector_store._collection.count() > 0:
+        logger.info("Data already stored in ChromaDB. Skipping storage.")
         return
 
-    all_documents = []
-    for filename in filenames:
-        print(f"Storing file: {filename}")
-        file_path = os.path.join(data_dir, filename)
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"File not found: {file_path}")
-
-        with open(file_path, 'r', encoding='utf-8') as file:
-            content = json.load(file)
-
-            context = content["context"]
-            metadata = content["metadata"]
-
-            chunks = split_text_into_chunks(context, chunk_size, overlap)
-            # remove more then one space and more then one new line
-            chunks = [re.sub(r'\s+', ' ', chunk) for chunk in chunks]
-            for i, chunk in enumerate(chunks):
-                metadata["chunk_index"] = i
-                document = Document(page_content=chunk, metadata=metadata)
-                all_documents.append(document)
-    
-    # Add all documents to the vector store
-    vector_store.add_documents(all_documents)
-    print("Data successfully stored in ChromaDB.")
-    print(f"Total documents to store: {len(all_documents)}")
+    existing_metadata = {}
+    if incremental:
+        existing = vector_store._collection.get(include=["metadatas"])
+        existing_metadata = dict(zip(existing["ids"], existing["metadatas"]))
+    existing_ids = set(existing_metadata)
+    seen_ids = set()
+    moved_ids, moved_metadata = [], []
+
+    pool = None
+    if encode_processes and isinstance(vector_store.embeddings, SentenceTransformerEmbeddings):
+        pool = vector_store.embeddings.start_multi_process_pool(encode_processes)
+
+    start_time = time.time()
+    files_done = 0
+    stored = 0
+    updated = 0
+    batch_ids, batch_documents = [], []
+
+    def flush():
+        nonlocal stored
+        upsert_batch(vector_store, batch_ids, batch_documents, pool)
+        stored += len(batch_ids)
+        elapsed = time.time() - start_time
+        logger.info(f"Stored {stored} chunks from {files_done}/{len(filenames)} files "
+                    f"({stored / elapsed:.1f} chunks/sec)",
+                    extra={"fields": {"chunks": stored, "files": files_done, "chunks_per_second": stored / elapsed}})
+        batch_ids.clear()
+        batch_documents.clear()
+
+    def update_moved():
+        nonlocal updated
+        update_metadata_batch(vector_store, moved_ids, moved_metadata)
+        updated += len(moved_ids)
+        moved_ids.clear()
+        moved_metadata.clear()
+
+    try:
+        for ids, documents in iter_file_documents(data_dir, filenames, chunk_size, overlap, workers):
+            files_done += 1
+            for doc_id, document in zip(ids, documents):
+                # The same chunk under the same source can only come from duplicated input files
+                if doc_id in seen_ids:
+                    continue
+                seen_ids.add(doc_id)
+                if doc_id in existing_ids:
+                    if existing_metadata[doc_id] != document.metadata:
+                        moved_ids.append(doc_id)
+                        moved_metadata.append(document.metadata)
+                        if len(moved_ids) >= batch_size:
+                            update_moved()
+                    continue
+                batch_ids.append(doc_id)
+                batch_documents.append(document)
+                if len(batch_ids) >= batch_size:
+                    flush()
+        if batch_ids:
+            flush()
+        if moved_ids:
+            update_moved()
+    finally:
+        if pool is not None:
+            vector_store.embeddings.stop_multi_process_pool(pool)
+
+    if incremental:
+        stale_ids = list(existing_ids - seen_ids)
+        if stale_ids:
+            vector_store.delete(ids=stale_ids)
+            get_lexical_index(persist_directory).delete(stale_ids)
+        logger.info(f"Removed {len(stale_ids)} stale chunks, skipped {len(existing_ids) - len(stale_ids)} unchanged chunks.")
+        logger.info(f"Updated the metadata of {updated} moved chunks.")
+
+    logger.info("Data successfully stored in ChromaDB.")
+    logger.info(f"Total documents to store: {stored} in {time.time() - start_time:.1f}s")
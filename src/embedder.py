@@ -1,26 +1,187 @@
 import os
-from sentence_transformers import SentenceTransformer
-from langchain_openai import OpenAIEmbeddings
-from langchain_chroma import Chroma
+import threading
+from src.embedding_cache import EmbeddingCache
+from src.metrics import timed
+from src.log import get_logger
+
+logger = get_logger("cybel.embedder")
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache.sqlite3")
+
+# "torch" is full fp32 PyTorch, "torch-int8" applies dynamic int8 quantization to
+# the Linear layers, "onnx" runs ONNX Runtime and "onnx-int8" its quantized export.
+EMBEDDING_BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+ONNX_INT8_FILE = "onnx/model_quint8_avx2.onnx"
+# Collection metadata key recording the model and backend that embedded a collection
+EMBEDDING_MODEL_KEY = "embedding_model"
+
+
+def load_sentence_transformer(model_name, backend="torch"):
+    """
+    Load a SentenceTransformer model on CPU with the selected inference backend.
+
+    Args:
+        model_name (str): The SentenceTransformer model name.
+        backend (str): One of EMBEDDING_BACKENDS.
+
+    Returns:
+        SentenceTransformer: The loaded model.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        return SentenceTransformer(model_name, device="cpu")
+    elif backend == "torch-int8":
+        import torch
+        model = SentenceTransformer(model_name, device="cpu")
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    elif backend == "onnx":
+        return SentenceTransformer(model_name, device="cpu", backend="onnx")
+    elif backend == "onnx-int8":
+        return SentenceTransformer(model_name, device="cpu", backend="onnx",
+                                   model_kwargs={"file_name": ONNX_INT8_FILE})
+    else:
+        raise ValueError(f"Invalid embedding backend '{backend}'. Choose one of {EMBEDDING_BACKENDS}.")
 
 # Custom embedding class for SentenceTransformers
 class SentenceTransformerEmbeddings:
-    def __init__(self, model_name):
-        self.model = SentenceTransformer(model_name, device="cpu")
+    def __init__(self, model_name, cache: EmbeddingCache = None, backend: str = "torch"):
+        if backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"Invalid embedding backend '{backend}'. Choose one of {EMBEDDING_BACKENDS}.")
+        self.model_name = model_name
+        self.backend = backend
+        self.cache = cache
+        self._model = None
+        self._model_lock = threading.Lock()
 
-    def embed_documents(self, texts):
-        """Embed a list of documents and return as lists."""
+    @property
+    def model(self):
+        """Load the SentenceTransformer model on first use."""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = load_sentence_transformer(self.model_name, self.backend)
+        return self._model
+
+    def _encode(self, texts, pool=None):
+        if pool is not None:
+            return self.model.encode_multi_process(texts, pool).tolist()
         return self.model.encode(texts, convert_to_numpy=True).tolist()
 
+    def embed_documents(self, texts, pool=None):
+        """Embed a list of documents and return as lists, optionally on a multi-process pool."""
+        if self.cache is None:
+            return self._encode(texts, pool)
+
+        vectors = self.cache.get_many(texts)
+        missing = {}  # cache key -> indices of texts sharing it
+        for idx, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(self.cache.key(texts[idx]), []).append(idx)
+        if missing:
+            missing_texts = [texts[indices[0]] for indices in missing.values()]
+            encoded = self._encode(missing_texts, pool)
+            self.cache.put_many(missing_texts, encoded)
+            for indices, vector in zip(missing.values(), encoded):
+                for idx in indices:
+                    vectors[idx] = vector
+        return vectors
+
     def embed_query(self, text):
         """Embed a single query and return as a list."""
-        return self.model.encode([text], convert_to_numpy=True)[0].tolist()
+        with timed("embedding"):
+            return self.embed_documents([text])[0]
+
+    def start_multi_process_pool(self, processes=None):
+        """Start a pool of CPU encode workers for bulk `embed_documents` calls."""
+        target_devices = ["cpu"] * processes if processes else None
+        return self.model.start_multi_process_pool(target_devices=target_devices)
+
+    def stop_multi_process_pool(self, pool):
+        """Stop a pool started with `start_multi_process_pool`."""
+        self.model.stop_multi_process_pool(pool)
+
+# Shared instances, so every module uses one model and one Chroma handle
+_embedding_functions = {}
+_vector_stores = {}
+_registry_lock = threading.RLock()
+
+
+def get_embedding_function(embedding_type):
+    """
+    Return the process-wide embedding function for `embedding_type`.
+
+    The SentenceTransformer weights are only loaded on the first embed call.
+
+    Args:
+        embedding_type (str): "sentence_transformers" or "openai"
+
+    Returns:
+        The shared embedding function.
+    """
+    # models_names = ["all-MiniLM-L6-v2", "all-MPNet-base-v2", "sentence-t5-xxl",
+    #                 "paraphrase-multilingual-MiniLM-L12-v2", ]
+    with _registry_lock:
+        embedding_function = _embedding_functions.get(embedding_type)
+        if embedding_function is not None:
+            return embedding_function
+
+        if embedding_type == "sentence_transformers":
+            model_name = "all-MPNet-base-v2"
+            # Backends produce slightly different vectors, so they get separate cache keys
+            cache = (EmbeddingCache(f"{model_name}:{EMBEDDING_BACKEND}", path=EMBEDDING_CACHE_PATH)
+                     if EMBEDDING_CACHE_PATH else None)
+            embedding_function = SentenceTransformerEmbeddings(model_name, cache=cache, backend=EMBEDDING_BACKEND)
+        elif embedding_type == "openai":
+            from langchain_openai import OpenAIEmbeddings
+            model_name = "text-embedding-3-small"
+            embedding_function = OpenAIEmbeddings(model=model_name)
+        else:
+            raise ValueError("Invalid embedding type. Choose 'sentence_transformers' or 'openai'.")
+
+        _embedding_functions[embedding_type] = embedding_function
+        return embedding_function
+
+
+def embedding_model_id(embedding_function) -> str:
+    """
+    Identify the model and inference backend behind an embedding function.
+    """
+    if isinstance(embedding_function, SentenceTransformerEmbeddings):
+        return f"{embedding_function.model_name}:{embedding_function.backend}"
+    return f"openai:{embedding_function.model}"
+
+
+def check_embedding_model(collection, model_id: str):
+    """
+    Refuse to use a collection embedded by a different model or backend, whose
+    vectors are not comparable with the query embeddings.
+
+    Raises:
+        ValueError: If the collection records a different embedding model.
+    """
+    stored = (collection.metadata or {}).get(EMBEDDING_MODEL_KEY)
+    if stored is None:
+        if collection.count():
+            logger.warning(f"Collection '{collection.name}' does not record its embedding model; "
+                           f"assuming it was built with {model_id}.")
+        return
+    if stored != model_id:
+        raise ValueError(f"Collection '{collection.name}' was embedded with {stored}, not {model_id}. "
+                         f"Set EMBEDDING_BACKEND to match it, or rebuild the collection.")
+
 
 # Function to initialize Chroma with the chosen embedding model
 def initialize_vector_store(embedding_type, collection_name, persist_directory):
     """
     Initialize the Chroma vector store with the chosen embedding model.
-    
+
+    Instances are shared: every call with the same embedding type, collection
+    and persist directory returns the same Chroma handle. New collections
+    record their embedding model and backend, and opening a collection with
+    a different one fails.
+
     Args:
         embedding_type (str): "sentence_transformers" or "openai"
         collection_name (str): Name of the Chroma collection.
@@ -29,23 +190,21 @@ def initialize_vector_store(embedding_type, collection_name, persist_directory):
     Returns:
         Chroma: The initialized vector store.
     """
-    # models_names = ["all-MiniLM-L6-v2", "all-MPNet-base-v2", "sentence-t5-xxl",
-    #                 "paraphrase-multilingual-MiniLM-L12-v2", ]
+    key = (embedding_type, collection_name, os.path.abspath(persist_directory))
+    with _registry_lock:
+        vector_store = _vector_stores.get(key)
+        if vector_store is None:
+            from langchain_chroma import Chroma
 
-    if embedding_type == "sentence_transformers":
-        model_name = "all-MPNet-base-v2"
-        embedding_function = SentenceTransformerEmbeddings(model_name)
-    elif embedding_type == "openai":
-        model_name = "text-embedding-3-small"
-        embedding_function = OpenAIEmbeddings(model=model_name)
-    else:
-        raise ValueError("Invalid embedding type. Choose 'sentence_transformers' or 'openai'.")
-
-    # Initialize Chroma vector store
-    vector_store = Chroma(
-        collection_name=collection_name,
-        embedding_function=embedding_function, # type: ignore
-        persist_directory=persist_directory
-    )
+            embedding_function = get_embedding_function(embedding_type)
+            model_id = embedding_model_id(embedding_function)
+            # Initialize Chroma vector store
+            vector_store = Chroma(
+                collection_name=collection_name,
+                embedding_function=embedding_function, # type: ignore
+                persist_directory=persist_directory,
+                collection_metadata={EMBEDDING_MODEL_KEY: model_id}
+            )
+            check_embedding_model(vector_store._collection, model_id)
+            _vector_stores[key] = vector_store
     return vector_store
-
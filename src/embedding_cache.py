@@ -0,0 +1,170 @@
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from src.write_behind import WriteBehindQueue
+
+
+class EmbeddingCache:
+    """
+    Two-level embedding cache: an in-memory LRU in front of a SQLite table.
+
+    Keys are a hash of the model name and the whitespace-normalized text, so
+    query and document embeddings from the same model share entries. The
+    `last_used` time that disk eviction relies on is refreshed for memory and
+    disk hits alike, in batches written by a background thread.
+
+    The memory LRU holds float32 arrays and is only filled from batches of at
+    most `memory_batch_limit` texts, so bulk ingestion does not evict the hot
+    query embeddings.
+    """
+
+    def __init__(self, model_name: str, path: str = None, memory_entries: int = 4096,
+                 max_disk_entries: int = 500_000, memory_batch_limit: int = 64):
+        self.model_name = model_name
+        self.memory_entries = memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.memory_batch_limit = memory_batch_limit
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        self._disk_entries = 0
+        self._touches = None
+        if path:
+            self._connection = sqlite3.connect(path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+            self._connection.commit()
+            self._disk_entries = self._connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            self._touches = WriteBehindQueue(self._write_touches, batch_size=100, flush_interval=1.0,
+                                             name="embedding-cache-touches")
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def key(self, text: str) -> str:
+        normalized = re.sub(r"\s+", " ", text).strip()
+        return hashlib.sha256(f"{self.model_name}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(self, texts: list) -> list:
+        """
+        Return the cached embedding for each text, or None where it is missing.
+        """
+        keys = [self.key(text) for text in texts]
+        remember = len(texts) <= self.memory_batch_limit
+        vectors = [None] * len(texts)
+        hit_keys = []
+        with self._lock:
+            disk_lookups = {}
+            for idx, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    vectors[idx] = vector.tolist()
+                    hit_keys.append(key)
+                    self.memory_hits += 1
+                else:
+                    disk_lookups.setdefault(key, []).append(idx)
+
+            if disk_lookups and self._connection is not None:
+                found = []
+                lookup_keys = list(disk_lookups)
+                for start in range(0, len(lookup_keys), 500):
+                    batch = lookup_keys[start:start + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    found.extend(self._connection.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                    ).fetchall())
+                for key, blob in found:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    if remember:
+                        self._remember(key, vector)
+                    hit_keys.append(key)
+                    values = vector.tolist()
+                    for idx in disk_lookups.pop(key):
+                        vectors[idx] = values
+                        self.disk_hits += 1
+
+            self.misses += sum(len(indices) for indices in disk_lookups.values())
+        if hit_keys and self._touches is not None:
+            self._touches.put((time.time(), hit_keys))
+        return vectors
+
+    def _write_touches(self, batch):
+        last_used = {}
+        for now, keys in batch:
+            for key in keys:
+                last_used[key] = now
+        with self._lock:
+            self._connection.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?",
+                                         [(now, key) for key, now in last_used.items()])
+            self._connection.commit()
+
+    def flush(self):
+        """
+        Write the pending `last_used` updates of cache hits to disk.
+        """
+        if self._touches is not None:
+            self._touches.flush()
+
+    def put_many(self, texts: list, vectors: list):
+        """
+        Store embeddings for the given texts in memory and on disk.
+        """
+        rows = []
+        now = time.time()
+        remember = len(texts) <= self.memory_batch_limit
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = self.key(text)
+                vector = np.asarray(vector, dtype=np.float32)
+                if remember:
+                    self._remember(key, vector)
+                rows.append((key, vector.tobytes(), now))
+
+            if self._connection is not None and rows:
+                before = self._connection.total_changes
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows
+                )
+                self._disk_entries += self._connection.total_changes - before
+                if self._disk_entries > self.max_disk_entries:
+                    # Trim 10% below the limit so eviction does not run on every insert
+                    excess = self._disk_entries - int(self.max_disk_entries * 0.9)
+                    self._connection.execute(
+                        "DELETE FROM embeddings WHERE key IN "
+                        "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)", (excess,)
+                    )
+                    self._disk_entries -= excess
+                self._connection.commit()
+
+    def stats(self) -> dict:
+        """
+        Return hit counters and the number of cached embeddings.
+        """
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            hits = self.memory_hits + self.disk_hits
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": self._disk_entries,
+            }
@@ -0,0 +1,92 @@
+import queue
+import asyncio
+import threading
+import contextvars
+
+
+class BackgroundEventLoop:
+    """
+    A single asyncio event loop running in a daemon thread.
+
+    Synchronous callers (e.g. Flask request threads) submit coroutines with
+    `run`, so every in-flight question shares one loop and one async
+    connection pool instead of blocking a thread per network call.
+    """
+
+    def __init__(self, name: str = "pipeline-event-loop"):
+        self.name = name
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._loop is not None:
+            return self._loop
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name=self.name, daemon=True)
+                thread.start()
+                self._loop = loop
+        return self._loop
+
+    def submit(self, coro):
+        """
+        Schedule a coroutine on the loop and return a `concurrent.futures.Future`.
+
+        The coroutine runs in a copy of the caller's context, so context
+        variables set by the request thread are visible to it.
+        """
+        context = contextvars.copy_context()
+
+        async def run_in_context():
+            return await context.run(asyncio.ensure_future, coro)
+
+        return asyncio.run_coroutine_threadsafe(run_in_context(), self._ensure_started())
+
+    def run(self, coro, timeout: float = None):
+        """
+        Run a coroutine on the loop and block until its result is available.
+
+        Raises:
+            TimeoutError: If no result arrived within `timeout` seconds; the
+                coroutine is cancelled.
+        """
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def iterate(self, async_iterator, timeout: float = None):
+        """
+        Consume an async iterator on the loop, yielding its items to the
+        synchronous caller as they are produced.
+
+        Raises:
+            TimeoutError: If no item arrived within `timeout` seconds; the
+                iterator is cancelled.
+        """
+        items = queue.Queue()
+        done = object()
+
+        async def drain():
+            try:
+                async for item in async_iterator:
+                    items.put(item)
+            finally:
+                items.put(done)
+
+        future = self.submit(drain())
+        try:
+            while True:
+                try:
+                    item = items.get(timeout=timeout)
+                except queue.Empty:
+                    raise TimeoutError(f"No result from the event loop within {timeout} seconds.") from None
+                if item is done:
+                    break
+                yield item
+            future.result()  # re-raise an error from the iterator
+        finally:
+            future.cancel()  # the caller stopped early, e.g. a disconnected client
@@ -0,0 +1,199 @@
+import os
+import re
+import math
+import sqlite3
+import threading
+from collections import Counter
+
+# Keeps product names, versions and error codes such as "e-1234" or "v2.0" as one term
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_.][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> list:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Persistent BM25 inverted index over the knowledge-bank chunks, stored in
+    SQLite next to the Chroma collection and keyed by the same chunk IDs.
+    """
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (id TEXT PRIMARY KEY, length INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL, doc_id TEXT NOT NULL, tf INTEGER NOT NULL,
+                PRIMARY KEY (term, doc_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_postings_doc_id ON postings (doc_id);
+            CREATE TABLE IF NOT EXISTS stats (key TEXT PRIMARY KEY, value REAL NOT NULL);
+            INSERT OR IGNORE INTO stats (key, value) VALUES ('documents', 0), ('total_length', 0);
+        """)
+        self._connection.commit()
+
+    def _delete(self, ids):
+        removed, removed_length = 0, 0
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            row = self._connection.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(length), 0) FROM documents WHERE id IN ({placeholders})", batch
+            ).fetchone()
+            removed += row[0]
+            removed_length += row[1]
+            self._connection.execute(f"DELETE FROM postings WHERE doc_id IN ({placeholders})", batch)
+            self._connection.execute(f"DELETE FROM documents WHERE id IN ({placeholders})", batch)
+        self._update_stats(-removed, -removed_length)
+
+    def _update_stats(self, documents, total_length):
+        self._connection.execute("UPDATE stats SET value = value + ? WHERE key = 'documents'", (documents,))
+        self._connection.execute("UPDATE stats SET value = value + ? WHERE key = 'total_length'", (total_length,))
+
+    def add(self, ids: list, texts: list):
+        """
+        Index (or re-index) the given chunks.
+        """
+        with self._lock:
+            self._delete(list(ids))
+            postings, documents, total_length = [], [], 0
+            for doc_id, text in zip(ids, texts):
+                terms = tokenize(text)
+                documents.append((doc_id, len(terms)))
+                total_length += len(terms)
+                postings.extend((term, doc_id, tf) for term, tf in Counter(terms).items())
+            self._connection.executemany("INSERT INTO documents (id, length) VALUES (?, ?)", documents)
+            self._connection.executemany("INSERT INTO postings (term, doc_id, tf) VALUES (?, ?, ?)", postings)
+            self._update_stats(len(documents), total_length)
+            self._connection.commit()
+
+    def delete(self, ids: list):
+        """
+        Remove the given chunks from the index.
+        """
+        with self._lock:
+            self._delete(list(ids))
+            self._connection.commit()
+
+    def clear(self):
+        """
+        Remove every chunk from the index.
+        """
+        with self._lock:
+            self._connection.execute("DELETE FROM postings")
+            self._connection.execute("DELETE FROM documents")
+            self._connection.execute("UPDATE stats SET value = 0")
+            self._connection.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return int(self._connection.execute("SELECT value FROM stats WHERE key = 'documents'").fetchone()[0])
+
+    def known_terms(self, terms) -> set:
+        """
+        Return the subset of `terms` that occur in at least one indexed chunk.
+        """
+        terms = list(set(terms))
+        if not terms:
+            return set()
+        placeholders = ",".join("?" * len(terms))
+        with self._lock:
+            return {term for (term,) in self._connection.execute(
+                f"SELECT DISTINCT term FROM postings WHERE term IN ({placeholders})", terms
+            ).fetchall()}
+
+    def search(self, query: str, limit: int = 10) -> list:
+        """
+        Return the best matching chunks for the query.
+
+        Returns:
+            list: (chunk ID, BM25 score) tuples, best first.
+        """
+        terms = list(set(tokenize(query)))
+        if not terms:
+            return []
+
+        with self._lock:
+            stats = dict(self._connection.execute("SELECT key, value FROM stats").fetchall())
+            total_documents = stats["documents"]
+            if not total_documents:
+                return []
+            average_length = stats["total_length"] / total_documents
+
+            placeholders = ",".join("?" * len(terms))
+            document_frequency = dict(self._connection.execute(
+                f"SELECT term, COUNT(*) FROM postings WHERE term IN ({placeholders}) GROUP BY term", terms
+            ).fetchall())
+            rows = self._connection.execute(
+                f"SELECT p.term, p.doc_id, p.tf, d.length FROM postings p "
+                f"JOIN documents d ON d.id = p.doc_id WHERE p.term IN ({placeholders})", terms
+            ).fetchall()
+
+        scores = Counter()
+        for term, doc_id, tf, length in rows:
+            df = document_frequency[term]
+            idf = math.log(1 + (total_documents - df + 0.5) / (df + 0.5))
+            norm = tf + self.k1 * (1 - self.b + self.b * length / average_length)
+            scores[doc_id] += idf * tf * (self.k1 + 1) / norm
+        return scores.most_common(limit)
+
+
+def reciprocal_rank_fusion(rankings: list, weights: list = None, k: int = 60) -> list:
+    """
+    Fuse several ranked ID lists with weighted reciprocal-rank fusion.
+
+    Args:
+        rankings (list): Lists of IDs, best first.
+        weights (list): Weight of each ranking, 1.0 each by default.
+        k (int): RRF smoothing constant.
+
+    Returns:
+        list: IDs ordered by fused score, best first.
+    """
+    weights = weights or [1.0] * len(rankings)
+    scores = Counter()
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] += weight / (k + rank + 1)
+    return [doc_id for doc_id, _ in scores.most_common()]
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_lexical_index(persist_directory: str) -> BM25Index:
+    """
+    Return the shared BM25 index stored in `persist_directory`.
+    """
+    path = os.path.abspath(os.path.join(persist_directory, "bm25.sqlite3"))
+    with _indexes_lock:
+        index = _indexes.get(path)
+        if index is None:
+            index = BM25Index(path)
+            _indexes[path] = index
+    return index
+
+
+def rebuild_lexical_index(vector_store, index: BM25Index, batch_size: int = 1000):
+    """
+    Replace the index contents with every chunk stored in the Chroma collection.
+    """
+    index.clear()
+    offset = 0
+    while True:
+        batch = vector_store._collection.get(include=["documents"], limit=batch_size, offset=offset)
+        if not batch["ids"]:
+            break
+        index.add(batch["ids"], batch["documents"])
+        offset += len(batch["ids"])
+    return offset
@@ -1,26 +1,140 @@
+import os
+import asyncio
+import threading
+import weakref
 from abc import ABC, abstractmethod
 from datetime import datetime
+import httpx
 
 class LLMTokenObserver(ABC):
     @abstractmethod
-    def notify(self, event_type: str, content: str, timestamp: datetime):
+    def notify(self, event_type: str, content: str, timestamp: datetime, tokens: int = None):
         pass
 
 
+class HTTPClientSettings:
+    """
+    Connection pool, timeout and retry policy for the provider SDK clients.
+    Retries use the SDKs' built-in exponential backoff.
+    """
+    def __init__(self, max_connections: int = 20, max_keepalive_connections: int = 10,
+                 keepalive_expiry: float = 30.0, timeout: float = 60.0, connect_timeout: float = 5.0,
+                 max_retries: int = 2, base_url: str = None):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_retries = max_retries
+        self.base_url = base_url
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", 20)),
+            max_keepalive_connections=int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", 10)),
+            keepalive_expiry=float(os.getenv("LLM_KEEPALIVE_EXPIRY", 30.0)),
+            timeout=float(os.getenv("LLM_TIMEOUT", 60.0)),
+            connect_timeout=float(os.getenv("LLM_CONNECT_TIMEOUT", 5.0)),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", 2)),
+            base_url=os.getenv("LLM_BASE_URL") or None,
+        )
+
+    def key(self):
+        return (self.max_connections, self.max_keepalive_connections, self.keepalive_expiry,
+                self.timeout, self.connect_timeout, self.max_retries, self.base_url)
+
+    def http_timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(self.timeout, connect=self.connect_timeout)
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(max_connections=self.max_connections,
+                            max_keepalive_connections=self.max_keepalive_connections,
+                            keepalive_expiry=self.keepalive_expiry)
+
+    def build_http_client(self) -> httpx.Client:
+        return httpx.Client(
+            limits=self._limits(),
+            timeout=self.http_timeout(),
+        )
+
+    def build_async_http_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            limits=self._limits(),
+            timeout=self.http_timeout(),
+        )
+
+
 class BaseLLMClass(ABC):
-    def __init__(self):
+    # SDK clients are thread-safe, so one per (provider, settings) is shared
+    # by every instance in the process to keep its connection pool warm.
+    _shared_clients = {}
+    _shared_clients_lock = threading.Lock()
+    # Async clients hold connections bound to an event loop, so they are
+    # shared per loop rather than per process.
+    _shared_async_clients = weakref.WeakKeyDictionary()
+
+    def __init__(self, settings: HTTPClientSettings = None):
         self._observers = []
+        self.settings = settings or HTTPClientSettings.from_env()
+
+    def create_llm_client(self):
+        raise NotImplementedError("This method should be overridden by subclasses.")
+
+    def get_llm_client(self):
+        key = (type(self), self.settings.key())
+        client = self._shared_clients.get(key)
+        if client is None:
+            with self._shared_clients_lock:
+                client = self._shared_clients.get(key)
+                if client is None:
+                    client = self.create_llm_client()
+                    self._shared_clients[key] = client
+        return client
+
+    def create_async_llm_client(self):
+        raise NotImplementedError("Async generation not supported by this LLM.")
+
+    def get_async_llm_client(self):
+        loop_clients = self._shared_async_clients.setdefault(asyncio.get_running_loop(), {})
+        key = (type(self), self.settings.key())
+        client = loop_clients.get(key)
+        if client is None:
+            client = self.create_async_llm_client()
+            loop_clients[key] = client
+        return client
+
+    @classmethod
+    def close_shared_clients(cls):
+        with cls._shared_clients_lock:
+            for client in cls._shared_clients.values():
+                client.close()
+            cls._shared_clients.clear()
 
     def attach_observer(self, observer: LLMTokenObserver):
         self._observers.append(observer)
 
-    def notify_observers(self, event_type: str, content: str):
+    def notify_observers(self, event_type: str, content: str, tokens: int = None):
         for observer in self._observers:
-            observer.notify(event_type, content, datetime.now())
+            observer.notify(event_type, content, datetime.now(), tokens)
+
+    def notify_usage(self, prompt: str, completion: str, usage=None):
+        """
+        Report a finished call to the observers, with the provider's token
+        counts when the response carried a `usage` block.
+        """
+        self.notify_observers("input", prompt, getattr(usage, "prompt_tokens", None))
+        self.notify_observers("output", completion, getattr(usage, "completion_tokens", None))
 
     @abstractmethod
     def generate_response(self, model_name, system_prompt, user_prompt):
         raise NotImplementedError("This method should be overridden by subclasses.")
 
+    async def agenerate_response(self, model_name, system_prompt, user_prompt):
+        raise NotImplementedError("Async generation not supported by this LLM.")
+
+    def stream_response(self, model_name, system_prompt, user_prompt):
+        raise NotImplementedError("Streaming not supported by this LLM.")
+
     def transcribe_audio_file(self, file_path: str, model_name: str) -> str:
         raise NotImplementedError("Audio transcription not supported by this LLM.")
@@ -1,13 +1,14 @@
+from src.llm.base_llm import HTTPClientSettings
 from src.llm.openai_llm import OpenAIClient
 from src.llm.groq_llm import GroqAIClient
 
 class LLMFactory:
     @staticmethod
-    def get_client(provider: str):
+    def get_client(provider: str, settings: HTTPClientSettings = None):
         provider = provider.lower()
         if provider == "openai":
-            return OpenAIClient()
+            return OpenAIClient(settings)
         elif provider == "groq":
-            return GroqAIClient()
+            return GroqAIClient(settings)
         else:
             raise ValueError(f"Unsupported LLM provider: {provider}")
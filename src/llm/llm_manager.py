@@ -1,16 +1,50 @@
 from src.llm.llm_factory import LLMFactory
+from src.llm.llm_router import LLMRouter, LLMBackend
 from src.llm.token_tracker import TokenTracker
+from src.llm.base_llm import HTTPClientSettings
 
 class LLMManager:
-    def __init__(self, provider: str, model_name: str):
+    def __init__(self, provider: str, model_name: str, settings: HTTPClientSettings = None, fallbacks: list = None):
+        """
+        Args:
+            provider (str): The primary provider.
+            model_name (str): The model served by the primary provider.
+            settings (HTTPClientSettings): Connection settings shared by all providers.
+            fallbacks (list): (provider, model name) tuples to hedge and fail
+                over to, in priority order.
+        """
         self.provider = provider.lower()
         self.model_name = model_name
         self.token_tracker = TokenTracker(model_name)
-        self.llm_client = LLMFactory.get_client(provider)
+        self.llm_client = LLMFactory.get_client(provider, settings)
         self.llm_client.attach_observer(self.token_tracker)
 
+        self.router = None
+        if fallbacks:
+            backends = [LLMBackend(self.provider, model_name, self.llm_client)]
+            for fallback_provider, fallback_model in fallbacks:
+                client = LLMFactory.get_client(fallback_provider, settings)
+                client.attach_observer(TokenTracker(fallback_model))
+                backends.append(LLMBackend(fallback_provider.lower(), fallback_model, client))
+            self.router = LLMRouter(backends)
+
     def generate_response(self, system_prompt, user_prompt):
+        if self.router:
+            return self.router.generate_response(system_prompt, user_prompt)
         return self.llm_client.generate_response(self.model_name, system_prompt, user_prompt)
 
+    async def agenerate_response(self, system_prompt, user_prompt):
+        if self.router:
+            return await self.router.agenerate_response(system_prompt, user_prompt)
+        return await self.llm_client.agenerate_response(self.model_name, system_prompt, user_prompt)
+
+    def stream_response(self, system_prompt, user_prompt):
+        if self.router:
+            return self.router.stream_response(system_prompt, user_prompt)
+        return self.llm_client.stream_response(self.model_name, system_prompt, user_prompt)
+
     def transcribe_audio(self, file_path: str) -> str:
-        return self.llm_client.transcribe_audio_file(file_path, self.model_name)
\ No newline at end of file
+        return self.llm_client.transcribe_audio_file(file_path, self.model_name)
+
+    def stats(self) -> dict:
+        return self.router.stats() if self.router else {}
@@ -0,0 +1,239 @@
+import time
+import asyncio
+import threading
+from collections import deque
+import numpy as np
+from src.event_loop import BackgroundEventLoop
+from src.metrics import LLM_REQUESTS, LLM_HEDGES
+from src.log import get_logger
+
+logger = get_logger("cybel.llm_router")
+
+# Runs the hedged calls of synchronous callers, so the losing request can be cancelled
+ROUTER_LOOP = BackgroundEventLoop(name="llm-router")
+
+
+class BackendHealth:
+    """
+    Rolling latency and error statistics of one backend, with a circuit breaker.
+
+    The circuit opens after `failure_threshold` consecutive failures, or when
+    the error rate over the window exceeds `max_error_rate`. While open the
+    backend is skipped; after `open_seconds` a single trial request is let
+    through, and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, window: int = 200, failure_threshold: int = 5, max_error_rate: float = 0.5,
+                 min_samples: int = 20, open_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+        self.open_seconds = open_seconds
+
+        self._latencies = deque(maxlen=window)
+        self._outcomes = deque(maxlen=window)  # True for success
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self._opened_at >= self.open_seconds else "open"
+
+    def acquire(self) -> bool:
+        """
+        Return whether a request may be sent now, reserving the trial request
+        when the circuit is half-open.
+        """
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self, latency: float):
+        with self._lock:
+            self._latencies.append(latency)
+            self._outcomes.append(True)
+            self._consecutive_failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._outcomes.append(False)
+            self._consecutive_failures += 1
+            error_rate = self._outcomes.count(False) / len(self._outcomes)
+            if (self._trial_in_flight or self._consecutive_failures >= self.failure_threshold
+                    or (len(self._outcomes) >= self.min_samples and error_rate > self.max_error_rate)):
+                self._opened_at = time.monotonic()
+                self._outcomes.clear()  # start from a clean window once the circuit closes again
+            self._trial_in_flight = False
+
+    def release(self):
+        """
+        Give back a reservation whose request was cancelled before completing.
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    def latency_percentile(self, percentile: float):
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            return float(np.percentile(self._latencies, percentile))
+
+    def stats(self) -> dict:
+        with self._lock:
+            outcomes = len(self._outcomes)
+            latencies = list(self._latencies)
+            error_rate = self._outcomes.count(False) / outcomes if outcomes else 0.0
+        return {
+            "state": self.state,
+            "error_rate": error_rate,
+            "p50_seconds": float(np.percentile(latencies, 50)) if latencies else 0.0,
+            "p95_seconds": float(np.percentile(latencies, 95)) if latencies else 0.0,
+            "samples": len(latencies),
+        }
+
+
+class LLMBackend:
+    """
+    A provider client and the model it serves, with its health statistics.
+    """
+
+    def __init__(self, provider: str, model_name: str, client, health: BackendHealth = None):
+        self.provider = provider
+        self.model_name = model_name
+        self.client = client
+        self.health = health or BackendHealth()
+        self.name = f"{provider}:{model_name}"
+
+
+class LLMRouter:
+    """
+    Route generation requests over backends in priority order.
+
+    The first available backend gets the request. If it has not answered
+    within its rolling p95 latency, a hedged duplicate goes to the next
+    backend and the slower of the two is cancelled. Errors fail over to the
+    next backend immediately, and backends with an open circuit are skipped.
+    """
+
+    def __init__(self, backends: list, hedge_percentile: float = 95, min_hedge_delay: float = 0.5):
+        if not backends:
+            raise ValueError("LLMRouter needs at least one backend.")
+        self.backends = backends
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge_delay = min_hedge_delay
+
+    def _available(self) -> list:
+        available = [backend for backend in self.backends if backend.health.acquire()]
+        # With every circuit open, trying the primary beats failing outright
+        return available or self.backends[:1]
+
+    def _hedge_delay(self, backend: LLMBackend):
+        latency = backend.health.latency_percentile(self.hedge_percentile)
+        return None if latency is None else max(latency, self.min_hedge_delay)
+
+    async def _call(self, backend: LLMBackend, system_prompt: str, user_prompt: str):
+        start_time = time.perf_counter()
+        try:
+            response = await backend.client.agenerate_response(backend.model_name, system_prompt, user_prompt)
+        except asyncio.CancelledError:
+            backend.health.release()
+            LLM_REQUESTS.labels(backend.name, "cancelled").inc()
+            raise
+        except Exception:
+            backend.health.record_failure()
+            LLM_REQUESTS.labels(backend.name, "error").inc()
+            raise
+        backend.health.record_success(time.perf_counter() - start_time)
+        LLM_REQUESTS.labels(backend.name, "success").inc()
+        return response
+
+    async def agenerate_response(self, system_prompt: str, user_prompt: str):
+        candidates = self._available()
+        pending = {}
+        next_idx = 0
+        hedged = False
+        last_error = None
+
+        def launch():
+            nonlocal next_idx
+            backend = candidates[next_idx]
+            next_idx += 1
+            pending[asyncio.ensure_future(self._call(backend, system_prompt, user_prompt))] = backend
+            return backend
+
+        primary = launch()
+        try:
+            while pending:
+                timeout = None
+                if not hedged and len(pending) == 1 and next_idx < len(candidates):
+                    timeout = self._hedge_delay(primary)
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    backend = launch()
+                    LLM_HEDGES.labels(backend.name).inc()
+                    continue
+
+                for task in done:
+                    backend = pending.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+                    last_error = task.exception()
+                    logger.warning(f"LLM backend {backend.name} failed: {last_error}")
+                if not pending and next_idx < len(candidates):
+                    primary = launch()
+        finally:
+            for task in pending:
+                task.cancel()
+            # Backends reserved for a trial request but never called give their slot back
+            for backend in candidates[next_idx:]:
+                backend.health.release()
+        raise last_error
+
+    def generate_response(self, system_prompt: str, user_prompt: str):
+        return ROUTER_LOOP.run(self.agenerate_response(system_prompt, user_prompt))
+
+    def stream_response(self, system_prompt: str, user_prompt: str):
+        """
+        Stream from the first available backend, failing over to the next one
+        when a backend errors before its first token.
+        """
+        candidates = self._available()
+        last_error = None
+        try:
+            for backend in candidates:
+                start_time = time.perf_counter()
+                started = False
+                try:
+                    for token in backend.client.stream_response(backend.model_name, system_prompt, user_prompt):
+                        started = True
+                        yield token
+                except Exception as e:
+                    backend.health.record_failure()
+                    LLM_REQUESTS.labels(backend.name, "error").inc()
+                    if started:
+                        raise
+                    last_error = e
+                    logger.warning(f"LLM backend {backend.name} failed: {e}")
+                    continue
+                backend.health.record_success(time.perf_counter() - start_time)
+                LLM_REQUESTS.labels(backend.name, "success").inc()
+                return
+            raise last_error
+        finally:
+            for backend in candidates:
+                backend.health.release()
+
+    def stats(self) -> dict:
+        return {backend.name: backend.health.stats() for backend in self.backends}
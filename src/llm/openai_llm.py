@@ -1,12 +1,24 @@
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 from src.llm.base_llm import BaseLLMClass
 
 class OpenAIClient(BaseLLMClass):
-    def get_llm_client(self):
-        return OpenAI()
+    def create_llm_client(self):
+        return OpenAI(
+            base_url=self.settings.base_url,
+            timeout=self.settings.http_timeout(),
+            max_retries=self.settings.max_retries,
+            http_client=self.settings.build_http_client(),
+        )
+
+    def create_async_llm_client(self):
+        return AsyncOpenAI(
+            base_url=self.settings.base_url,
+            timeout=self.settings.http_timeout(),
+            max_retries=self.settings.max_retries,
+            http_client=self.settings.build_async_http_client(),
+        )
 
     def generate_response(self, model_name, system_prompt, user_prompt):
-        self.notify_observers("input", user_prompt)
         llm = self.get_llm_client()
 
         response = llm.chat.completions.create(
@@ -17,10 +29,50 @@ class OpenAIClient(BaseLLMClass):
             ],
         )
         content = response.choices[0].message.content
+        self.notify_usage(user_prompt, content or "", response.usage)
         if content is not None:
-            self.notify_observers("output", content)
             return content.strip()
 
+    async def agenerate_response(self, model_name, system_prompt, user_prompt):
+        llm = self.get_async_llm_client()
+
+        response = await llm.chat.completions.create(
+            model=model_name,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+        )
+        content = response.choices[0].message.content
+        self.notify_usage(user_prompt, content or "", response.usage)
+        if content is not None:
+            return content.strip()
+
+    def stream_response(self, model_name, system_prompt, user_prompt):
+        llm = self.get_llm_client()
+
+        stream = llm.chat.completions.create(
+            model=model_name,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        parts = []
+        usage = None
+        for chunk in stream:
+            # Usage arrives on the final chunk
+            usage = chunk.usage or usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield delta
+        self.notify_usage(user_prompt, "".join(parts), usage)
+
     def transcribe_audio_file(self, file_path: str, model_name: str) -> str:
         client = self.get_llm_client()
         with open(file_path, "rb") as f:
@@ -28,5 +80,5 @@ class OpenAIClient(BaseLLMClass):
                 file=(file_path, f.read()),
                 model=model_name,
             )
-        self.notify_observers("Output", response.text.strip())
+        self.notify_observers("output", response.text.strip())
         return response.text.strip()
\ No newline at end of file
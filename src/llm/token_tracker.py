@@ -1,30 +1,142 @@
+import time
+import threading
+import contextvars
+from collections import deque
+from datetime import datetime, timezone
 import tiktoken
 from src.llm.base_llm import LLMTokenObserver
-from datetime import datetime
+from src.metrics import LLM_TOKENS, LLM_CALL_TOKENS
+from src.write_behind import WriteBehindQueue
+from src.log import get_logger
+
+logger = get_logger("cybel.tokens")
+
+# User that LLM calls in the current request are attributed to. Copied into
+# worker threads by asyncio.to_thread and into the pipeline event loop.
+token_user = contextvars.ContextVar("token_user", default=None)
+
+
+class TokenUsageWindow:
+    """
+    Rolling per-model/per-user token counters in fixed time buckets.
+
+    Only the last `max_buckets` buckets are kept, so memory is bounded by the
+    window length times the number of active (model, user) pairs.
+    """
+
+    def __init__(self, bucket_seconds: int = 60, max_buckets: int = 60):
+        self.bucket_seconds = bucket_seconds
+        self._buckets = deque(maxlen=max_buckets)  # (bucket start, {(model, user): [input, output, calls]})
+        self._flushed_until = 0
+        self._lock = threading.Lock()
+
+    def _bucket_start(self, timestamp: float) -> int:
+        return int(timestamp // self.bucket_seconds * self.bucket_seconds)
+
+    def add(self, model: str, user_id, input_tokens: int = 0, output_tokens: int = 0, calls: int = 0):
+        start = self._bucket_start(time.time())
+        with self._lock:
+            if not self._buckets or self._buckets[-1][0] < start:
+                self._buckets.append((start, {}))
+            counts = self._buckets[-1][1].setdefault((model, user_id), [0, 0, 0])
+            counts[0] += input_tokens
+            counts[1] += output_tokens
+            counts[2] += calls
+
+    def totals(self, window_seconds: int = None, user_id=None) -> dict:
+        """
+        Sum the counters over the last `window_seconds` (the whole window by
+        default), optionally for one user only.
+
+        Returns:
+            dict: {model: {"input_tokens", "output_tokens", "calls"}}
+        """
+        since = time.time() - window_seconds if window_seconds else 0
+        totals = {}
+        with self._lock:
+            for bucket_start, counters in self._buckets:
+                if bucket_start + self.bucket_seconds <= since:
+                    continue
+                for (model, bucket_user), (input_tokens, output_tokens, calls) in counters.items():
+                    if user_id is not None and bucket_user != user_id:
+                        continue
+                    model_totals = totals.setdefault(model, {"input_tokens": 0, "output_tokens": 0, "calls": 0})
+                    model_totals["input_tokens"] += input_tokens
+                    model_totals["output_tokens"] += output_tokens
+                    model_totals["calls"] += calls
+        return totals
+
+    def flush_completed(self, write) -> int:
+        """
+        Pass the counters of buckets that closed since the last successful
+        flush to `write`, as dictionaries ready to be written to the database.
+
+        The buckets are only marked as flushed once `write` returns, so rows
+        of a failed write are passed again on the next call.
+
+        Returns:
+            int: The number of rows written.
+        """
+        current_start = self._bucket_start(time.time())
+        rows = []
+        with self._lock:
+            for bucket_start, counters in self._buckets:
+                if bucket_start < self._flushed_until or bucket_start >= current_start:
+                    continue
+                rows.extend({
+                    "period_start": datetime.fromtimestamp(bucket_start, tz=timezone.utc).replace(tzinfo=None),
+                    "model": model,
+                    "user_id": user_id,
+                    "input_tokens": input_tokens,
+                    "output_tokens": output_tokens,
+                    "calls": calls,
+                } for (model, user_id), (input_tokens, output_tokens, calls) in counters.items())
+        if rows:
+            write(rows)
+        with self._lock:
+            self._flushed_until = max(self._flushed_until, current_start)
+        return len(rows)
+
+
+# Shared by every tracker so the usage of all models is flushed together
+token_usage = TokenUsageWindow()
+
 
 class TokenTracker(LLMTokenObserver):
-    def __init__(self, model_name: str = "gpt-4"):
+    def __init__(self, model_name: str = "gpt-4", usage: TokenUsageWindow = None):
         """
         Initialize with the model to ensure accurate token encoding.
         """
-        self.token_log = []
         self.model_name = model_name
+        self.usage = usage or token_usage
         try:
             self.encoder = tiktoken.encoding_for_model(model_name)
         except KeyError:
-            print(f"[WARN] Model '{model_name}' not supported. Falling back to 'cl100k_base'.")
+            logger.warning(f"Model '{model_name}' not supported. Falling back to 'cl100k_base'.")
             self.encoder = tiktoken.get_encoding("cl100k_base")
-            
+        # Calls without provider usage are counted with tiktoken off the request thread
+        self._fallback = WriteBehindQueue(self._count_fallback, max_size=1000, batch_size=50,
+                                          name=f"token-counter-{model_name}")
+
     def count_tokens(self, text: str) -> int:
         return len(self.encoder.encode(text))
 
-    def notify(self, event_type: str, content: str, timestamp: datetime):
-        tokens = self.count_tokens(content)
-        log_entry = {
-            "event": event_type,
-            "tokens": tokens,
-            "timestamp": timestamp,
-            "preview": content[:60].replace('\n', ' ') + ("..." if len(content) > 60 else "")
-        }
-        self.token_log.append(log_entry)
-        print(f"[{timestamp}] {event_type.upper():<6} | Tokens: {tokens:>4} | {log_entry['preview']}")
+    def _record(self, event_type: str, tokens: int, user_id):
+        LLM_TOKENS.labels(self.model_name, event_type).inc(tokens)
+        LLM_CALL_TOKENS.labels(self.model_name, event_type).observe(tokens)
+        if event_type == "input":
+            self.usage.add(self.model_name, user_id, input_tokens=tokens, calls=1)
+        else:
+            self.usage.add(self.model_name, user_id, output_tokens=tokens)
+
+    def _count_fallback(self, items):
+        counts = self.encoder.encode_batch([content for _, content, _ in items])
+        for (event_type, _, user_id), tokens in zip(items, counts):
+            self._record(event_type, len(tokens), user_id)
+
+    def notify(self, event_type: str, content: str, timestamp: datetime, tokens: int = None):
+        event_type = "input" if event_type.lower() == "input" else "output"
+        if tokens is None:
+            self._fallback.put((event_type, content, token_user.get()))
+        else:
+            self._record(event_type, tokens, token_user.get())
@@ -0,0 +1,38 @@
+import os
+import json
+import logging
+
+# "text" keeps the plain console lines, "json" emits one JSON object per line
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "timestamp": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **getattr(record, "fields", {}),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Return a logger writing to stderr in the format selected by LOG_FORMAT.
+
+    Structured values are passed as `extra={"fields": {...}}` and become
+    top-level keys in JSON mode.
+    """
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(JSONFormatter() if LOG_FORMAT == "json" else logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(LOG_LEVEL)
+        logger.propagate = False
+    return logger
@@ -0,0 +1,133 @@
+import re
+import time
+from contextlib import contextmanager
+from prometheus_client import Counter, Histogram, REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+from src.log import get_logger
+
+logger = get_logger("cybel.metrics")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_LATENCY = Histogram(
+    "cybel_stage_duration_seconds", "Duration of each query pipeline stage.",
+    ["stage"], buckets=LATENCY_BUCKETS,
+)
+REQUEST_LATENCY = Histogram(
+    "cybel_request_duration_seconds", "End-to-end duration of question requests.",
+    ["endpoint", "source"], buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "cybel_llm_tokens_total", "Tokens sent to and received from LLM providers.",
+    ["model", "direction"],
+)
+LLM_CALL_TOKENS = Histogram(
+    "cybel_llm_call_tokens", "Tokens per prompt or completion.",
+    ["model", "direction"], buckets=(16, 64, 256, 512, 1024, 2048, 4096, 8192, 16384),
+)
+LLM_REQUESTS = Counter(
+    "cybel_llm_requests_total", "LLM provider calls by backend and outcome.",
+    ["backend", "outcome"],
+)
+LLM_HEDGES = Counter(
+    "cybel_llm_hedges_total", "Hedged duplicate requests sent to a secondary backend.",
+    ["backend"],
+)
+REPHRASE_DECISIONS = Counter(
+    "cybel_rephrase_decisions_total", "Queries rephrased or sent to retrieval as they are.",
+    ["decision"],
+)
+CACHE_LOOKUPS = Counter(
+    "cybel_cache_lookups_total", "Chat history and answer cache lookups by result.",
+    ["cache", "result"],
+)
+
+_stage_listeners = []
+
+
+def add_stage_listener(listener):
+    """
+    Call `listener(stage, duration)` for every timed stage, e.g. to keep raw samples.
+    """
+    _stage_listeners.append(listener)
+
+
+def record_stage(stage: str, duration: float):
+    """
+    Record the duration of a pipeline stage in STAGE_LATENCY and the debug log.
+    """
+    STAGE_LATENCY.labels(stage).observe(duration)
+    for listener in _stage_listeners:
+        listener(stage, duration)
+    logger.debug(f"{stage} took {duration * 1000:.1f}ms",
+                 extra={"fields": {"stage": stage, "duration_seconds": duration}})
+
+
+@contextmanager
+def timed(stage: str):
+    """
+    Time the enclosed block as a pipeline stage.
+    """
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start_time)
+
+
+def timed_iter(stage: str, iterable):
+    """
+    Yield the items of `iterable`, timing as a pipeline stage only the time
+    spent producing them. Time the consumer spends on each item, e.g. a slow
+    streaming client, is not counted.
+    """
+    iterator = iter(iterable)
+    duration = 0.0
+    try:
+        while True:
+            start_time = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                duration += time.perf_counter() - start_time
+            yield item
+    finally:
+        if hasattr(iterator, "close"):
+            iterator.close()  # e.g. release the LLM stream when the client disconnects
+        record_stage(stage, duration)
+
+
+class StatsCollector:
+    """
+    Expose the numeric values of a (nested) stats dictionary as gauges at scrape time.
+    """
+
+    def __init__(self, prefix: str, stats_function):
+        self.prefix = prefix
+        self.stats_function = stats_function
+
+    def _flatten(self, stats, prefix):
+        for key, value in stats.items():
+            name = f"{prefix}_{re.sub(r'[^a-zA-Z0-9_]', '_', str(key))}"
+            if isinstance(value, dict):
+                yield from self._flatten(value, name)
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                yield name, value
+
+    def describe(self):
+        return []  # keeps registration from calling stats_function at import time
+
+    def collect(self):
+        try:
+            stats = self.stats_function()
+        except Exception as e:
+            logger.error(f"Failed to collect {self.prefix} stats: {e}")
+            return
+        for name, value in self._flatten(stats, self.prefix):
+            yield GaugeMetricFamily(name, f"{name} from {self.prefix} stats", value=value)
+
+
+def register_stats(prefix: str, stats_function):
+    REGISTRY.register(StatsCollector(prefix, stats_function))
@@ -1,13 +1,50 @@
 import os
+import re
+import json
 import random
-from src.embedder import initialize_vector_store
-from src.stopword_filter import filter_stopwords
+import asyncio
+import numpy as np
+from src.embedder import initialize_vector_store, get_embedding_function
+from src.semantic_cache import SemanticCache
+from src.event_loop import BackgroundEventLoop
+from src.reranker import CrossEncoderReranker
+from src.context_builder import build_context
+from src.lexical_index import get_lexical_index, rebuild_lexical_index, reciprocal_rank_fusion, tokenize
+from src.stopword_filter import filter_stopwords, filter_stopwords_batch
+from src.metrics import timed, timed_iter, REPHRASE_DECISIONS
+from src.log import get_logger
 from src.llm.llm_manager import LLMManager
 
 
 EMBEDDING_TYPE = "sentence_transformers"  # Change to "openai" as needed
 document_collection = "my_documents"
 persist_directory = "./chromadb_persist"
+STOPWORD_FILTER_MODE = "spacy"  # Change to "lexicon" to filter without loading the spaCy model
+RETRIEVAL_MODE = "hybrid"  # Change to "dense" for vector-only retrieval
+LEXICAL_WEIGHT = 0.5  # Share of the BM25 ranking in reciprocal-rank fusion, dense gets the rest
+HYBRID_CANDIDATES_PER_RESULT = 4  # Candidates fetched from each retriever per requested result
+LEXICAL_PREFILTER_MIN_CHUNKS = 50000  # Above this size, dense scoring only covers BM25 candidates
+RERANK_ENABLED = False  # Change to True to re-rank over-fetched candidates with a cross-encoder
+RERANK_CANDIDATES = 20  # Candidates retrieved before re-ranking
+RERANK_TOKEN_BUDGET = 2000  # Maximum context tokens kept after re-ranking
+# Maximum tokens of retrieved context packed into the answer prompt, per model
+CONTEXT_TOKEN_BUDGETS = {"llama-3.3-70b-versatile": 6000}
+DEFAULT_CONTEXT_TOKEN_BUDGET = 4000
+SEMANTIC_CACHE_THRESHOLD = 0.92  # Minimum cosine similarity for a cached answer to be reused
+SEMANTIC_CACHE_TTL_SECONDS = 3600
+SEMANTIC_CACHE_MAX_ENTRIES = 1024
+BATCH_CONCURRENCY = 8  # Concurrent LLM calls when answering a batch of questions
+LLM_PROVIDER = "groq"
+ANSWER_MODEL = "llama-3.3-70b-versatile"
+REPHRASE_MODEL = "llama-3.1-8b-instant"  # Small fast model for query rephrasing
+SUGGESTION_MODEL = "llama-3.1-8b-instant"  # Small fast model for suggested questions
+ADAPTIVE_REPHRASE = True  # Change to False to rephrase every query when rephrasing is requested
+REPHRASE_MIN_WORDS = 4  # Shorter queries are always rephrased
+REPHRASE_MIN_TERM_COVERAGE = 0.6  # Share of query terms that must occur in the knowledge bank to skip rephrasing
+QUESTION_WORDS = ("what", "how", "why", "when", "where", "which", "who", "whom", "whose", "is", "are", "can",
+                  "could", "does", "do", "should", "will", "would", "list", "explain", "describe", "compare")
+
+logger = get_logger("cybel.query")
 
 class OpenAITemperature:
     """Enum-like class for OpenAI temperature settings."""
@@ -16,17 +53,64 @@ class OpenAITemperature:
     MEDIUM = 0.7
     HIGH = 1.0
 
-manager = LLMManager(provider="groq", model_name="llama-3.3-70b-versatile")
+# Secondary backends that slow or failing Groq requests are hedged and failed over to
+LLM_FALLBACKS = [("openai", "gpt-4o-mini")] if os.getenv("OPENAI_API_KEY") else []
 
-# Load the persisted Chroma vector store
-try:
-    VECTOR_STORE = initialize_vector_store(
-        embedding_type=EMBEDDING_TYPE,
-        collection_name=document_collection,
-        persist_directory=persist_directory
-    )
-except Exception as e:
-    raise RuntimeError("Failed to initialize the vector store. Check embeddings and persistence configuration.") from e
+_managers = {}
+
+def get_manager(model_name: str) -> LLMManager:
+    """
+    Return the shared manager for `model_name`, so tasks using the same model share one.
+    """
+    if model_name not in _managers:
+        _managers[model_name] = LLMManager(provider=LLM_PROVIDER, model_name=model_name, fallbacks=LLM_FALLBACKS)
+    return _managers[model_name]
+
+manager = get_manager(ANSWER_MODEL)
+rephrase_manager = get_manager(REPHRASE_MODEL)
+suggestion_manager = get_manager(SUGGESTION_MODEL)
+RERANKER = CrossEncoderReranker()
+PIPELINE_LOOP = BackgroundEventLoop()
+
+
+def get_vector_store():
+    """
+    Return the shared persisted Chroma vector store, opening it on first use.
+
+    Raises:
+        RuntimeError: If the vector store cannot be initialized.
+    """
+    try:
+        return initialize_vector_store(
+            embedding_type=EMBEDDING_TYPE,
+            collection_name=document_collection,
+            persist_directory=persist_directory
+        )
+    except Exception as e:
+        raise RuntimeError("Failed to initialize the vector store. Check embeddings and persistence configuration.") from e
+
+
+ANSWER_CACHE = SemanticCache(
+    get_embedding_function(EMBEDDING_TYPE),
+    similarity_threshold=SEMANTIC_CACHE_THRESHOLD,
+    ttl_seconds=SEMANTIC_CACHE_TTL_SECONDS,
+    max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+    persist_directory=persist_directory
+)
+
+
+def cache_stats():
+    """
+    Return hit/miss statistics of the answer and embedding caches, and the
+    health of the LLM backends.
+    """
+    embedding_cache = getattr(get_embedding_function(EMBEDDING_TYPE), "cache", None)
+    return {
+        "answer_cache": ANSWER_CACHE.stats(),
+        "embedding_cache": embedding_cache.stats() if embedding_cache else None,
+        "llm_backends": {"answer": manager.stats(), "rephrase": rephrase_manager.stats(),
+                         "suggestion": suggestion_manager.stats()},
+    }
 
 
 def semantic_search(query: str, top_k: int = 3):
@@ -44,18 +128,190 @@ def semantic_search(query: str, top_k: int = 3):
         ValueError: If the query is empty after stop-word filtering.
     """
     # Filter stop words from the query
-    cleaned_query = filter_stopwords(query)
+    with timed("stopword_filter"):
+        cleaned_query = filter_stopwords(query, mode=STOPWORD_FILTER_MODE)
     if not cleaned_query:
         raise ValueError("Query is empty after stop-word filtering.")
-    
+
+    if RETRIEVAL_MODE == "hybrid":
+        return hybrid_search(cleaned_query, top_k=top_k)
+
     # Perform similarity search
-    results = VECTOR_STORE.similarity_search(cleaned_query, k=top_k)
+    with timed("vector_search"):
+        results = get_vector_store().similarity_search(cleaned_query, k=top_k)
     return [(result.page_content, result.metadata) for result in results] if results else []
 
 
-def generate_response_with_context(query: str, retrieved_documents: str, metadata: str):
+_lexical_index_checked = False
+
+def get_synced_lexical_index():
     """
-    Generate a response using LLM based on the query and retrieved context.
+    Return the BM25 index, rebuilding it once if it is out of sync with Chroma.
+    """
+    global _lexical_index_checked
+    index = get_lexical_index(persist_directory)
+    if not _lexical_index_checked:
+        vector_store = get_vector_store()
+        if index.count() != vector_store._collection.count():
+            logger.info("Rebuilding BM25 index from the vector store.")
+            rebuild_lexical_index(vector_store, index)
+        _lexical_index_checked = True
+    return index
+
+
+def dense_search(query: str, n_results: int, candidate_ids: list = None, query_embedding: list = None) -> list:
+    """
+    Rank chunks by embedding similarity to the query.
+
+    Args:
+        query (str): The search query.
+        n_results (int): The number of IDs to return.
+        candidate_ids (list): Restrict scoring to these chunks instead of
+            searching the whole collection.
+        query_embedding (list): The query embedding, if already computed.
+
+    Returns:
+        list: Chunk IDs, best first.
+    """
+    vector_store = get_vector_store()
+    if query_embedding is None:
+        query_embedding = vector_store.embeddings.embed_query(query)
+    if candidate_ids is None:
+        with timed("vector_search"):
+            return vector_store._collection.query(query_embeddings=[query_embedding], n_results=n_results,
+                                                  include=[])["ids"][0]
+
+    with timed("vector_search"):
+        candidates = vector_store._collection.get(ids=candidate_ids, include=["embeddings"])
+    embeddings = np.asarray(candidates["embeddings"], dtype=np.float32)
+    query_vector = np.asarray(query_embedding, dtype=np.float32)
+    scores = embeddings @ query_vector / (np.linalg.norm(embeddings, axis=1) * np.linalg.norm(query_vector) + 1e-12)
+    return [candidates["ids"][idx] for idx in np.argsort(-scores)[:n_results]]
+
+
+def hybrid_rank(query: str, top_k: int, query_embedding: list = None) -> list:
+    """
+    Rank chunks by fusing BM25 and dense rankings with reciprocal-rank fusion.
+
+    On large collections, dense scoring is restricted to the BM25 candidates
+    when there are enough of them.
+
+    Args:
+        query (str): The stop-word filtered search query.
+        top_k (int): The number of IDs to return.
+        query_embedding (list): The query embedding, if already computed.
+
+    Returns:
+        list: Chunk IDs, best first.
+    """
+    vector_store = get_vector_store()
+    n_candidates = top_k * HYBRID_CANDIDATES_PER_RESULT
+
+    with timed("lexical_search"):
+        lexical_ids = [doc_id for doc_id, _ in get_synced_lexical_index().search(query, limit=n_candidates)]
+    if vector_store._collection.count() > LEXICAL_PREFILTER_MIN_CHUNKS and len(lexical_ids) >= top_k:
+        dense_ids = dense_search(query, n_candidates, candidate_ids=lexical_ids, query_embedding=query_embedding)
+    else:
+        dense_ids = dense_search(query, n_candidates, query_embedding=query_embedding)
+
+    return reciprocal_rank_fusion([lexical_ids, dense_ids], weights=[LEXICAL_WEIGHT, 1 - LEXICAL_WEIGHT])[:top_k]
+
+
+def fetch_chunks(ids: list) -> dict:
+    """
+    Fetch the content and metadata of chunks by ID.
+
+    Returns:
+        dict: {chunk ID: (content, metadata)} for the IDs that exist.
+    """
+    if not ids:
+        return {}
+    with timed("vector_search"):
+        documents = get_vector_store()._collection.get(ids=ids, include=["documents", "metadatas"])
+    return {doc_id: (content, metadata) for doc_id, content, metadata
+            in zip(documents["ids"], documents["documents"], documents["metadatas"])}
+
+
+def hybrid_search(query: str, top_k: int = 3):
+    """
+    Retrieve chunks by fusing BM25 and dense rankings with reciprocal-rank fusion.
+
+    Args:
+        query (str): The stop-word filtered search query.
+        top_k (int): The number of top results to return.
+
+    Returns:
+        list: A list of tuples containing the content and metadata of results.
+    """
+    fused_ids = hybrid_rank(query, top_k)
+    chunks = fetch_chunks(fused_ids)
+    return [chunks[doc_id] for doc_id in fused_ids if doc_id in chunks]
+
+
+def retrieval_depth(top_k: int) -> int:
+    """
+    Number of chunks to retrieve for `top_k` final results, over-fetching when re-ranking.
+    """
+    return max(top_k, RERANK_CANDIDATES) if RERANK_ENABLED else top_k
+
+
+def rerank_results(query: str, results: list, top_k: int) -> list:
+    """
+    Re-rank retrieved chunks with the cross-encoder and keep the best ones
+    under the context token budget. Returns the results unchanged when
+    re-ranking is disabled.
+
+    Args:
+        query (str): The search query.
+        results (list): Candidate (content, metadata) tuples.
+        top_k (int): The number of results to keep.
+
+    Returns:
+        list: The kept (content, metadata) tuples.
+    """
+    if not RERANK_ENABLED:
+        return results[:top_k]
+    with timed("rerank"):
+        return RERANKER.rerank(query, results, top_k, token_budget=RERANK_TOKEN_BUDGET,
+                               count_tokens=manager.token_tracker.count_tokens)
+
+
+def prepare_context(query: str, search_results: list, number_of_results: int):
+    """
+    Re-rank retrieved chunks and assemble the kept ones into the prompt context.
+
+    Args:
+        query (str): The search query.
+        search_results (list): Candidate (content, metadata) tuples.
+        number_of_results (int): The number of results to keep.
+
+    Returns:
+        tuple: The kept search results, and the context and metadata strings.
+    """
+    search_results = rerank_results(query, search_results, number_of_results)
+    context, metadata = assemble_context(search_results)
+    return search_results, context, metadata
+
+
+def assemble_context(search_results: list):
+    """
+    Merge and deduplicate retrieved chunks into context and metadata sections
+    that fit the context token budget of the answer model.
+
+    Args:
+        search_results (list): (content, metadata) tuples, best first.
+
+    Returns:
+        tuple: The context and metadata strings.
+    """
+    token_budget = CONTEXT_TOKEN_BUDGETS.get(manager.model_name, DEFAULT_CONTEXT_TOKEN_BUDGET)
+    with timed("context_assembly"):
+        return build_context(search_results, encoder=manager.token_tracker.encoder, token_budget=token_budget)
+
+
+def build_answer_prompt(query: str, retrieved_documents: str, metadata: str) -> str:
+    """
+    Build the answer-generation prompt from the query and retrieved context.
 
     Args:
         query (str): The original user query.
@@ -63,7 +319,7 @@ def generate_response_with_context(query: str, retrieved_documents: str, metadat
         metadata (str): Metadata for references.
 
     Returns:
-        str: The formatted response.
+        str: The prompt passed to the LLM.
     """
     prompt = f"""
     You are tasked with answering a question based STRICTLY on the provided context. you have to formulate the answer and write in your own words.
@@ -100,12 +356,50 @@ def generate_response_with_context(query: str, retrieved_documents: str, metadat
     1.
     2.
     """
+    return prompt
+
+
+def generate_response_with_context(query: str, retrieved_documents: str, metadata: str):
+    """
+    Generate a response using LLM based on the query and retrieved context.
+
+    Args:
+        query (str): The original user query.
+        retrieved_documents (str): Retrieved context for generating the response.
+        metadata (str): Metadata for references.
+
+    Returns:
+        str: The formatted response.
+    """
+    prompt = build_answer_prompt(query, retrieved_documents, metadata)
 
     # Pass the prompt to the LLM
-    response = manager.generate_response(system_prompt="", user_prompt=prompt)
+    with timed("llm_answer"):
+        response = manager.generate_response(system_prompt="", user_prompt=prompt)
     return response
 
 
+async def agenerate_response_with_context(query: str, retrieved_documents: str, metadata: str):
+    """
+    Asynchronous variant of `generate_response_with_context`.
+    """
+    prompt = build_answer_prompt(query, retrieved_documents, metadata)
+    with timed("llm_answer"):
+        return await manager.agenerate_response(system_prompt="", user_prompt=prompt)
+
+
+def build_rephrase_prompt(query: str) -> str:
+    """
+    Build the prompt asking the LLM to rephrase a query for better clarity.
+    """
+    return f"""
+    System: You are an expert in rephrasing queries. Please rephrase the following query for better clarity:
+
+    Query:
+    {query}
+    """
+
+
 def rephrase_query(query: str) -> str:
     """
     Rephrase the user query for better clarity using LLM.
@@ -116,68 +410,420 @@ def rephrase_query(query: str) -> str:
     Returns:
         str: The rephrased query.
     """
-    prompt = f"""
-    System: You are an expert in rephrasing queries. Please rephrase the following query for better clarity:
+    with timed("llm_rephrase"):
+        return rephrase_manager.generate_response(system_prompt="", user_prompt=build_rephrase_prompt(query))
 
-    Query:
-    {query}
+
+def needs_rephrasing(query: str) -> bool:
     """
-    return manager.generate_response(system_prompt="", user_prompt=prompt)
+    Decide whether a query is worth an LLM rephrasing round trip.
 
+    Short queries, queries not phrased as a question or request, and queries
+    whose terms are mostly missing from the knowledge bank are rephrased.
+    Well-formed queries go to retrieval as they are.
 
-def process_query(query: str, number_of_results: int = 3, is_rephrased: bool = False):
+    Args:
+        query (str): The user query.
+
+    Returns:
+        bool: True if the query should be rephrased.
     """
-    Process the user query by performing semantic search and generating a response.
+    if not ADAPTIVE_REPHRASE:
+        return True
+
+    words = query.split()
+    if len(words) < REPHRASE_MIN_WORDS:
+        decision = True
+    elif not (query.rstrip().endswith("?") or words[0].lower() in QUESTION_WORDS):
+        decision = True
+    else:
+        terms = set(tokenize(filter_stopwords(query, mode="lexicon")))
+        try:
+            known_terms = get_synced_lexical_index().known_terms(terms)
+        except Exception:
+            known_terms = terms  # without the index, judge by phrasing alone
+        decision = not terms or len(known_terms) / len(terms) < REPHRASE_MIN_TERM_COVERAGE
+
+    REPHRASE_DECISIONS.labels("rephrase" if decision else "skip").inc()
+    return decision
+
+
+def retrieve_context(query: str, number_of_results: int = 3, is_rephrased: bool = False):
+    """
+    Optionally rephrase the query and retrieve its context from the vector store.
 
     Args:
         query (str): The user query.
+        number_of_results (int): The number of chunks to retrieve.
+        is_rephrased (bool): Whether to rephrase the query with the LLM first,
+            if `needs_rephrasing` finds it worthwhile.
 
     Returns:
-        dict: A dictionary containing the answer, follow-up questions, and references.
+        tuple: The (possibly rephrased) query, the search results, and the
+            formatted context and metadata strings.
     """
     # Rephrase the query
-    if is_rephrased:
+    if is_rephrased and needs_rephrasing(query):
         query = rephrase_query(query)
 
     # Perform semantic search to retrieve context
-    search_results = semantic_search(query, top_k=number_of_results)
-    if search_results:
-        context = "\n".join(f"Context {idx}: {content}" for idx, (content, _) in enumerate(search_results))
-        metadata = "\n".join(f"Metadata {idx}: {meta}" for idx, (_, meta) in enumerate(search_results))
-    else:
-        context = "No relevant context found."
-        metadata = "No metadata available."
+    search_results = semantic_search(query, top_k=retrieval_depth(number_of_results))
+    search_results, context, metadata = prepare_context(query, search_results, number_of_results)
+    return query, search_results, context, metadata
 
-    # Generate response
-    response = generate_response_with_context(query, context, metadata)
 
-    # Parse the response
-    answer = response.split("Answer:")[1].split("Follow-up Questions:")[0].strip()
+def _parse_answer(response: str) -> str:
+    return response.split("Answer:")[1].split("Follow-up Questions:")[0].strip()
+
 
+def _parse_follow_ups(response: str) -> list:
     try:
         follow_up_questions = response.split("Follow-up Questions:")[1].split("References:")[0].strip().split("\n")
-        follow_up_questions = [q.strip() for q in follow_up_questions if q.strip()]
+        return [q.strip() for q in follow_up_questions if q.strip()]
     except IndexError:
-        follow_up_questions = []
+        return []
 
+
+def _parse_references(response: str) -> list:
     try:
         references = response.split("References:")[1].strip()
-        references = [ref.strip() for ref in references.split("\n") if ref.strip()]
+        return [ref.strip() for ref in references.split("\n") if ref.strip()]
     except IndexError:
-        references = []
+        return []
+
+
+def parse_response(response: str) -> dict:
+    """
+    Parse an LLM completion into its Answer, Follow-up Questions and References sections.
+
+    Args:
+        response (str): The raw LLM completion.
+
+    Returns:
+        dict: A dictionary containing the answer, follow-up questions, and references.
+    """
+    with timed("parse"):
+        return {"answer": _parse_answer(response),
+                "follow_ups": _parse_follow_ups(response),
+                "references": _parse_references(response),
+        }
+
+
+class StreamingResponseParser:
+    """
+    Incrementally parse a streamed completion, emitting each section as soon
+    as the marker of the following section has been received.
+    """
+    SECTIONS = (
+        ("answer", "Follow-up Questions:", _parse_answer),
+        ("follow_ups", "References:", _parse_follow_ups),
+        ("references", None, _parse_references),
+    )
+
+    def __init__(self):
+        self.buffer = ""
+        self.sections = {}  # the parsed sections so far, by name
+        self._next_section = 0
+
+    def _parse(self, name, parse):
+        # A completion without its "Answer:" marker yields an empty answer instead of failing
+        try:
+            self.sections[name] = parse(self.buffer)
+        except IndexError:
+            self.sections[name] = ""
+        return name, self.sections[name]
+
+    def feed(self, token: str) -> list:
+        """
+        Add a streamed token and return the sections completed by it.
+
+        Returns:
+            list: (section name, parsed value) tuples, in output order.
+        """
+        self.buffer += token
+        completed = []
+        while self._next_section < len(self.SECTIONS):
+            name, end_marker, parse = self.SECTIONS[self._next_section]
+            if end_marker is None or end_marker not in self.buffer:
+                break
+            completed.append(self._parse(name, parse))
+            self._next_section += 1
+        return completed
+
+    def close(self) -> list:
+        """
+        Flush the sections that were still open when the stream ended.
+
+        Returns:
+            list: (section name, parsed value) tuples, in output order.
+        """
+        completed = [self._parse(name, parse) for name, _, parse in self.SECTIONS[self._next_section:]]
+        self._next_section = len(self.SECTIONS)
+        return completed
+
+
+def process_query(query: str, number_of_results: int = 3, is_rephrased: bool = False):
+    """
+    Process the user query by performing semantic search and generating a response.
+
+    Args:
+        query (str): The user query.
+
+    Returns:
+        dict: A dictionary containing the answer, follow-up questions, and references.
+    """
+    query, search_results, context, metadata = retrieve_context(query, number_of_results, is_rephrased)
+
+    # Generate response
+    response = generate_response_with_context(query, context, metadata)
+
+    # Parse the response
+    result = parse_response(response)
 
     for idx, context in enumerate(search_results):
-        print(f"Context {idx}: {context}")
-    
+        logger.debug(f"Context {idx}: {context}", extra={"fields": {"context_index": idx}})
+
+    logger.info(f"Query: {query}\nAnswer: {result['answer']}\n"
+                f"Follow-up Questions: {result['follow_ups']}\nReferences: {result['references']}",
+                extra={"fields": {"query": query, "follow_ups": len(result["follow_ups"]),
+                                  "references": len(result["references"])}})
+
+    return result
+
+
+def stream_query(query: str, number_of_results: int = 3, is_rephrased: bool = False):
+    """
+    Process the user query like `process_query`, streaming the answer as it is generated.
+
+    Args:
+        query (str): The user query.
+        number_of_results (int): The number of chunks to retrieve.
+        is_rephrased (bool): Whether to rephrase the query with the LLM first,
+            if `needs_rephrasing` finds it worthwhile.
+
+    Yields:
+        tuple: ("token", str) for every generated token, (section name, value)
+            for each of "answer", "follow_ups" and "references" once complete,
+            and finally ("done", dict) with the fully parsed response.
+    """
+    query, _, context, metadata = retrieve_context(query, number_of_results, is_rephrased)
+    prompt = build_answer_prompt(query, context, metadata)
+
+    parser = StreamingResponseParser()
+    # Time only the provider stream, not the time spent waiting on the client at each yield
+    for token in timed_iter("llm_answer", manager.stream_response(system_prompt="", user_prompt=prompt)):
+        yield "token", token
+        yield from parser.feed(token)
+    yield from parser.close()
+
+    yield "done", dict(parser.sections)
+
+
+async def arephrase_query(query: str) -> str:
+    """
+    Asynchronous variant of `rephrase_query`.
+    """
+    with timed("llm_rephrase"):
+        return await rephrase_manager.agenerate_response(system_prompt="", user_prompt=build_rephrase_prompt(query))
+
 
-    print(f"Query: {query}")
-    print(f"Answer: {answer}")
-    print(f"Follow-up Questions: {follow_up_questions}")
-    print(f"References: {references}")
+def merge_search_results(*result_sets, limit: int = None):
+    """
+    Interleave several search result lists, dropping duplicate chunks.
+
+    Args:
+        *result_sets (list): Lists of (content, metadata) tuples, best first.
+        limit (int): Maximum number of results to keep.
+
+    Returns:
+        list: The merged (content, metadata) tuples.
+    """
+    merged = []
+    seen = set()
+    for rank in range(max((len(results) for results in result_sets), default=0)):
+        for results in result_sets:
+            if rank < len(results) and results[rank][0] not in seen:
+                seen.add(results[rank][0])
+                merged.append(results[rank])
+    return merged[:limit] if limit else merged
+
+
+async def aprocess_query(query: str, number_of_results: int = 3, is_rephrased: bool = False):
+    """
+    Asynchronous variant of `process_query`.
 
-    return {"answer": answer, "follow_ups": follow_up_questions, 
-            "references": references,
-    } 
+    When rephrasing, retrieval on the raw query runs concurrently with the
+    rephrase LLM call, and its results are merged with the results for the
+    rephrased query. A raw query that is empty after stop-word filtering
+    contributes no results instead of failing the request.
+
+    Args:
+        query (str): The user query.
+        number_of_results (int): The number of chunks to retrieve.
+        is_rephrased (bool): Whether to rephrase the query with the LLM first,
+            if `needs_rephrasing` finds it worthwhile.
+
+    Returns:
+        dict: A dictionary containing the answer, follow-up questions, and references.
+    """
+    depth = retrieval_depth(number_of_results)
+    if is_rephrased and await asyncio.to_thread(needs_rephrasing, query):
+        async def raw_search():
+            try:
+                return await asyncio.to_thread(semantic_search, query, top_k=depth)
+            except ValueError:
+                return []
+
+        raw_results, query = await asyncio.gather(raw_search(), arephrase_query(query))
+        rephrased_results = await asyncio.to_thread(semantic_search, query, top_k=depth)
+        search_results = merge_search_results(rephrased_results, raw_results, limit=depth)
+    else:
+        search_results = await asyncio.to_thread(semantic_search, query, top_k=depth)
+    _, context, metadata = await asyncio.to_thread(prepare_context, query, search_results, number_of_results)
+    response = await agenerate_response_with_context(query, context, metadata)
+    return parse_response(response)
+
+
+def batch_search(queries: list, top_k: int = 3) -> list:
+    """
+    Retrieve chunks for many queries at once.
+
+    Stop-word filtering runs as one spaCy pipe, the queries are embedded in
+    one batched encode call, and identical queries share one retrieval. Dense
+    rankings for all queries come from a single multi-query Chroma search; in
+    hybrid mode each is then fused with the query's BM25 ranking, as in
+    `hybrid_rank`.
+
+    Args:
+        queries (list): The search queries.
+        top_k (int): The number of top results to return per query.
+
+    Returns:
+        list: A list of (content, metadata) tuples per query, or None for
+            queries that are empty after stop-word filtering.
+    """
+    with timed("stopword_filter"):
+        cleaned_queries = filter_stopwords_batch(queries, mode=STOPWORD_FILTER_MODE)
+    unique_queries = list(dict.fromkeys(query for query in cleaned_queries if query))
+    if not unique_queries:
+        return [None] * len(queries)
+
+    vector_store = get_vector_store()
+    with timed("embedding"):
+        query_embeddings = vector_store.embeddings.embed_documents(unique_queries)
+
+    hybrid = RETRIEVAL_MODE == "hybrid"
+    n_results = top_k * HYBRID_CANDIDATES_PER_RESULT if hybrid else top_k
+    with timed("vector_search"):
+        rankings = vector_store._collection.query(query_embeddings=query_embeddings,
+                                                  n_results=n_results, include=[])["ids"]
+    if hybrid:
+        index = get_synced_lexical_index()
+        with timed("lexical_search"):
+            lexical_rankings = [[doc_id for doc_id, _ in index.search(query, limit=n_results)]
+                                for query in unique_queries]
+        rankings = [reciprocal_rank_fusion([lexical_ids, dense_ids],
+                                           weights=[LEXICAL_WEIGHT, 1 - LEXICAL_WEIGHT])[:top_k]
+                    for lexical_ids, dense_ids in zip(lexical_rankings, rankings)]
+
+    # Chunks retrieved for several queries are fetched once
+    by_id = fetch_chunks(list(dict.fromkeys(doc_id for ranking in rankings for doc_id in ranking)))
+    results = {query: [by_id[doc_id] for doc_id in ranking if doc_id in by_id]
+               for query, ranking in zip(unique_queries, rankings)}
+    return [results[query] if query else None for query in cleaned_queries]
+
+
+async def abatch_process_queries(queries: list, number_of_results: int = 3, is_rephrased: bool = False,
+                                 concurrency: int = BATCH_CONCURRENCY):
+    """
+    Answer many queries with one batched retrieval and bounded-concurrency generation.
+
+    Identical queries are answered once. A query that fails yields
+    {"error": message} instead of stopping the batch.
+
+    Args:
+        queries (list): The user queries.
+        number_of_results (int): The number of chunks to retrieve per query.
+        is_rephrased (bool): Whether to rephrase each query with the LLM first,
+            if `needs_rephrasing` finds it worthwhile.
+        concurrency (int): Maximum number of LLM calls in flight.
+
+    Yields:
+        tuple: The index of the query in `queries` and its result dictionary,
+            in completion order.
+    """
+    positions = {}
+    for idx, query in enumerate(queries):
+        positions.setdefault(query, []).append(idx)
+    unique_queries = list(positions)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    search_queries = unique_queries
+    if is_rephrased:
+        async def rephrase(query):
+            if not await asyncio.to_thread(needs_rephrasing, query):
+                return query
+            async with semaphore:
+                return await arephrase_query(query)
+
+        rephrased = await asyncio.gather(*(rephrase(query) for query in unique_queries), return_exceptions=True)
+        # A failed rephrase falls back to the original query
+        search_queries = [query if isinstance(result, BaseException) or not result else result
+                          for query, result in zip(unique_queries, rephrased)]
+
+    search_results = await asyncio.to_thread(batch_search, search_queries, top_k=retrieval_depth(number_of_results))
+
+    async def answer(idx):
+        query, results = search_queries[idx], search_results[idx]
+        if results is None:
+            return idx, {"error": "Query is empty after stop-word filtering."}
+        try:
+            async with semaphore:
+                _, context, metadata = await asyncio.to_thread(prepare_context, query, results, number_of_results)
+                response = await agenerate_response_with_context(query, context, metadata)
+            return idx, parse_response(response)
+        except Exception as e:
+            return idx, {"error": str(e)}
+
+    tasks = [asyncio.ensure_future(answer(idx)) for idx in range(len(unique_queries))]
+    try:
+        for completed in asyncio.as_completed(tasks):
+            idx, result = await completed
+            for position in positions[unique_queries[idx]]:
+                yield position, result
+    finally:
+        # The consumer stopped early or timed out: don't leave answers generating in the background.
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+def parse_question_records(lines) -> list:
+    """
+    Parse JSONL question records, each either a JSON string or an object
+    with a "question" field. Other fields are passed through to the results.
+
+    Returns:
+        list: Record dictionaries with a "question" key.
+
+    Raises:
+        ValueError: If a line is not valid JSON or has no question.
+    """
+    records = []
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Line {line_number} is not valid JSON: {e}") from e
+        if isinstance(record, str):
+            record = {"question": record}
+        if not isinstance(record, dict) or not isinstance(record.get("question"), str):
+            raise ValueError(f"Line {line_number} has no question.")
+        records.append(record)
+    return records
 
 
 def get_random_document_chunks():
@@ -194,12 +840,11 @@ def get_random_document_chunks():
         "What programming language are you written in?",
     ]
     
-    if VECTOR_STORE is None:
-        raise RuntimeError("Vector store is not initialized.")
+    vector_store = get_vector_store()
 
     # Get all the keys (IDs) of documents from the vector store
     try:
-        all_keys = VECTOR_STORE._collection.get()["ids"]
+        all_keys = vector_store._collection.get()["ids"]
     except Exception as e:
         return initial_questions
 
@@ -213,7 +858,7 @@ def get_random_document_chunks():
     random_chunks = ""
     for key in random_keys:
         try:
-            document = VECTOR_STORE._collection.get(ids=[key])
+            document = vector_store._collection.get(ids=[key])
             if document["documents"]:
                 print(f"Lenght of document: {len(document['documents'])}")
                 content = document["documents"][0]  # Assuming one document per ID
@@ -225,6 +870,19 @@ def get_random_document_chunks():
     print(f"Random Chunks: {random_chunks}")
 
     # call llm to form question based on the context
+    return generate_questions_from_context(random_chunks)
+
+
+def generate_questions_from_context(context: str) -> list:
+    """
+    Ask the LLM for 3 questions answerable from the given context.
+
+    Args:
+        context (str): One or more document chunks.
+
+    Returns:
+        list: The non-empty lines of the LLM response.
+    """
     prompt = f"""
     Genearet 3 questions based on the following context. 
     
@@ -237,7 +895,7 @@ def get_random_document_chunks():
         - The questions should be relevant to the context and should be connected to the context.
 
     Context:
-    {random_chunks}
+    {context}
 
     Output Format:
     1. Question 1:
@@ -245,11 +903,42 @@ def get_random_document_chunks():
     3. Question 3:
     """
 
-    initial_questions = manager.generate_response(system_prompt="", user_prompt=prompt)
-    # print(f"Random Chunks: {random_chunks}")
-    # print(f"Generated Questions: {initial_questions}")
+    questions = suggestion_manager.generate_response(system_prompt="", user_prompt=prompt)
 
     # split and make a list of questions
-    initial_questions = initial_questions.split("\n")
-    initial_questions = [q.strip() for q in initial_questions if q.strip()]
-    return initial_questions
+    questions = questions.split("\n")
+    return [q.strip() for q in questions if q.strip()]
+
+
+def get_chunk_ids() -> list:
+    """
+    Return the IDs of every chunk in the knowledge bank.
+    """
+    return get_vector_store()._collection.get(include=[])["ids"]
+
+
+def generate_chunk_questions(chunk_ids: list):
+    """
+    Generate suggested questions for each chunk, one LLM call per chunk.
+
+    Args:
+        chunk_ids (list): IDs of the chunks to generate questions for.
+
+    Yields:
+        tuple: The chunk ID and its list of cleaned-up questions, empty when
+            generation failed.
+    """
+    if not chunk_ids:
+        return
+    documents = get_vector_store()._collection.get(ids=chunk_ids, include=["documents"])
+    for chunk_id, content in zip(documents["ids"], documents["documents"]):
+        try:
+            lines = generate_questions_from_context(content)
+        except Exception as e:
+            logger.warning(f"Failed to generate questions for chunk {chunk_id}: {e}",
+                           extra={"fields": {"chunk_id": chunk_id}})
+            yield chunk_id, []
+            continue
+        # Drop numbering such as "1. Question 1:" and any preamble lines
+        questions = [re.sub(r"^(\d+[.)]\s*)?(Question \d+:\s*)?", "", line).strip() for line in lines]
+        yield chunk_id, [q for q in questions if q.endswith("?")]
@@ -0,0 +1,59 @@
+import threading
+
+
+class CrossEncoderReranker:
+    """
+    Re-rank retrieved chunks with a CPU cross-encoder, scoring every
+    (query, chunk) pair in one batched forward pass.
+    """
+
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2", batch_size: int = 64):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self._model = None
+        self._model_lock = threading.Lock()
+
+    @property
+    def model(self):
+        """Load the CrossEncoder model on first use."""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name, device="cpu")
+        return self._model
+
+    def rerank(self, query: str, results: list, top_n: int, token_budget: int = None, count_tokens=None) -> list:
+        """
+        Keep the best `top_n` results that fit in the token budget.
+
+        Args:
+            query (str): The search query.
+            results (list): Candidate (content, metadata) tuples.
+            top_n (int): Maximum number of results to keep.
+            token_budget (int): Maximum total tokens of the kept chunk contents.
+            count_tokens (callable): Counts the tokens of a string; required
+                when a token budget is set.
+
+        Returns:
+            list: The kept (content, metadata) tuples, best first.
+        """
+        if not results:
+            return []
+
+        scores = self.model.predict([(query, content) for content, _ in results], batch_size=self.batch_size)
+        ranked = [result for _, result in sorted(zip(scores, results), key=lambda pair: -pair[0])]
+
+        kept = []
+        used_tokens = 0
+        for content, metadata in ranked:
+            if len(kept) >= top_n:
+                break
+            if token_budget is not None:
+                tokens = count_tokens(content)
+                # Always keep the best chunk, even if it alone exceeds the budget
+                if kept and used_tokens + tokens > token_budget:
+                    continue
+                used_tokens += tokens
+            kept.append((content, metadata))
+        return kept
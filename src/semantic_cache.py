@@ -0,0 +1,157 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+class SemanticCache:
+    """
+    Cross-user cache of generated answers keyed on the query embedding.
+
+    A lookup returns the cached answer of the most similar stored query if its
+    cosine similarity reaches `similarity_threshold`. Entries expire after
+    `ttl_seconds`, the least recently used entry is evicted once `max_entries`
+    is reached, and the whole cache is dropped when the knowledge bank in
+    `persist_directory` changes on disk.
+    """
+
+    def __init__(self, embedding_function, similarity_threshold: float = 0.92,
+                 ttl_seconds: float = 3600, max_entries: int = 1024,
+                 persist_directory: str = None):
+        self.embedding_function = embedding_function
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.persist_directory = persist_directory
+
+        self._entries = OrderedDict()  # key -> (normalized embedding, params, result, created_at)
+        self._next_key = 0
+        self._matrix = None
+        self._matrix_keys = []
+        self._lock = threading.Lock()
+        self._knowledge_bank_version = self._read_knowledge_bank_version()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _read_knowledge_bank_version(self):
+        if not self.persist_directory:
+            return None
+        try:
+            return os.path.getmtime(os.path.join(self.persist_directory, "chroma.sqlite3"))
+        except OSError:
+            return None
+
+    def _check_knowledge_bank(self):
+        version = self._read_knowledge_bank_version()
+        if version != self._knowledge_bank_version:
+            self._knowledge_bank_version = version
+            self._clear()
+
+    def _clear(self):
+        if self._entries:
+            self.invalidations += 1
+        self._entries.clear()
+        self._matrix = None
+        self._matrix_keys = []
+
+    def _expire(self, now):
+        expired = [key for key, (_, _, _, created_at) in self._entries.items()
+                   if now - created_at > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._matrix = None
+
+    def _similarity_matrix(self):
+        if self._matrix is None:
+            self._matrix_keys = list(self._entries.keys())
+            self._matrix = (np.stack([self._entries[key][0] for key in self._matrix_keys])
+                            if self._matrix_keys else None)
+        return self._matrix
+
+    def embed(self, query: str):
+        """
+        Embed and L2-normalize a query for use with `lookup` and `store`.
+        """
+        embedding = np.asarray(self.embedding_function.embed_query(query), dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm else embedding
+
+    def lookup(self, query: str, embedding=None, **params):
+        """
+        Return the cached result for the most similar query, or None on a miss.
+
+        Args:
+            query (str): The user query.
+            embedding: The query embedding from `embed`, computed if omitted.
+            **params: Request parameters that must match the cached entry exactly.
+
+        Returns:
+            dict or None: A copy of the cached result.
+        """
+        if embedding is None:
+            embedding = self.embed(query)
+
+        with self._lock:
+            self._check_knowledge_bank()
+            self._expire(time.time())
+
+            matrix = self._similarity_matrix()
+            if matrix is not None:
+                scores = matrix @ embedding
+                for idx in np.argsort(-scores):
+                    if scores[idx] < self.similarity_threshold:
+                        break
+                    key = self._matrix_keys[idx]
+                    _, entry_params, result, _ = self._entries[key]
+                    if entry_params == params:
+                        self._entries.move_to_end(key)
+                        self.hits += 1
+                        return dict(result)
+
+            self.misses += 1
+            return None
+
+    def store(self, query: str, result: dict, embedding=None, **params):
+        """
+        Cache the result generated for `query` under the given request parameters.
+        """
+        if embedding is None:
+            embedding = self.embed(query)
+
+        with self._lock:
+            self._check_knowledge_bank()
+            while len(self._entries) >= self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._entries[self._next_key] = (embedding, params, dict(result), time.time())
+            self._next_key += 1
+            self._matrix = None
+
+    def clear(self):
+        """
+        Drop every cached answer, e.g. after the knowledge bank was re-ingested.
+        """
+        with self._lock:
+            self._clear()
+            self._knowledge_bank_version = self._read_knowledge_bank_version()
+
+    def stats(self) -> dict:
+        """
+        Return hit/miss counters and the current cache size.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "size": len(self._entries),
+                "similarity_threshold": self.similarity_threshold,
+            }
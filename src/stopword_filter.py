@@ -1,27 +1,96 @@
+import threading
 import spacy
+from spacy.lang.en.stop_words import STOP_WORDS
 
-def filter_stopwords(text, model="en_core_web_sm"):
+# Only the tokenizer and the lexical `is_stop` attribute are needed, so every
+# trained pipeline component is excluded when loading the model.
+EXCLUDED_COMPONENTS = ["tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer", "ner", "senter"]
+
+# "spacy" tokenizes with the model's pipeline, "lexicon" never loads a model:
+# it tokenizes with a blank English tokenizer and checks spaCy's English
+# stop-word list.
+FILTER_MODES = ("spacy", "lexicon")
+
+_pipelines = {}
+_pipelines_lock = threading.Lock()
+_tokenizer = None
+
+
+def get_pipeline(model="en_core_web_sm"):
+    """
+    Return the process-wide spaCy pipeline for `model`, loading it on first use.
+
+    Args:
+        model (str): The spaCy language model to use (default is "en_core_web_sm").
+
+    Returns:
+        spacy.language.Language: The shared, tokenizer-only pipeline.
+
+    Raises:
+        OSError: If the specified spaCy model is not found.
+    """
+    nlp = _pipelines.get(model)
+    if nlp is not None:
+        return nlp
+
+    with _pipelines_lock:
+        nlp = _pipelines.get(model)
+        if nlp is None:
+            try:
+                nlp = spacy.load(model, exclude=EXCLUDED_COMPONENTS)
+            except OSError as e:
+                raise OSError(f"Error loading spaCy model '{model}'. Ensure it is installed.") from e
+            _pipelines[model] = nlp
+    return nlp
+
+
+def get_tokenizer():
+    """
+    Return the process-wide blank English tokenizer used in lexicon mode.
+    """
+    global _tokenizer
+    if _tokenizer is None:
+        with _pipelines_lock:
+            if _tokenizer is None:
+                _tokenizer = spacy.blank("en").tokenizer
+    return _tokenizer
+
+
+def _validate_mode(mode):
+    if mode not in FILTER_MODES:
+        raise ValueError(f"Invalid filter mode '{mode}'. Choose one of {FILTER_MODES}.")
+
+
+def _filter_lexicon(doc):
+    return " ".join(token.text for token in doc if token.lower_ not in STOP_WORDS)
+
+
+def filter_stopwords(text, model="en_core_web_sm", mode="spacy"):
     """
     Removes stop words from the input text using spaCy.
 
     Args:
         text (str): The input text to filter.
         model (str): The spaCy language model to use (default is "en_core_web_sm").
+            Not loaded in lexicon mode.
+        mode (str): "spacy" to tokenize with the model's pipeline or "lexicon"
+            to match blank-tokenizer tokens against spaCy's English stop words.
 
     Returns:
-        list: A list of words from the text without stop words.
+        str: The text without stop words, joined by single spaces.
 
     Raises:
-        ValueError: If the input text is not a string.
+        ValueError: If the input text is not a string or the mode is unknown.
         OSError: If the specified spaCy model is not found.
     """
     if not isinstance(text, str):
         raise ValueError("Input text must be a string.")
+    _validate_mode(mode)
 
-    try:
-        nlp = spacy.load(model)
-    except OSError as e:
-        raise OSError(f"Error loading spaCy model '{model}'. Ensure it is installed.") from e
+    if mode == "lexicon":
+        return _filter_lexicon(get_tokenizer()(text))
+
+    nlp = get_pipeline(model)
 
     # Process text
     doc = nlp(text)
@@ -34,6 +103,37 @@ def filter_stopwords(text, model="en_core_web_sm"):
     return cleaned_output
 
 
+def filter_stopwords_batch(texts, model="en_core_web_sm", mode="spacy", batch_size=256, n_process=1):
+    """
+    Removes stop words from many texts at once using `nlp.pipe`.
+
+    Args:
+        texts (list): The input texts to filter.
+        model (str): The spaCy language model to use (default is "en_core_web_sm").
+        mode (str): "spacy" or "lexicon", see `filter_stopwords`.
+        batch_size (int): Number of texts tokenized per spaCy batch.
+        n_process (int): Number of worker processes used by `nlp.pipe`.
+
+    Returns:
+        list: The filtered texts, in the same order as the input.
+
+    Raises:
+        ValueError: If any input is not a string or the mode is unknown.
+        OSError: If the specified spaCy model is not found.
+    """
+    texts = list(texts)
+    if not all(isinstance(text, str) for text in texts):
+        raise ValueError("Input texts must be strings.")
+    _validate_mode(mode)
+
+    if mode == "lexicon":
+        return [_filter_lexicon(doc) for doc in get_tokenizer().pipe(texts, batch_size=batch_size)]
+
+    nlp = get_pipeline(model)
+    return [" ".join(token.text for token in doc if not token.is_stop)
+            for doc in nlp.pipe(texts, batch_size=batch_size, n_process=n_process)]
+
+
 # Example usage
 # if __name__ == "__main__":
 #     try:
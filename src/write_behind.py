@@ -0,0 +1,150 @@
+import queue
+import atexit
+import threading
+from src.log import get_logger
+
+logger = get_logger("cybel.write_behind")
+
+
+class WriteBehindQueue:
+    """
+    Bounded in-process queue drained by a background writer thread.
+
+    Items are handed to `flush_function` in batches of up to `batch_size`,
+    so many writes share one transaction. When the queue is full, `put`
+    blocks for at most `put_timeout` seconds before the item is written
+    synchronously by the caller; how often that happens is reported by
+    `stats` as backpressure. Pending items are flushed at interpreter exit.
+    """
+
+    def __init__(self, flush_function, max_size: int = 10000, batch_size: int = 200,
+                 flush_interval: float = 0.2, put_timeout: float = 0.05, name: str = "write-behind"):
+        self.flush_function = flush_function
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.name = name
+
+        self._queue = queue.Queue(maxsize=max_size)
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._write_lock = threading.Lock()  # serializes calls to flush_function
+        self._idle = threading.Condition()
+        self._pending = 0  # items queued or taken by a writer but not written yet
+
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+        self.blocked_puts = 0
+        self.synchronous_writes = 0
+        self.max_depth = 0
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def put(self, item):
+        """
+        Queue an item for writing, falling back to a synchronous write when full.
+        """
+        self.start()
+        self._track(1)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._stats_lock:
+                self.blocked_puts += 1
+            try:
+                self._queue.put(item, timeout=self.put_timeout)
+            except queue.Full:
+                self._track(-1)
+                with self._stats_lock:
+                    self.synchronous_writes += 1
+                self._write([item])
+                return
+        with self._stats_lock:
+            self.enqueued += 1
+            self.max_depth = max(self.max_depth, self._queue.qsize())
+
+    def _track(self, count: int):
+        with self._idle:
+            self._pending += count
+            if not self._pending:
+                self._idle.notify_all()
+
+    def _drain(self, first=None):
+        batch = [] if first is None else [first]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        with self._write_lock:
+            try:
+                self.flush_function(batch)
+                with self._stats_lock:
+                    self.written += len(batch)
+                    self.batches += 1
+            except Exception as e:
+                with self._stats_lock:
+                    self.failed += len(batch)
+                logger.error(f"[{self.name}] Failed to write {len(batch)} items: {e}",
+                             extra={"fields": {"queue": self.name, "items": len(batch)}})
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = self._drain(first)
+            self._write(batch)
+            self._track(-len(batch))
+
+    def flush(self):
+        """
+        Write everything currently queued from the calling thread, and wait
+        for the batch the writer thread is already writing.
+        """
+        while True:
+            batch = self._drain()
+            if batch:
+                self._write(batch)
+                self._track(-len(batch))
+                continue
+            with self._idle:
+                if not self._pending:
+                    return
+                self._idle.wait(self.flush_interval)
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Stop the writer thread and flush the remaining items.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self.max_depth,
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "batches": self.batches,
+                "average_batch_size": self.written / self.batches if self.batches else 0.0,
+                "failed": self.failed,
+                "blocked_puts": self.blocked_puts,
+                "synchronous_writes": self.synchronous_writes,
+            }
@@ -0,0 +1,79 @@
+from src.context_builder import strip_overlap, merge_source_chunks, build_context
+
+
+def test_strip_overlap_removes_word_aligned_overlap():
+    previous = "The firewall blocks inbound traffic for every site"
+    current = "traffic for every site and reports it to the console"
+    assert strip_overlap(previous, current) == "and reports it to the console"
+
+
+def test_strip_overlap_ignores_partial_word_matches():
+    assert strip_overlap("We tested the", "example shows the result") == "example shows the result"
+    assert strip_overlap("values are 12", "23 units") == "23 units"
+
+
+def test_strip_overlap_ignores_short_matches():
+    assert strip_overlap("the value is set to", "to be changed later") == "to be changed later"
+
+
+def test_strip_overlap_requires_word_boundary_in_previous():
+    previous = "configure the firewall settings here"
+    current = "wall settings here and there"
+    assert strip_overlap(previous, current) == current
+
+
+def test_strip_overlap_without_overlap():
+    assert strip_overlap("first chunk of text", "second chunk of text") == "second chunk of text"
+
+
+def chunk(content, index, source="https://e.com/a"):
+    return content, {"source": source, "chunk_index": index, "source_file": "a.json", "title": "A"}
+
+
+def test_merge_joins_consecutive_chunks_in_index_order():
+    results = [
+        chunk("agents report inventory every hour to the console", 1),
+        chunk("The endpoint agent collects inventory. agents report inventory every hour", 0),
+    ]
+    [(metadata, passages)] = merge_source_chunks(results)
+    assert passages == ["The endpoint agent collects inventory. agents report inventory every hour "
+                        "to the console"]
+    assert metadata == {"source": "https://e.com/a", "title": "A"}
+
+
+def test_merge_keeps_gaps_as_separate_passages():
+    [(_, passages)] = merge_source_chunks([chunk("first part", 0), chunk("third part", 2)])
+    assert passages == ["first part", "third part"]
+
+
+def test_merge_drops_identical_chunks():
+    [(_, passages)] = merge_source_chunks([chunk("same text", 3), chunk("same text", 3)])
+    assert passages == ["same text"]
+
+
+def test_merge_keeps_distinct_chunks_sharing_an_index():
+    [(_, passages)] = merge_source_chunks([chunk("old text of the page", 2), chunk("new text of the page", 2)])
+    assert sorted(passages) == ["new text of the page", "old text of the page"]
+
+
+def test_merge_groups_by_source_in_rank_order():
+    results = [chunk("b text", 0, source="b"), chunk("a text", 0, source="a"), chunk("b more", 1, source="b")]
+    assert [metadata["source"] for metadata, _ in merge_source_chunks(results)] == ["b", "a"]
+
+
+def test_build_context_without_results():
+    assert build_context([]) == ("No relevant context found.", "No metadata available.")
+
+
+def test_build_context_respects_token_budget():
+    class WordEncoder:
+        def encode(self, text):
+            return text.split()
+
+        def decode(self, tokens):
+            return " ".join(tokens)
+
+    results = [chunk("one two three four", 0, source="a"), chunk("five six seven", 0, source="b")]
+    context, metadata = build_context(results, encoder=WordEncoder(), token_budget=5)
+    assert context.splitlines() == ["Context 0 (Source 0): one two three four", "Context 1 (Source 1): five"]
+    assert metadata.count("Source") == 2
@@ -0,0 +1,110 @@
+import json
+import threading
+import pytest
+from src.create_knowledge_bank import iter_file_documents
+
+
+def write_pages(data_dir, count):
+    filenames = []
+    for i in range(count):
+        filename = f"page_{i}.json"
+        content = {"context": f"Page {i} talks about topic number {i}.", "metadata": {"source": f"https://x/{i}"}}
+        (data_dir / filename).write_text(json.dumps(content))
+        filenames.append(filename)
+    return filenames
+
+
+def loader_threads():
+    return [thread for thread in threading.enumerate() if thread.name == "knowledge-bank-loader"]
+
+
+def test_yields_every_file(tmp_path):
+    filenames = write_pages(tmp_path, 5)
+    results = list(iter_file_documents(str(tmp_path), filenames, workers=2, max_pending=2))
+    assert sorted(documents[0].metadata["source"] for _, documents in results) == \
+        [f"https://x/{i}" for i in range(5)]
+
+
+def test_consumer_stopping_early_shuts_down_the_producer(tmp_path):
+    filenames = write_pages(tmp_path, 20)
+    documents = iter_file_documents(str(tmp_path), filenames, workers=1, max_pending=1)
+    next(documents)
+    documents.close()
+    assert not loader_threads()
+
+
+def test_consumer_error_shuts_down_the_producer(tmp_path):
+    filenames = write_pages(tmp_path, 20)
+    with pytest.raises(RuntimeError):
+        for _ in iter_file_documents(str(tmp_path), filenames, workers=1, max_pending=1):
+            raise RuntimeError("upsert failed")
+    assert not loader_threads()
+
+
+def test_loader_errors_reach_the_consumer(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        list(iter_file_documents(str(tmp_path), ["missing.json"], workers=1))
+    assert not loader_threads()
+
+
+class FakeCollection:
+    def __init__(self):
+        self.rows = {}
+        self.embedded = []
+
+    def count(self):
+        return len(self.rows)
+
+    def get(self, include):
+        return {"ids": list(self.rows), "metadatas": [dict(metadata) for metadata in self.rows.values()]}
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.embedded.extend(ids)
+        self.rows.update(zip(ids, metadatas))
+
+    def update(self, ids, metadatas):
+        for doc_id, metadata in zip(ids, metadatas):
+            self.rows[doc_id] = metadata
+
+
+class FakeVectorStore:
+    def __init__(self):
+        self._collection = FakeCollection()
+        self.embeddings = self
+
+    def embed_documents(self, texts):
+        return [[0.0] for _ in texts]
+
+    def delete(self, ids):
+        for doc_id in ids:
+            del self._collection.rows[doc_id]
+
+
+class FakeLexicalIndex:
+    def add(self, ids, texts):
+        pass
+
+    def delete(self, ids):
+        pass
+
+
+def test_incremental_sync_updates_position_of_retained_chunks(tmp_path, monkeypatch):
+    import src.create_knowledge_bank as knowledge_bank
+    vector_store = FakeVectorStore()
+    monkeypatch.setattr(knowledge_bank, "get_vector_store", lambda: vector_store)
+    monkeypatch.setattr(knowledge_bank, "get_lexical_index", lambda directory: FakeLexicalIndex())
+
+    def store(paragraphs):
+        content = {"context": "\n\n".join(paragraphs), "metadata": {"source": "https://x/page"}}
+        (tmp_path / "page.json").write_text(json.dumps(content))
+        knowledge_bank.store_file_in_chromadb_txt_file(str(tmp_path), ["page.json"], chunk_size=30, overlap=0,
+                                                       incremental=True, workers=1)
+
+    store(["First paragraph of the page.", "Second paragraph of the page."])
+    store(["A new paragraph at the top.", "First paragraph of the page.", "Second paragraph of the page."])
+
+    collection = vector_store._collection
+    assert len(collection.embedded) == 3  # only the new chunk was embedded the second time
+    chunks = {knowledge_bank.chunk_id("https://x/page", text): index for index, text in enumerate(
+        ["A new paragraph at the top.", "First paragraph of the page.", "Second paragraph of the page."])}
+    assert {doc_id: metadata["chunk_index"] for doc_id, metadata in collection.rows.items()} == chunks
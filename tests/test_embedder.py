@@ -0,0 +1,27 @@
+import pytest
+from src.embedder import EMBEDDING_MODEL_KEY, SentenceTransformerEmbeddings, check_embedding_model, embedding_model_id
+
+
+class FakeCollection:
+    name = "docs"
+
+    def __init__(self, metadata, count=0):
+        self.metadata = metadata
+        self._count = count
+
+    def count(self):
+        return self._count
+
+
+def test_model_id_includes_backend():
+    assert embedding_model_id(SentenceTransformerEmbeddings("mpnet", backend="onnx-int8")) == "mpnet:onnx-int8"
+
+
+def test_matching_or_unrecorded_model_is_accepted():
+    check_embedding_model(FakeCollection({EMBEDDING_MODEL_KEY: "mpnet:torch"}, count=10), "mpnet:torch")
+    check_embedding_model(FakeCollection(None, count=10), "mpnet:torch")
+
+
+def test_collection_built_by_another_backend_is_refused():
+    with pytest.raises(ValueError, match="mpnet:onnx"):
+        check_embedding_model(FakeCollection({EMBEDDING_MODEL_KEY: "mpnet:onnx"}, count=10), "mpnet:torch")
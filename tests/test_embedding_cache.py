@@ -0,0 +1,56 @@
+import sqlite3
+from src.embedding_cache import EmbeddingCache
+
+
+def last_used(path):
+    with sqlite3.connect(path) as connection:
+        return dict(connection.execute("SELECT key, last_used FROM embeddings"))
+
+
+def test_memory_and_disk_hits(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = EmbeddingCache("model", path=path)
+    cache.put_many(["a  text"], [[1.0, 2.0]])
+    assert cache.get_many(["a text", "other"]) == [[1.0, 2.0], None]
+
+    reopened = EmbeddingCache("model", path=path)
+    assert reopened.get_many(["a text"]) == [[1.0, 2.0]]
+    assert cache.stats()["memory_hits"] == 1
+    assert reopened.stats()["disk_hits"] == 1
+
+
+def test_memory_hits_refresh_last_used_on_disk(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = EmbeddingCache("model", path=path)
+    cache.put_many(["hot", "cold"], [[1.0], [2.0]])
+    before = last_used(path)
+
+    cache.get_many(["hot"])
+    cache.flush()
+    after = last_used(path)
+    assert after[cache.key("hot")] > before[cache.key("hot")]
+    assert after[cache.key("cold")] == before[cache.key("cold")]
+
+
+def test_trim_keeps_recently_hit_entries(tmp_path):
+    cache = EmbeddingCache("model", path=str(tmp_path / "cache.sqlite3"), max_disk_entries=10)
+    cache.put_many([f"text {i}" for i in range(10)], [[float(i)] for i in range(10)])
+    cache.get_many(["text 0"])  # served from memory
+    cache.flush()
+    cache.put_many(["text 10"], [[10.0]])
+
+    keys = set(last_used(str(tmp_path / "cache.sqlite3")))
+    assert cache.key("text 0") in keys
+    assert cache.key("text 10") in keys
+    assert len(keys) == 9
+
+
+def test_bulk_batches_do_not_evict_hot_entries(tmp_path):
+    cache = EmbeddingCache("model", path=str(tmp_path / "cache.sqlite3"), memory_entries=4, memory_batch_limit=2)
+    cache.put_many(["hot"], [[0.5, 1.5]])
+    cache.put_many([f"chunk {i}" for i in range(10)], [[float(i), 0.0] for i in range(10)])
+    assert cache.get_many([f"chunk {i}" for i in range(10)])[3] == [3.0, 0.0]  # served from disk
+
+    assert cache.get_many(["hot"]) == [[0.5, 1.5]]
+    assert cache.stats()["memory_hits"] == 1
+    assert cache.stats()["memory_entries"] == 1
@@ -0,0 +1,47 @@
+import time
+import asyncio
+import contextvars
+import pytest
+from src.event_loop import BackgroundEventLoop
+
+request_user = contextvars.ContextVar("request_user", default=None)
+
+
+def test_run_returns_result_in_callers_context():
+    loop = BackgroundEventLoop(name="test-loop")
+
+    async def whoami():
+        return request_user.get()
+
+    request_user.set("alice")
+    assert loop.run(whoami()) == "alice"
+
+
+def test_run_timeout_cancels_the_coroutine():
+    loop = BackgroundEventLoop(name="test-loop")
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    with pytest.raises(TimeoutError):
+        loop.run(slow(), timeout=0.05)
+    time.sleep(0.05)
+    assert cancelled == [True]
+
+
+def test_iterate_yields_items_and_times_out_between_items():
+    loop = BackgroundEventLoop(name="test-loop")
+
+    async def items(delay):
+        for i in range(3):
+            await asyncio.sleep(delay)
+            yield i
+
+    assert list(loop.iterate(items(0), timeout=1)) == [0, 1, 2]
+    with pytest.raises(TimeoutError):
+        list(loop.iterate(items(5), timeout=0.05))
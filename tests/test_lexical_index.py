@@ -0,0 +1,101 @@
+import json
+from src.lexical_index import BM25Index, reciprocal_rank_fusion, rebuild_lexical_index, tokenize
+
+
+def test_tokenize_keeps_versions_and_error_codes():
+    assert tokenize("Error E-1234 after upgrading to v2.0!") == ["error", "e-1234", "after", "upgrading", "to", "v2.0"]
+
+
+def test_bm25_ranks_rare_and_frequent_matches_first(tmp_path):
+    index = BM25Index(str(tmp_path / "bm25.sqlite3"))
+    index.add(["common", "rare", "twice", "none"], [
+        "the agent sends logs to the manager",
+        "the agent reports error e-1234 to the manager",
+        "error e-1234 and again error e-1234 on the agent",
+        "unrelated text about dashboards",
+    ])
+    assert [doc_id for doc_id, _ in index.search("agent error e-1234")] == ["twice", "rare", "common"]
+    assert index.search("agent error e-1234", limit=1)[0][0] == "twice"
+    assert index.search("nothing matches") == []
+    assert index.count() == 4
+
+
+class FakeCollection:
+    def __init__(self):
+        self.rows = {}
+
+    def count(self):
+        return len(self.rows)
+
+    def get(self, include, limit=None, offset=0):
+        ids = list(self.rows)[offset:offset + limit if limit else None]
+        return {"ids": ids, "metadatas": [self.rows[doc_id][1] for doc_id in ids],
+                "documents": [self.rows[doc_id][0] for doc_id in ids]}
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.rows.update(zip(ids, zip(documents, metadatas)))
+
+    def update(self, ids, metadatas):
+        for doc_id, metadata in zip(ids, metadatas):
+            self.rows[doc_id] = (self.rows[doc_id][0], metadata)
+
+
+class FakeVectorStore:
+    def __init__(self):
+        self._collection = FakeCollection()
+        self.embeddings = self
+
+    def embed_documents(self, texts):
+        return [[0.0] for _ in texts]
+
+    def delete(self, ids):
+        for doc_id in ids:
+            del self._collection.rows[doc_id]
+
+
+def test_incremental_sync_updates_and_deletes_chunks(tmp_path, monkeypatch):
+    import src.create_knowledge_bank as knowledge_bank
+    vector_store = FakeVectorStore()
+    index = BM25Index(str(tmp_path / "bm25.sqlite3"))
+    monkeypatch.setattr(knowledge_bank, "get_vector_store", lambda: vector_store)
+    monkeypatch.setattr(knowledge_bank, "get_lexical_index", lambda directory: index)
+
+    def store(paragraphs):
+        content = {"context": "\n\n".join(paragraphs), "metadata": {"source": "https://x/page"}}
+        (tmp_path / "page.json").write_text(json.dumps(content))
+        knowledge_bank.store_file_in_chromadb_txt_file(str(tmp_path), ["page.json"], chunk_size=40, overlap=0,
+                                                       incremental=True, workers=1)
+
+    store(["Firewall rules block ports.", "Agents enroll with tokens."])
+    assert index.count() == 2
+    store(["Firewall rules block ports.", "Agents enroll with certificates."])
+
+    assert index.count() == 2
+    assert index.search("tokens") == []
+    assert [doc_id for doc_id, _ in index.search("certificates")] == \
+        [knowledge_bank.chunk_id("https://x/page", "Agents enroll with certificates.")]
+    assert index.count() == vector_store._collection.count()
+
+
+def test_rebuild_replaces_the_index_contents(tmp_path):
+    vector_store = FakeVectorStore()
+    vector_store._collection.upsert(["a", "b", "c"], None, ["alpha", "beta", "gamma"], [{}, {}, {}])
+    index = BM25Index(str(tmp_path / "bm25.sqlite3"))
+    index.add(["stale"], ["alpha beta"])
+
+    assert rebuild_lexical_index(vector_store, index, batch_size=2) == 3
+    assert index.count() == 3
+    assert [doc_id for doc_id, _ in index.search("alpha")] == ["a"]
+
+
+def test_rrf_keeps_hits_found_by_only_one_retriever():
+    lexical = ["both", "lexical only"]
+    dense = ["dense only", "both"]
+    fused = reciprocal_rank_fusion([lexical, dense], weights=[0.5, 0.5])
+    assert fused[0] == "both"
+    assert set(fused) == {"both", "lexical only", "dense only"}
+
+
+def test_rrf_weights_favour_the_heavier_ranking():
+    assert reciprocal_rank_fusion([["lexical"], ["dense"]], weights=[0.7, 0.3]) == ["lexical", "dense"]
+    assert reciprocal_rank_fusion([["lexical"], ["dense"]], weights=[0.3, 0.7]) == ["dense", "lexical"]
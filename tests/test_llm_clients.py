@@ -0,0 +1,109 @@
+import json
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from src.llm.base_llm import BaseLLMClass, HTTPClientSettings
+from src.llm.groq_llm import GroqAIClient
+from src.llm.openai_llm import OpenAIClient
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.client_ports.add(self.client_address[1])
+        self.server.requests += 1
+        if self.server.failures_left > 0:
+            self.server.failures_left -= 1
+            payload = b'{"error": {"message": "overloaded"}}'
+            self.send_response(503)
+        else:
+            payload = json.dumps({
+                "id": "stub", "object": "chat.completion", "created": int(time.time()), "model": body["model"],
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": " stub answer "}}],
+                "usage": {"prompt_tokens": 7, "completion_tokens": 2, "total_tokens": 9},
+            }).encode()
+            self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    server.client_ports = set()
+    server.requests = 0
+    server.failures_left = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    BaseLLMClass.close_shared_clients()
+
+
+@pytest.fixture(autouse=True)
+def api_keys(monkeypatch):
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+
+
+def settings_for(server, **overrides):
+    return HTTPClientSettings(base_url=f"http://127.0.0.1:{server.server_port}/v1", max_retries=2, **overrides)
+
+
+class Recorder:
+    def __init__(self):
+        self.events = []
+
+    def notify(self, event_type, content, timestamp, tokens=None):
+        self.events.append((event_type, tokens))
+
+
+@pytest.mark.parametrize("client_class", [GroqAIClient, OpenAIClient])
+def test_sync_calls_reuse_one_connection(stub_server, client_class):
+    client = client_class(settings_for(stub_server))
+    for _ in range(5):
+        assert client.generate_response("model", "", "question") == "stub answer"
+    assert stub_server.requests == 5
+    assert len(stub_server.client_ports) == 1
+
+
+@pytest.mark.parametrize("client_class", [GroqAIClient, OpenAIClient])
+def test_async_calls_share_a_pool(stub_server, client_class):
+    client = client_class(settings_for(stub_server))
+
+    async def ask_many():
+        return await asyncio.gather(*(client.agenerate_response("model", "", "q") for _ in range(4)))
+
+    assert asyncio.run(ask_many()) == ["stub answer"] * 4
+
+
+def test_retries_on_server_errors(stub_server):
+    stub_server.failures_left = 2
+    client = GroqAIClient(settings_for(stub_server))
+    assert client.generate_response("model", "", "question") == "stub answer"
+    assert stub_server.requests == 3
+
+
+@pytest.mark.parametrize("client_class", [GroqAIClient, OpenAIClient])
+def test_sdk_client_keeps_connect_timeout(stub_server, client_class):
+    client = client_class(settings_for(stub_server, timeout=42.0, connect_timeout=1.5)).get_llm_client()
+    assert client.timeout.connect == 1.5
+    assert client.timeout.read == 42.0
+
+
+def test_observers_receive_provider_usage(stub_server):
+    client = GroqAIClient(settings_for(stub_server))
+    recorder = Recorder()
+    client.attach_observer(recorder)
+    client.generate_response("model", "", "question")
+    assert recorder.events == [("input", 7), ("output", 2)]
@@ -0,0 +1,163 @@
+import time
+import asyncio
+import pytest
+from src.llm.llm_router import BackendHealth, LLMBackend, LLMRouter
+
+
+class FakeClient:
+    def __init__(self, delay: float = 0.0, fail: bool = False, tokens=("a", "b", "c")):
+        self.delay = delay
+        self.fail = fail
+        self.tokens = tokens
+        self.calls = 0
+        self.cancelled = 0
+
+    async def agenerate_response(self, model_name, system_prompt, user_prompt):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail:
+            raise RuntimeError("backend down")
+        return model_name
+
+    def stream_response(self, model_name, system_prompt, user_prompt):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("backend down")
+        yield from self.tokens
+
+
+def make_router(primary, secondary, **health):
+    health = {"min_samples": 5, **health}
+    return LLMRouter([LLMBackend("groq", "primary", primary, BackendHealth(**health)),
+                      LLMBackend("openai", "secondary", secondary, BackendHealth(**health))],
+                     min_hedge_delay=0.02)
+
+
+def warm_up(router, count=10):
+    for _ in range(count):
+        assert router.generate_response("", "") == "primary"
+
+
+def test_no_hedge_without_latency_history():
+    primary, secondary = FakeClient(delay=0.05), FakeClient()
+    router = make_router(primary, secondary)
+    assert router.generate_response("", "") == "primary"
+    assert secondary.calls == 0
+
+
+def test_hedge_past_p95_and_cancel_loser():
+    primary, secondary = FakeClient(delay=0.01), FakeClient(delay=0.01)
+    router = make_router(primary, secondary)
+    warm_up(router)
+    assert secondary.calls == 0
+
+    primary.delay = 1.0
+    start = time.perf_counter()
+    assert router.generate_response("", "") == "secondary"
+    assert time.perf_counter() - start < 0.5
+    time.sleep(0.05)
+    assert primary.cancelled == 1
+    # A cancelled call is neither a success nor a failure
+    assert router.stats()["groq:primary"]["error_rate"] == 0.0
+
+
+def test_hedge_loser_cancelled_when_primary_wins():
+    primary, secondary = FakeClient(delay=0.01), FakeClient(delay=1.0)
+    router = make_router(primary, secondary)
+    warm_up(router)
+    primary.delay = 0.05
+    assert router.generate_response("", "") == "primary"
+    time.sleep(0.05)
+    assert secondary.calls == 1
+    assert secondary.cancelled == 1
+
+
+def test_failover_on_error():
+    primary, secondary = FakeClient(fail=True), FakeClient()
+    router = make_router(primary, secondary)
+    assert router.generate_response("", "") == "secondary"
+    assert primary.calls == 1
+
+
+def test_all_backends_failing_raises_last_error():
+    router = make_router(FakeClient(fail=True), FakeClient(fail=True))
+    with pytest.raises(RuntimeError):
+        router.generate_response("", "")
+
+
+def test_circuit_opens_after_consecutive_failures():
+    primary, secondary = FakeClient(fail=True), FakeClient()
+    router = make_router(primary, secondary, failure_threshold=3, open_seconds=60)
+    for _ in range(5):
+        assert router.generate_response("", "") == "secondary"
+    assert primary.calls == 3
+    assert router.stats()["groq:primary"]["state"] == "open"
+
+
+def test_circuit_half_open_trial_closes_or_reopens():
+    health = BackendHealth(failure_threshold=1, open_seconds=0.05)
+    health.record_failure()
+    assert health.state == "open"
+    assert not health.acquire()
+
+    time.sleep(0.06)
+    assert health.state == "half-open"
+    assert health.acquire()
+    assert not health.acquire()  # only one trial request at a time
+    health.record_failure()
+    assert health.state == "open"
+
+    time.sleep(0.06)
+    assert health.acquire()
+    health.record_success(0.01)
+    assert health.state == "closed"
+    assert health.acquire() and health.acquire()
+
+
+def test_circuit_opens_on_error_rate():
+    health = BackendHealth(failure_threshold=100, max_error_rate=0.5, min_samples=4)
+    for outcome in (True, False, True, False, False):
+        health.record_success(0.01) if outcome else health.record_failure()
+    assert health.state == "open"
+
+
+def test_stream_failover_before_first_token():
+    primary, secondary = FakeClient(fail=True), FakeClient()
+    router = make_router(primary, secondary)
+    assert list(router.stream_response("", "")) == ["a", "b", "c"]
+    assert primary.calls == 1
+
+
+def half_open_router(primary, secondary):
+    router = make_router(primary, secondary, failure_threshold=1, open_seconds=0.01)
+    for backend in router.backends:
+        backend.health.record_failure()
+    time.sleep(0.02)
+    assert all(backend.health.state == "half-open" for backend in router.backends)
+    return router
+
+
+def test_stream_closed_early_releases_reservations():
+    router = half_open_router(FakeClient(), FakeClient())
+    stream = router.stream_response("", "")
+    assert next(stream) == "a"
+    stream.close()
+    assert all(backend.health.acquire() for backend in router.backends)
+
+
+def test_stream_error_after_first_token_releases_reservations():
+    class BreaksMidStream(FakeClient):
+        def stream_response(self, model_name, system_prompt, user_prompt):
+            yield "a"
+            raise RuntimeError("connection reset")
+
+    router = half_open_router(BreaksMidStream(), FakeClient())
+    with pytest.raises(RuntimeError):
+        list(router.stream_response("", ""))
+    # The failed trial re-opens the primary; the unused secondary keeps its trial slot free
+    assert router.backends[0].health.state == "open"
+    assert router.backends[1].health.acquire()
@@ -0,0 +1,44 @@
+import time
+from src.metrics import add_stage_listener, timed, timed_iter
+
+samples = []
+add_stage_listener(lambda stage, duration: samples.append((stage, duration)))
+
+
+def recorded(stage):
+    return [duration for name, duration in samples if name == stage]
+
+
+def test_timed_records_block_duration():
+    with timed("test_block"):
+        time.sleep(0.02)
+    assert recorded("test_block")[-1] >= 0.02
+
+
+def slow_tokens():
+    for token in ("a", "b"):
+        time.sleep(0.01)
+        yield token
+
+
+def test_timed_iter_excludes_consumer_time():
+    for _ in timed_iter("test_stream", slow_tokens()):
+        time.sleep(0.05)  # a slow client
+    duration = recorded("test_stream")[-1]
+    assert 0.02 <= duration < 0.05
+
+
+def test_timed_iter_closes_source_when_consumer_stops():
+    closed = []
+
+    def source():
+        try:
+            yield from ("a", "b", "c")
+        finally:
+            closed.append(True)
+
+    stream = timed_iter("test_closed", source())
+    assert next(stream) == "a"
+    stream.close()
+    assert closed == [True]
+    assert len(recorded("test_closed")) == 1
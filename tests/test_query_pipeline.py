@@ -0,0 +1,95 @@
+import asyncio
+import pytest
+
+pytest.importorskip("spacy")
+import src.query_chromadb as query_chromadb
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """Stub retrieval and generation so only the pipeline's own control flow runs."""
+    calls = {"started": [], "cancelled": []}
+
+    async def generate(query, context, metadata):
+        calls["started"].append(query)
+        try:
+            await asyncio.sleep(0 if query == "fast" else 10)
+        except asyncio.CancelledError:
+            calls["cancelled"].append(query)
+            raise
+        return f"Answer: {query}"
+
+    monkeypatch.setattr(query_chromadb, "batch_search",
+                        lambda queries, top_k: [[(f"chunk for {query}", {"source": "s"})] for query in queries])
+    monkeypatch.setattr(query_chromadb, "prepare_context",
+                        lambda query, results, number_of_results: (results, "context", "metadata"))
+    monkeypatch.setattr(query_chromadb, "agenerate_response_with_context", generate)
+    return calls
+
+
+def test_closing_a_batch_early_cancels_the_remaining_answers(pipeline):
+    async def first_answer():
+        answers = query_chromadb.abatch_process_queries(["fast", "slow one", "slow two"])
+        position, result = await answers.__anext__()
+        await answers.aclose()
+        return position, result, sorted(pipeline["cancelled"])
+
+    position, result, cancelled = asyncio.run(first_answer())
+    assert (position, result["answer"]) == (0, "fast")
+    assert cancelled == ["slow one", "slow two"]
+
+
+class FakeCollection:
+    def __init__(self):
+        self.queries = []
+
+    def query(self, query_embeddings, n_results, include):
+        self.queries.append(len(query_embeddings))
+        return {"ids": [["dense", "both"][:n_results] for _ in query_embeddings]}
+
+    def get(self, ids, include):
+        return {"ids": ids, "documents": [f"text of {doc_id}" for doc_id in ids],
+                "metadatas": [{"source": doc_id} for doc_id in ids]}
+
+
+class FakeVectorStore:
+    def __init__(self):
+        self._collection = FakeCollection()
+        self.embeddings = self
+
+    def embed_documents(self, texts):
+        return [[1.0, 0.0] for _ in texts]
+
+
+class FakeLexicalIndex:
+    def search(self, query, limit):
+        return [("lexical", 2.0), ("both", 1.0)][:limit]
+
+
+def test_hybrid_batch_search_runs_one_dense_query(monkeypatch):
+    vector_store = FakeVectorStore()
+    monkeypatch.setattr(query_chromadb, "RETRIEVAL_MODE", "hybrid")
+    monkeypatch.setattr(query_chromadb, "get_vector_store", lambda: vector_store)
+    monkeypatch.setattr(query_chromadb, "get_synced_lexical_index", lambda: FakeLexicalIndex())
+
+    results = query_chromadb.batch_search(["firewall rules", "agent enrollment", "firewall rules"], top_k=3)
+    assert vector_store._collection.queries == [2]
+    assert [content for content, _ in results[0]] == ["text of both", "text of lexical", "text of dense"]
+    assert results[2] == results[0]
+
+
+def test_query_empty_after_filtering_falls_back_to_the_rephrased_search(pipeline, monkeypatch):
+    def search(query, top_k):
+        if query == "what is it?":
+            raise ValueError("Query is empty after stop-word filtering.")
+        return [(f"chunk for {query}", {"source": "s"})]
+
+    async def rephrase(query):
+        return "fast"
+
+    monkeypatch.setattr(query_chromadb, "semantic_search", search)
+    monkeypatch.setattr(query_chromadb, "needs_rephrasing", lambda query: True)
+    monkeypatch.setattr(query_chromadb, "arephrase_query", rephrase)
+
+    result = asyncio.run(query_chromadb.aprocess_query("what is it?", is_rephrased=True))
+    assert result["answer"] == "fast"
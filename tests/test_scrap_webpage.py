@@ -0,0 +1,149 @@
+import json
+import asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from scrap_webpage import CrawlSettings, FetchCache, canonicalize_url, crawl_site, crawl_urls
+
+PAGES = {
+    "/": '<h1>Home</h1><p>Welcome to the home page of the site.</p>'
+         '<a href="/a">A</a><a href="http://[::1/broken">bad ipv6</a><a href="http://host:99999/">bad port</a>',
+    "/a": '<h1>Alpha</h1><p>Alpha explains something entirely different from home.</p><a href="/">home</a>',
+}
+
+
+def make_site(requests):
+    async def page(request):
+        requests.append((request.path, request.headers.get("If-None-Match")))
+        if request.path not in PAGES:
+            raise web.HTTPNotFound()
+        etag = f'"{request.path}"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(text=f"<html><body>{PAGES[request.path]}</body></html>",
+                            content_type="text/html", headers={"ETag": etag})
+
+    app = web.Application()
+    app.router.add_get("/{tail:.*}", page)
+    return app
+
+
+async def crawl_twice(tmp_path, seeds):
+    requests = []
+    server = TestServer(make_site(requests), host="127.0.0.1")
+    await server.start_server()
+    try:
+        settings = CrawlSettings(parse_workers=0, max_retries=0)
+        urls = [str(server.make_url(seed)) if seed.startswith("/") else seed for seed in seeds]
+        first = await crawl_site(urls, tmp_path, settings, use_sitemaps=False, respect_robots=False)
+        second = await crawl_site(urls, tmp_path, settings, use_sitemaps=False, respect_robots=False)
+    finally:
+        await server.close()
+    return first, second, requests
+
+
+def test_canonicalize_url_rejects_malformed_urls():
+    assert canonicalize_url("http://[::1/path") is None
+    assert canonicalize_url("http://example.com:99999/") is None
+    assert canonicalize_url("/a", base="http://example.com:bad/") is None
+    assert canonicalize_url("mailto:someone@example.com") is None
+
+
+def test_canonicalize_url_normalizes_equivalent_links():
+    assert canonicalize_url("HTTP://Example.com:80/a//b/../c?utm_source=x&b=2&a=1#top") == \
+        "http://example.com/a/c?a=1&b=2"
+    assert canonicalize_url("http://[::1]:8080/a") == "http://[::1]:8080/a"
+
+
+def test_malformed_links_and_seeds_do_not_break_the_crawl(tmp_path):
+    first, _, _ = asyncio.run(crawl_twice(tmp_path, ["/", "http://[::1/seed"]))
+    assert first["fetched"] == 2
+    assert first["failed"] == 0
+
+
+def test_new_crawl_revisits_done_pages_with_conditional_requests(tmp_path):
+    first, second, requests = asyncio.run(crawl_twice(tmp_path, ["/"]))
+    assert first["fetched"] == 2
+    assert second == {"fetched": 0, "unchanged": 2, "duplicates": 0, "disallowed": 0, "failed": 0}
+    assert sorted(requests[2:]) == [("/", '"/"'), ("/a", '"/a"')]
+
+
+class ListSite:
+    """Pages for list-mode crawls: /page/<n> with ETags, /flaky fails twice, /missing is a 404."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.requests = []
+        self.flaky_failures = 2
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def handle(self, request):
+        self.requests.append((request.path, request.headers.get("If-None-Match")))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if request.path == "/missing":
+                raise web.HTTPNotFound()
+            if request.path == "/flaky" and self.flaky_failures:
+                self.flaky_failures -= 1
+                raise web.HTTPServiceUnavailable()
+            etag = f'"{request.path}"'
+            if request.headers.get("If-None-Match") == etag:
+                return web.Response(status=304, headers={"ETag": etag})
+            return web.Response(text=f"<html><title>{request.path}</title><h1>Header</h1><p>Body</p></html>",
+                                content_type="text/html", headers={"ETag": etag})
+        finally:
+            self.in_flight -= 1
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get("/{tail:.*}", self.handle)
+        return app
+
+
+async def crawl_list(site, tmp_path, paths, runs=1, **settings):
+    server = TestServer(site.app(), host="127.0.0.1")
+    await server.start_server()
+    try:
+        settings = CrawlSettings(parse_workers=0, backoff=0.0, **settings)
+        urls = [str(server.make_url(path)) for path in paths]
+        return [await crawl_urls(urls, tmp_path, settings) for _ in range(runs)]
+    finally:
+        await server.close()
+
+
+def test_crawl_urls_writes_pages_and_revalidates_with_etags(tmp_path):
+    site = ListSite()
+    first, second = asyncio.run(crawl_list(site, tmp_path, ["/page/1", "/page/2"], runs=2))
+    assert first == {"fetched": 2, "unchanged": 0, "failed": 0}
+    assert second == {"fetched": 0, "unchanged": 2, "failed": 0}
+    assert sorted(site.requests[2:]) == [("/page/1", '"/page/1"'), ("/page/2", '"/page/2"')]
+    pages = [json.loads(path.read_text()) for path in tmp_path.glob("*.json") if not path.name.startswith(".")]
+    assert sorted(page["metadata"]["title"] for page in pages) == ["/page/1", "/page/2"]
+
+
+def test_crawl_urls_retries_transient_errors_only(tmp_path):
+    site = ListSite()
+    [stats] = asyncio.run(crawl_list(site, tmp_path, ["/flaky", "/missing"], max_retries=3))
+    assert stats == {"fetched": 1, "unchanged": 0, "failed": 1}
+    assert [path for path, _ in site.requests].count("/flaky") == 3
+    assert [path for path, _ in site.requests].count("/missing") == 1
+
+
+def test_crawl_urls_respects_per_host_concurrency(tmp_path):
+    site = ListSite(delay=0.02)
+    [stats] = asyncio.run(crawl_list(site, tmp_path, [f"/page/{i}" for i in range(12)],
+                                     max_concurrency=8, per_host_concurrency=2))
+    assert stats["fetched"] == 12
+    assert site.max_in_flight == 2
+
+
+def test_fetch_cache_is_saved_periodically(tmp_path):
+    path = tmp_path / "cache.json"
+    cache = FetchCache(path, save_every=2)
+    cache.update("https://x/1", {"ETag": '"1"'})
+    assert not path.exists()
+    cache.update("https://x/2", {"ETag": '"2"'})
+    assert set(json.loads(path.read_text())) == {"https://x/1", "https://x/2"}
+    assert FetchCache(path).request_headers("https://x/1") == {"If-None-Match": '"1"'}
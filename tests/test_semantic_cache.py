@@ -0,0 +1,89 @@
+import os
+import types
+import pytest
+import src.semantic_cache as semantic_cache
+from src.semantic_cache import SemanticCache
+
+VECTORS = {
+    "how do I reset my password": [1.0, 0.0, 0.0],
+    "how can I reset my password": [0.96, 0.28, 0.0],  # cosine 0.96 with the first
+    "how do I rotate api keys": [0.6, 0.8, 0.0],  # cosine 0.6 with the first
+    "what is a firewall": [0.0, 0.0, 1.0],
+}
+
+
+class StubEmbedder:
+    def embed_query(self, query):
+        return VECTORS[query]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(semantic_cache, "time", types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+@pytest.fixture
+def cache(clock):
+    return SemanticCache(StubEmbedder(), similarity_threshold=0.9, ttl_seconds=60, max_entries=2)
+
+
+def test_similar_query_above_threshold_hits(cache):
+    cache.store("how do I reset my password", {"answer": "Use the reset link."}, number_of_results=3)
+    assert cache.lookup("how can I reset my password", number_of_results=3) == {"answer": "Use the reset link."}
+    assert cache.stats()["hits"] == 1
+
+
+def test_query_below_threshold_misses(cache):
+    cache.store("how do I reset my password", {"answer": "Use the reset link."}, number_of_results=3)
+    assert cache.lookup("how do I rotate api keys", number_of_results=3) is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_request_parameters_must_match(cache):
+    cache.store("how do I reset my password", {"answer": "Use the reset link."}, number_of_results=3)
+    assert cache.lookup("how do I reset my password", number_of_results=5) is None
+
+
+def test_entries_expire_after_ttl(cache, clock):
+    cache.store("how do I reset my password", {"answer": "Use the reset link."})
+    clock[0] += 59
+    assert cache.lookup("how do I reset my password") is not None
+    clock[0] += 2
+    assert cache.lookup("how do I reset my password") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_clear_invalidates_every_entry(cache):
+    cache.store("how do I reset my password", {"answer": "Use the reset link."})
+    cache.clear()
+    assert cache.lookup("how do I reset my password") is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_least_recently_used_entry_is_evicted(cache):
+    cache.store("how do I reset my password", {"answer": "reset"})
+    cache.store("what is a firewall", {"answer": "firewall"})
+    cache.lookup("how do I reset my password")
+    cache.store("how do I rotate api keys", {"answer": "rotate"})
+    assert cache.lookup("what is a firewall") is None
+    assert cache.lookup("how do I reset my password") == {"answer": "reset"}
+    assert cache.stats()["evictions"] == 1
+
+
+def test_changed_knowledge_bank_invalidates_the_cache(tmp_path, clock):
+    database = tmp_path / "chroma.sqlite3"
+    database.write_text("")
+    cache = SemanticCache(StubEmbedder(), persist_directory=str(tmp_path))
+    cache.store("what is a firewall", {"answer": "firewall"})
+    os.utime(database, (0, 12345))
+    assert cache.lookup("what is a firewall") is None
+
+
+def test_cached_results_are_copies(cache):
+    result = {"answer": "Use the reset link."}
+    cache.store("how do I reset my password", result)
+    result["answer"] = "changed"
+    cache.lookup("how do I reset my password")["answer"] = "changed again"
+    assert cache.lookup("how do I reset my password") == {"answer": "Use the reset link."}
@@ -0,0 +1,66 @@
+import time
+import types
+from datetime import datetime
+import pytest
+import src.llm.token_tracker as token_tracker
+from src.llm.token_tracker import TokenUsageWindow
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(token_tracker, "time", types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def test_totals_by_model_and_user(clock):
+    usage = TokenUsageWindow(bucket_seconds=60)
+    usage.add("m", 1, input_tokens=10, calls=1)
+    usage.add("m", 2, input_tokens=5, output_tokens=3, calls=1)
+    assert usage.totals()["m"] == {"input_tokens": 15, "output_tokens": 3, "calls": 2}
+    assert usage.totals(user_id=2)["m"] == {"input_tokens": 5, "output_tokens": 3, "calls": 1}
+
+
+def test_only_closed_buckets_are_flushed_once(clock):
+    usage = TokenUsageWindow(bucket_seconds=60)
+    usage.add("m", 1, input_tokens=10, calls=1)
+    written = []
+    assert usage.flush_completed(written.extend) == 0  # bucket still open
+
+    clock[0] += 60
+    assert usage.flush_completed(written.extend) == 1
+    assert usage.flush_completed(written.extend) == 0
+    assert [row["input_tokens"] for row in written] == [10]
+
+
+def test_failed_write_is_retried(clock):
+    usage = TokenUsageWindow(bucket_seconds=60)
+    usage.add("m", 1, output_tokens=7)
+    clock[0] += 60
+
+    def failing_write(rows):
+        raise RuntimeError("database is locked")
+
+    with pytest.raises(RuntimeError):
+        usage.flush_completed(failing_write)
+    written = []
+    assert usage.flush_completed(written.extend) == 1
+    assert written[0]["output_tokens"] == 7
+
+
+@pytest.fixture
+def local_timezone(monkeypatch):
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_period_start_is_naive_utc(clock, local_timezone):
+    usage = TokenUsageWindow(bucket_seconds=60)
+    usage.add("m", 1, calls=1)
+    clock[0] += 60
+    written = []
+    usage.flush_completed(written.extend)
+    assert written[0]["period_start"] == datetime(1970, 1, 12, 13, 46, 0)
@@ -0,0 +1,65 @@
+import time
+import threading
+from src.write_behind import WriteBehindQueue
+
+
+def test_items_are_written_in_batches():
+    written = []
+    writer = WriteBehindQueue(written.append, batch_size=10, flush_interval=0.01)
+    for i in range(25):
+        writer.put(i)
+    writer.flush()
+    assert sorted(item for batch in written for item in batch) == list(range(25))
+    writer.stop()
+
+
+class PausingQueue(WriteBehindQueue):
+    """Pauses the writer thread between taking a batch off the queue and writing it."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.taken, self.release = threading.Event(), threading.Event()
+
+    def _drain(self, first=None):
+        batch = super()._drain(first)
+        if first is not None:
+            self.taken.set()
+            self.release.wait()
+        return batch
+
+
+def test_flush_waits_for_batch_in_flight():
+    written = []
+    writer = PausingQueue(written.extend, flush_interval=0.01)
+    writer.put("row")
+    assert writer.taken.wait(1)
+
+    flushed = threading.Event()
+    threading.Thread(target=lambda: (writer.flush(), flushed.set()), daemon=True).start()
+    time.sleep(0.05)
+    assert not flushed.is_set()
+
+    writer.release.set()
+    assert flushed.wait(1)
+    assert written == ["row"]
+    writer.stop()
+
+
+def test_full_queue_falls_back_to_synchronous_write():
+    release = threading.Event()
+    written = []
+
+    def blocked_write(batch):
+        release.wait()
+        written.extend(batch)
+
+    writer = WriteBehindQueue(blocked_write, max_size=1, batch_size=1, flush_interval=0.01, put_timeout=0.01)
+    writer.put(1)
+    time.sleep(0.05)  # the writer thread is now blocked on item 1
+    writer.put(2)
+    threading.Timer(0.05, release.set).start()
+    writer.put(3)  # queue full: written by the caller
+    writer.flush()
+    assert sorted(written) == [1, 2, 3]
+    assert writer.stats()["synchronous_writes"] == 1
+    writer.stop()